@@ -0,0 +1,229 @@
+"""
+Замеры производительности горячих участков симуляции и отрисовки.
+
+Замеряются Simulator._calculate_target_curve, Simulator._calculate_oven_temperature, get_dt
+и PlotCanvas.plot_data (Qt запускается с платформой offscreen) для sim_time от 10^3 до 10^6
+и thermal_inertia_coeff от 1 до 1000. Результаты сравниваются с сохраненными базовыми значениями
+(benchmarks/baselines.json): замедление больше допуска считается регрессией, и утилита завершается
+с кодом 1. Перед замерами проверяется совпадение ядра с исходной реализацией цикла.
+
+    python benchmarks/run_benchmarks.py                 # замер и сравнение с базой
+    python benchmarks/run_benchmarks.py --quick         # sim_time до 10^5
+    python benchmarks/run_benchmarks.py --save-baseline # записать текущие значения как базовые
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Скрипт запускается из корня репозитория без установки пакета
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from core.oven_kernel import reference_oven_temperature  # noqa: E402
+from core.oven_model import A1, A2, A3, B1, B2, DT, K_COEFF, get_dt  # noqa: E402
+from core.result_cache import SimulationCache  # noqa: E402
+from core.simulation import Simulator  # noqa: E402
+
+BASELINES_PATH = Path(__file__).resolve().parent / "baselines.json"
+SIM_TIMES = (1_000, 10_000, 100_000, 1_000_000)
+QUICK_SIM_TIMES = SIM_TIMES[:3]
+INERTIA_COEFFS = (1, 10, 100, 1000)
+GET_DT_SIZES = (1, 1_000, 1_000_000)
+# Замер повторяется, пока суммарное время меньше BENCH_MIN_TIME, но не больше BENCH_MAX_REPEATS раз;
+# в отчет идет минимальное время одного повтора
+BENCH_MIN_TIME = 0.5
+BENCH_MAX_REPEATS = 20
+# Допустимое замедление относительно базового значения
+REGRESSION_TOLERANCE = 0.25
+# Параметры симуляции в замерах и проверке совпадения с исходным циклом
+BENCH_PARAMS = {"kp": 2.0, "ki": 0.01, "kd": 5.0, "initial_temp": 25.0, "final_temp": 400.0, "heating_rate": 10.0}
+PARITY_STEPS = 10_000
+PARITY_TOLERANCE = 1e-6
+
+
+def measure(func):
+    timings = []
+    while len(timings) < BENCH_MAX_REPEATS and sum(timings) < BENCH_MIN_TIME:
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _target_curve(simulator, sim_time):
+    p = BENCH_PARAMS
+    return simulator._calculate_target_curve(p["initial_temp"], p["final_temp"], p["heating_rate"], sim_time)
+
+
+def simulation_cases(sim_times):
+    simulator = Simulator(cache=SimulationCache(memory_budget=0))
+    p = BENCH_PARAMS
+    for sim_time in sim_times:
+        yield f"target_curve[sim_time={sim_time}]", lambda sim_time=sim_time: _target_curve(simulator, sim_time)
+
+        targets = _target_curve(simulator, sim_time)
+        for inertia in INERTIA_COEFFS:
+
+            def run(targets=targets, sim_time=sim_time, inertia=inertia):
+                simulator._calculate_oven_temperature(
+                    p["initial_temp"], targets, p["kp"], p["ki"], p["kd"], DT, sim_time, inertia
+                )
+
+            yield f"oven_temperature[sim_time={sim_time},inertia={inertia}]", run
+
+
+def get_dt_cases():
+    for size in GET_DT_SIZES:
+        temperatures = np.linspace(25, 800, size) if size > 1 else 400.0
+        power = np.full(size, 50.0) if size > 1 else 50.0
+        heat_flow = power * 2784.2
+
+        def run(heat_flow=heat_flow, power=power, temperatures=temperatures):
+            get_dt(heat_flow, power, temperatures, A1, A2, A3, B1, B2, K_COEFF)
+
+        yield f"get_dt[size={size}]", run
+
+
+def plot_cases(sim_times):
+    # Qt и matplotlib импортируются только для замеров отрисовки
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+
+    from gui.plot_canvas import PlotCanvas
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    simulator = Simulator(cache=SimulationCache(memory_budget=0))
+    for sim_time in sim_times:
+        payload = simulator.run({**BENCH_PARAMS, "sim_time": sim_time, "thermal_inertia_coeff": 10})
+        canvas = PlotCanvas()
+        canvas.resize(1200, 800)
+        canvas.show()
+        app.processEvents()
+
+        def run(canvas=canvas, payload=payload):
+            # Как при потоковом обновлении: данные приходят сигналом, отрисовка - одним flush
+            canvas.plot_data(payload)
+            canvas.flush()
+
+        run()  # Первая отрисовка создает линии и легенду, замеряется обновление существующих линий
+        yield f"plot_data[sim_time={sim_time}]", run
+
+
+def check_parity():
+    """
+    Сравнивает Simulator._calculate_oven_temperature с исходным циклом reference_oven_temperature.
+    Возвращает максимальное отклонение по всем коэффициентам инерции.
+    """
+    simulator = Simulator(cache=SimulationCache(memory_budget=0))
+    p = BENCH_PARAMS
+    targets = _target_curve(simulator, PARITY_STEPS)
+    deviation = 0.0
+    for inertia in INERTIA_COEFFS:
+        args = (p["initial_temp"], targets, p["kp"], p["ki"], p["kd"], DT, PARITY_STEPS, inertia)
+        temperatures, errors = simulator._calculate_oven_temperature(*args)
+        reference_temperatures, reference_errors = reference_oven_temperature(*args)
+        deviation = max(
+            deviation,
+            float(np.max(np.abs(np.subtract(temperatures, reference_temperatures)))),
+            float(np.max(np.abs(np.subtract(errors, reference_errors)))),
+        )
+    return deviation
+
+
+def compare(results, baselines, tolerance):
+    rows = []
+    for name, seconds in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            status = "new"
+        elif seconds > baseline * (1 + tolerance):
+            status = "REGRESSION"
+        elif seconds < baseline / (1 + tolerance):
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((name, seconds, baseline, status))
+    return rows
+
+
+def format_report(rows):
+    lines = [f"{'замер':<52} {'время, мс':>12} {'база, мс':>12}  статус"]
+    for name, seconds, baseline, status in rows:
+        baseline_text = f"{baseline * 1000:12.3f}" if baseline is not None else f"{'-':>12}"
+        lines.append(f"{name:<52} {seconds * 1000:12.3f} {baseline_text}  {status}")
+    return "\n".join(lines) + "\n"
+
+
+def machine_description():
+    parts = (platform.system(), platform.machine(), platform.processor(), f"Python {platform.python_version()}")
+    return " ".join(part for part in parts if part)
+
+
+def load_baselines(path):
+    if not Path(path).exists():
+        return {}, None
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return data["results"], data.get("machine")
+
+
+def save_baselines(path, results):
+    data = {"machine": machine_description(), "created": datetime.now().isoformat(timespec="seconds"), "results": results}
+    Path(path).write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Замеры производительности симуляции и отрисовки")
+    parser.add_argument("-q", "--quick", action="store_true", help="sim_time только до 10^5")
+    parser.add_argument("-k", "--filter", help="регулярное выражение для отбора замеров по имени")
+    parser.add_argument("--no-plot", action="store_true", help="не замерять отрисовку (без Qt и matplotlib)")
+    parser.add_argument("--baseline", default=str(BASELINES_PATH), help="файл базовых значений")
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты как базовые значения")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE, help="допустимое замедление (доля)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sim_times = QUICK_SIM_TIMES if args.quick else SIM_TIMES
+
+    deviation = check_parity()
+    sys.stdout.write(f"Совпадение с исходным циклом: максимальное отклонение {deviation:.3e}\n")
+    if deviation > PARITY_TOLERANCE:
+        sys.stdout.write("Ядро симуляции расходится с исходной реализацией\n")
+        return 1
+
+    cases = [*simulation_cases(sim_times), *get_dt_cases()]
+    if not args.no_plot:
+        cases += list(plot_cases(sim_times))
+    pattern = re.compile(args.filter) if args.filter else None
+
+    results = {}
+    for name, func in cases:
+        if pattern is None or pattern.search(name):
+            results[name] = measure(func)
+
+    baselines, baseline_machine = load_baselines(args.baseline)
+    rows = compare(results, baselines, args.tolerance)
+    sys.stdout.write(format_report(rows))
+    if baseline_machine is not None and baseline_machine != machine_description():
+        sys.stdout.write(f"Базовые значения получены на другой машине: {baseline_machine}\n")
+
+    if args.save_baseline:
+        save_baselines(args.baseline, {**baselines, **results})
+        sys.stdout.write(f"Базовые значения записаны в {args.baseline}\n")
+        return 0
+    return 1 if any(status == "REGRESSION" for *_, status in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import numpy as np
+
+from core.oven_kernel import DEFAULT_OVEN_MODEL, OvenModel
+from core.oven_model import AGG_TIME, DT, get_dt
+
+
+def _as_batch_array(value, n_runs):
+    array = np.asarray(value, dtype=float)
+    if array.ndim > 1:
+        raise ValueError("Параметры пакета должны быть скалярами или одномерными массивами")
+    return np.broadcast_to(array, (n_runs,)).astype(float)
+
+
+def simulate_batch(
+    initial_temps,
+    target_temperatures,
+    kp,
+    ki,
+    kd,
+    thermal_inertia_coeffs,
+    dt=DT,
+    model: OvenModel = DEFAULT_OVEN_MODEL,
+    sensor_noise=0.0,
+    rng=None,
+):
+    """
+    Векторизованный аналог PIDSimulations._calculate_oven_temperature.
+
+    Все наборы коэффициентов (kp, ki, kd, коэффициенты инерции и начальные температуры)
+    продвигаются одновременно. Скаляры транслируются на весь пакет. Целевая кривая задается
+    одномерным массивом, общим для всех прогонов, или двумерным массивом (прогон, шаг).
+    Коэффициенты печи берутся из model; его поля могут быть массивами (n_runs,) - своя модель
+    для каждого прогона. sensor_noise - СКО нормального шума датчика (°C, скаляр или по прогону):
+    регулятор видит зашумленную температуру, шум берется из генератора rng.
+
+    Возвращает два массива формы (n_runs, num_steps + 1): температуры печи и ошибки.
+    """
+    targets = np.asarray(target_temperatures, dtype=float)
+    if targets.ndim not in (1, 2):
+        raise ValueError("Целевая кривая должна быть одномерным или двумерным массивом")
+
+    n_runs = max(np.size(value) for value in (initial_temps, kp, ki, kd, thermal_inertia_coeffs))
+    if targets.ndim == 2:
+        n_runs = max(n_runs, targets.shape[0])
+    targets = np.broadcast_to(targets, (n_runs, targets.shape[-1]))
+    num_steps = targets.shape[1] - 1
+
+    kp = _as_batch_array(kp, n_runs)
+    ki = _as_batch_array(ki, n_runs)
+    kd = _as_batch_array(kd, n_runs)
+    current_temperature = _as_batch_array(initial_temps, n_runs)
+    inertia_steps = np.maximum(1, (_as_batch_array(thermal_inertia_coeffs, n_runs) / dt).astype(int))
+
+    oven_temperatures = np.empty((n_runs, num_steps + 1))
+    errors = np.empty((n_runs, num_steps + 1))
+    oven_temperatures[:, 0] = current_temperature
+
+    initial_error = targets[:, 0] - current_temperature
+    errors[:, 0] = initial_error
+    integral_error = initial_error * dt
+    previous_error = initial_error
+
+    # Кольцевой буфер вкладов тепловой инерции. Строка i использует только первые inertia_steps[i] ячеек,
+    # остальные всегда нулевые, поэтому сумма по строке равна сумме окна инерции.
+    window = int(inertia_steps.max())
+    contributions = np.zeros((n_runs, window))
+    total_delta = np.zeros(n_runs)
+    rows = np.arange(n_runs)
+    # get_dt считает теплоемкость для PIPE_MASS, другая масса учитывается делением коэффициентов
+    # и теплового потока (см. OvenModel.get_dt_coefficients)
+    mass_ratio = model.mass_ratio
+    coefficients = model.get_dt_coefficients
+    noisy = np.any(sensor_noise)
+    if noisy and rng is None:
+        rng = np.random.default_rng()
+
+    for time_step in range(num_steps):
+        measured_temperature = current_temperature
+        if noisy:
+            measured_temperature = current_temperature + rng.normal(0.0, sensor_noise, n_runs)
+        error = targets[:, time_step] - measured_temperature
+        errors[:, time_step + 1] = error
+
+        # PID контроллер
+        integral_error = integral_error + error * dt
+        derivative_error = (error - previous_error) / dt
+        power = np.clip(kp * error + ki * integral_error + kd * derivative_error, 0, 100)
+
+        # Расчет тока и теплового потока
+        amperage = (model.mains_voltage / model.oven_resistance) * power / 100
+        heat_flow = amperage * model.mains_voltage * AGG_TIME / mass_ratio
+
+        desired_temperature_change = get_dt(heat_flow, power, current_temperature, *coefficients)
+        # Модель дает изменение за AGG_TIME секунд, за шаг - доля dt / AGG_TIME
+        delta_t = (desired_temperature_change - current_temperature) / AGG_TIME * dt
+        per_step_contribution = delta_t / inertia_steps
+
+        # Обновляем скользящую сумму вместо суммирования всего окна на каждом шаге
+        slots = time_step % inertia_steps
+        total_delta += per_step_contribution - contributions[rows, slots]
+        contributions[rows, slots] = per_step_contribution
+        if time_step % window == window - 1:
+            # Периодически пересчитываем сумму, чтобы не накапливать ошибку округления
+            total_delta = contributions.sum(axis=1)
+
+        current_temperature = current_temperature + total_delta
+        oven_temperatures[:, time_step + 1] = current_temperature
+        previous_error = error
+
+    return oven_temperatures, errors
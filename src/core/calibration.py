@@ -0,0 +1,379 @@
+"""
+Калибровка модели печи по экспериментальным кривым нагрева (перенос docs/oven_model.ipynb).
+
+Коэффициенты охлаждения C1, C2 находятся по скорости остывания на участках охлаждения, коэффициенты
+потерь A1, A2, A3, B1, B2, K_COEFF - дифференциальной эволюцией по среднеквадратичной ошибке
+воспроизведения всех кривых. Вся популяция эволюции рассчитывается одним векторизованным прогоном,
+подбор для всех мощностей вместе и для каждой мощности отдельно выполняется в пуле процессов.
+
+Результаты сохраняются версиями в data/models/<печь>/vNNNN.json. Повторная калибровка тех же
+данных с теми же настройками берет готовую версию, а не запускает подбор заново.
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from core.experiments import (
+    EXPERIMENTS_DIR,
+    ExperimentSet,
+    experiment_paths,
+    load_experiment_set,
+    power_from_filename,
+    replay_open_loop,
+)
+from core.oven_kernel import DEFAULT_OVEN_MODEL, OvenModel
+from core.oven_model import AGG_TIME
+from core.validation import validate_model
+
+MODELS_DIR = Path(__file__).resolve().parents[2] / "data" / "models"
+# В ноутбуке эксперимент с 10% мощности не использовался при подборе
+EXCLUDED_POWERS = (10,)
+# Участки охлаждения: точки ниже COOLING_MIN_TEMP не учитываются, разрыв больше COOLING_GROUP_GAP
+# интервалов начинает новый участок
+COOLING_MIN_TEMP = 100.0
+COOLING_GROUP_GAP = 3
+# Подбираемые коэффициенты потерь и диапазоны поиска из ноутбука
+LOSS_COEFFICIENTS = ("a1", "a2", "a3", "b1", "b2", "k_coeff")
+LOSS_BOUNDS = ((-1, 1), (-10, 10), (-10000, 10000), (0, 1000), (0, 1000), (0.2, 3))
+CALIBRATION_MAX_ITERATIONS = 1000
+CALIBRATION_POPULATION_SIZE = 15
+CALIBRATION_TOLERANCE = 1e-4
+
+logger = logging.getLogger("PIDSimulationsLogger")
+
+
+@dataclass
+class Calibration:
+    """
+    Версия коэффициентов модели одной печи.
+    per_power содержит коэффициенты и ошибку подбора по каждой мощности отдельно,
+    validation - RMSE и максимальное отклонение модели при постоянной мощности (core.validation).
+    """
+
+    furnace: str
+    version: int
+    model: OvenModel
+    mse: float
+    fingerprint: str
+    created: str
+    sources: list[str] = field(default_factory=list)
+    per_power: dict[int, dict] = field(default_factory=dict)
+    validation: list[dict] = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            "furnace": self.furnace,
+            "version": self.version,
+            "coefficients": _model_coefficients(self.model),
+            "mse": self.mse,
+            "fingerprint": self.fingerprint,
+            "created": self.created,
+            "sources": self.sources,
+            "per_power": {str(power): result for power, result in self.per_power.items()},
+            "validation": self.validation,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            furnace=data["furnace"],
+            version=data["version"],
+            model=OvenModel(**data["coefficients"]),
+            mse=data["mse"],
+            fingerprint=data["fingerprint"],
+            created=data["created"],
+            sources=data.get("sources", []),
+            per_power={int(power): result for power, result in data.get("per_power", {}).items()},
+            validation=data.get("validation", []),
+        )
+
+
+def _model_coefficients(model: OvenModel):
+    return {name: value for name, value in asdict(model).items() if name in (*LOSS_COEFFICIENTS, "c1", "c2")}
+
+
+def cooling_rates(experiments: ExperimentSet, min_temp=COOLING_MIN_TEMP, max_gap=COOLING_GROUP_GAP):
+    """
+    Средняя температура и скорость остывания (°C за интервал AGG_TIME) каждого участка охлаждения.
+    Скорость - наклон линейной регрессии температуры по времени, рассчитанный для всех участков сразу.
+    """
+    rows, steps = np.nonzero(experiments.cooling)
+    starts = np.ones(len(steps), dtype=bool)
+    starts[1:] = (np.diff(steps) > max_gap) | (np.diff(rows) != 0)
+    groups = np.cumsum(starts) - 1
+
+    temperatures = experiments.temperatures[rows, steps]
+    keep = temperatures >= min_temp
+    groups, x, y = groups[keep], steps[keep].astype(float), temperatures[keep]
+
+    count = np.bincount(groups).astype(float)
+    sum_x = np.bincount(groups, x)
+    sum_y = np.bincount(groups, y)
+    sum_xx = np.bincount(groups, x * x)
+    sum_xy = np.bincount(groups, x * y)
+    denominator = count * sum_xx - sum_x**2
+    valid = (count >= 2) & (denominator > 0)
+    slopes = (count[valid] * sum_xy[valid] - sum_x[valid] * sum_y[valid]) / denominator[valid]
+    return sum_y[valid] / count[valid], slopes
+
+
+def fit_cooling(experiments: ExperimentSet):
+    """
+    Коэффициенты C1, C2 зависимости скорости остывания от температуры: c1 * t**2 + c2.
+    """
+    mean_temperatures, rates = cooling_rates(experiments)
+    design = np.column_stack([mean_temperatures**2, np.ones_like(mean_temperatures)])
+    (c1, c2), *_ = np.linalg.lstsq(design, rates, rcond=None)
+    return float(c1), float(c2)
+
+
+def loss_mse(coefficients, experiments: ExperimentSet, c1, c2):
+    """
+    Среднеквадратичная ошибка воспроизведения экспериментов для коэффициентов формы (6,)
+    или для популяции формы (6, n_sets).
+    """
+    predicted = replay_open_loop(
+        coefficients, experiments.powers, experiments.heat_flows(), experiments.temperatures[:, 0], c1, c2
+    )
+    squared = (predicted - experiments.temperatures) ** 2
+    return np.nanmean(squared.reshape(*predicted.shape[:-2], -1), axis=-1)
+
+
+def fit_losses(
+    experiments: ExperimentSet,
+    c1,
+    c2,
+    bounds=LOSS_BOUNDS,
+    max_iterations=CALIBRATION_MAX_ITERATIONS,
+    population_size=CALIBRATION_POPULATION_SIZE,
+    tolerance=CALIBRATION_TOLERANCE,
+    seed=None,
+):
+    """
+    Подбирает коэффициенты потерь дифференциальной эволюцией. Возвращает словарь коэффициентов и MSE.
+    """
+    # scipy импортируется только при калибровке, чтобы не замедлять запуск приложения
+    from scipy.optimize import differential_evolution
+
+    result = differential_evolution(
+        loss_mse,
+        bounds,
+        args=(experiments, c1, c2),
+        strategy="best1bin",
+        maxiter=max_iterations,
+        popsize=population_size,
+        tol=tolerance,
+        mutation=(0.5, 1),
+        recombination=0.7,
+        seed=seed,
+        polish=False,
+        init="latinhypercube",
+        vectorized=True,
+        updating="deferred",
+    )
+    coefficients = dict(zip(LOSS_COEFFICIENTS, (float(value) for value in result.x), strict=True))
+    return {"coefficients": {**coefficients, "c1": c1, "c2": c2}, "mse": float(result.fun)}
+
+
+def _fit_task(experiments, c1, c2, options):
+    return fit_losses(experiments, c1, c2, **options)
+
+
+def calibration_fingerprint(paths, settings: dict):
+    # Отпечаток исходных данных и настроек подбора, по нему находится уже рассчитанная версия
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+    for path in paths:
+        digest.update(Path(path).name.encode())
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+def calibration_versions(furnace, models_dir=MODELS_DIR):
+    return sorted(int(path.stem[1:]) for path in (Path(models_dir) / furnace).glob("v*.json"))
+
+
+def available_calibrations(models_dir=MODELS_DIR):
+    """
+    Список (печь, версия) всех сохраненных калибровок.
+    """
+    models_dir = Path(models_dir)
+    if not models_dir.is_dir():
+        return []
+    return [
+        (path.name, version)
+        for path in sorted(models_dir.iterdir())
+        if path.is_dir()
+        for version in calibration_versions(path.name, models_dir)
+    ]
+
+
+def _calibration_path(furnace, version, models_dir):
+    return Path(models_dir) / furnace / f"v{version:04d}.json"
+
+
+def save_calibration(calibration: Calibration, models_dir=MODELS_DIR):
+    path = _calibration_path(calibration.furnace, calibration.version, models_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_suffix(".tmp")
+    temporary_path.write_text(json.dumps(calibration.as_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(temporary_path, path)
+    return path
+
+
+@functools.lru_cache(maxsize=64)
+def _read_calibration(path):
+    # Версии не изменяются после записи, поэтому прочитанный файл можно держать в памяти
+    return Calibration.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+
+def load_calibration(furnace, version=None, models_dir=MODELS_DIR):
+    """
+    Загружает версию калибровки печи, по умолчанию - последнюю.
+    """
+    if version is None:
+        versions = calibration_versions(furnace, models_dir)
+        if not versions:
+            raise FileNotFoundError(f"Для печи {furnace} нет сохраненных калибровок в {models_dir}")
+        version = versions[-1]
+    path = _calibration_path(furnace, int(version), models_dir)
+    if not path.exists():
+        raise FileNotFoundError(f"Калибровка {path} не найдена")
+    return _read_calibration(str(path))
+
+
+def resolve_model(data: dict, models_dir=MODELS_DIR):
+    """
+    Модель печи для словаря параметров симуляции. Ключи furnace и model_version выбирают
+    сохраненную калибровку, без них используются коэффициенты из core.oven_model.
+    Возвращает модель и фактический номер версии (None для коэффициентов по умолчанию).
+    """
+    furnace = data.get("furnace")
+    if not furnace:
+        return DEFAULT_OVEN_MODEL, None
+    calibration = load_calibration(furnace, data.get("model_version"), models_dir)
+    return calibration.model, calibration.version
+
+
+def calibrate(
+    furnace,
+    directory=EXPERIMENTS_DIR,
+    models_dir=MODELS_DIR,
+    exclude_powers=EXCLUDED_POWERS,
+    per_power=True,
+    refit=False,
+    max_workers=None,
+    **options,
+):
+    """
+    Калибрует модель печи furnace по экспериментам из directory и сохраняет новую версию.
+
+    Если для тех же файлов и настроек уже есть сохраненная версия, она возвращается без подбора
+    (refit=True запускает подбор заново). Параметры подбора options передаются в fit_losses:
+    bounds, max_iterations, population_size, tolerance и seed.
+    """
+    paths = [path for path in experiment_paths(directory) if power_from_filename(path) not in exclude_powers]
+    options = {
+        "bounds": LOSS_BOUNDS,
+        "max_iterations": CALIBRATION_MAX_ITERATIONS,
+        "population_size": CALIBRATION_POPULATION_SIZE,
+        "tolerance": CALIBRATION_TOLERANCE,
+        "seed": None,
+        **options,
+    }
+    settings = {"exclude_powers": sorted(exclude_powers), "per_power": per_power, "agg_time": AGG_TIME, **options}
+    fingerprint = calibration_fingerprint(paths, settings)
+
+    versions = calibration_versions(furnace, models_dir)
+    if not refit:
+        for version in reversed(versions):
+            calibration = load_calibration(furnace, version, models_dir)
+            if calibration.fingerprint == fingerprint:
+                logger.info(f"Calibration of {furnace} taken from version {version}")
+                return calibration
+
+    experiments = load_experiment_set(directory, exclude_powers)
+    c1, c2 = fit_cooling(experiments)
+    logger.info(f"Cooling coefficients of {furnace}: c1={c1}, c2={c2}")
+
+    # Первая задача - подбор по всем мощностям, остальные - по каждой мощности отдельно
+    tasks = [experiments]
+    if per_power:
+        tasks += [experiments.subset([power]) for power in experiments.powers]
+    workers = max_workers or os.cpu_count()
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            results = list(executor.map(_fit_task, tasks, [c1] * len(tasks), [c2] * len(tasks), [options] * len(tasks)))
+    else:
+        results = [_fit_task(task, c1, c2, options) for task in tasks]
+
+    combined, *power_results = results
+    model = OvenModel(**combined["coefficients"])
+    calibration = Calibration(
+        furnace=furnace,
+        version=(versions[-1] if versions else 0) + 1,
+        model=model,
+        mse=combined["mse"],
+        fingerprint=fingerprint,
+        created=datetime.now().isoformat(timespec="seconds"),
+        sources=[path.name for path in paths],
+        per_power={int(power): result for power, result in zip(experiments.powers, power_results, strict=False)},
+        validation=[asdict(row) for row in validate_model(model, paths=experiment_paths(directory))],
+    )
+    path = save_calibration(calibration, models_dir)
+    logger.info(f"Calibration of {furnace} saved to {path}, mse={calibration.mse}")
+    return calibration
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pid-sim-calibrate", description="Калибровка коэффициентов модели печи по экспериментальным кривым"
+    )
+    parser.add_argument("furnace", help="имя печи, под которым сохраняются версии коэффициентов")
+    parser.add_argument("-d", "--data-dir", default=str(EXPERIMENTS_DIR), help="каталог с файлами *_percent.csv")
+    parser.add_argument("-m", "--models-dir", default=str(MODELS_DIR), help="каталог сохраненных калибровок")
+    parser.add_argument(
+        "-x", "--exclude", type=int, nargs="*", default=list(EXCLUDED_POWERS), help="мощности, не используемые в подборе"
+    )
+    parser.add_argument("--no-per-power", action="store_true", help="не подбирать коэффициенты для каждой мощности")
+    parser.add_argument("--refit", action="store_true", help="подобрать заново, даже если есть готовая версия")
+    parser.add_argument("--max-iterations", type=int, default=CALIBRATION_MAX_ITERATIONS)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("-j", "--workers", type=int, help="количество процессов (по умолчанию - число ядер)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="выводить журнал калибровки в stderr")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr)
+
+    options = {"max_iterations": args.max_iterations}
+    if args.seed is not None:
+        options["seed"] = args.seed
+    calibration = calibrate(
+        args.furnace,
+        directory=args.data_dir,
+        models_dir=args.models_dir,
+        exclude_powers=tuple(args.exclude),
+        per_power=not args.no_per_power,
+        refit=args.refit,
+        max_workers=args.workers,
+        **options,
+    )
+    sys.stdout.write(json.dumps(calibration.as_dict(), ensure_ascii=False, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
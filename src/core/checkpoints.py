@@ -0,0 +1,115 @@
+"""
+Контрольные точки симуляции для продолжения расчета с общего префикса.
+
+Во время расчета через заданное число шагов сохраняется копия OvenState (температура, интеграл
+и предыдущая ошибка регулятора, буфер тепловой инерции). Новый запрос с той же динамикой
+(коэффициенты, модель печи, шаг, инерция, начальная температура), у которого уставка совпадает
+с уже рассчитанной до некоторого шага, продолжает расчет с последней контрольной точки до этого шага.
+Так продление sim_time или изменение программы после момента t не пересчитывает траекторию с нуля.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+from core.oven_kernel import FastForwardReport, OvenState
+from core.result_cache import params_key
+from core.simulation_result import SimulationResult
+
+# Бюджет памяти траекторий с контрольными точками по умолчанию, байт
+CHECKPOINT_STORE_MEMORY_BUDGET = 128 * 2**20
+# Минимальное число шагов между контрольными точками
+CHECKPOINT_INTERVAL_STEPS = 10000
+# Параметры, которые влияют только на уставку: их изменение проверяется сравнением уставок
+TARGET_PARAMS = ("sim_time", "program", "final_temp", "heating_rate")
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    step: int
+    state: OvenState
+    report: FastForwardReport | None = None
+
+
+@dataclass
+class Trajectory:
+    """
+    Результат расчета (заполнены точки 0..result.completed_steps) и его контрольные точки.
+    """
+
+    result: SimulationResult
+    checkpoints: list[Checkpoint] = field(default_factory=list)
+
+    def record(self, state: OvenState, report: FastForwardReport | None = None):
+        # Состояние продолжает изменяться, поэтому сохраняется копия
+        self.checkpoints.append(Checkpoint(state.step, state.copy(), replace(report) if report is not None else None))
+
+
+def dynamics_key(params: dict):
+    """
+    Ключ траектории: параметры симуляции без тех, что задают только уставку.
+    """
+    return params_key({key: value for key, value in params.items() if key not in TARGET_PARAMS})
+
+
+class CheckpointStore:
+    """
+    LRU-набор траекторий с контрольными точками, по одной последней траектории на ключ динамики.
+    Размер ограничен суммарным объемом массивов результатов траекторий (nbytes).
+    """
+
+    def __init__(self, memory_budget=CHECKPOINT_STORE_MEMORY_BUDGET, interval_steps=CHECKPOINT_INTERVAL_STEPS):
+        self.memory_budget = memory_budget
+        self.interval_steps = interval_steps
+        self._entries = OrderedDict()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def resume(self, params: dict, program, num_steps, trajectory: Trajectory):
+        """
+        Ищет последнюю контрольную точку, до которой уставка params совпадает с сохраненной траекторией.
+        Уставка общего префикса строится программой program, все колонки до контрольной точки
+        копируются в trajectory. Уставки сравниваются с точностью хранения результата (float32 или float64).
+        Возвращает контрольную точку или None, если продолжать не с чего.
+        """
+        previous = self._entries.get(dynamics_key(params))
+        if previous is None or not previous.checkpoints:
+            return None
+
+        # Шаг k использует уставку k, поэтому точка на шаге s годится, если совпадают уставки 0..s-1
+        length = min(previous.result.completed_steps, num_steps) + 1
+        targets = trajectory.result.target
+        targets[:length] = program.values(0, length)
+        mismatch = np.flatnonzero(previous.result.target[: length - 1] != targets[: length - 1])
+        limit = int(mismatch[0]) if mismatch.size else length - 1
+        valid = [checkpoint for checkpoint in previous.checkpoints if 0 < checkpoint.step <= limit]
+        if not valid:
+            return None
+
+        checkpoint = valid[-1]
+        step = checkpoint.step
+        trajectory.result.data[:, : step + 1] = previous.result.data[:, : step + 1]
+        trajectory.checkpoints = valid
+        trajectory.result.completed_steps = step
+        self._entries.move_to_end(dynamics_key(params))
+        return checkpoint
+
+    def put(self, params: dict, trajectory: Trajectory):
+        if self.memory_budget <= 0:
+            return
+        key = dynamics_key(params)
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.nbytes -= previous.result.nbytes
+        self._entries[key] = trajectory
+        self.nbytes += trajectory.result.nbytes
+        while self.nbytes > self.memory_budget and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= evicted.result.nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
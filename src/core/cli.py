@@ -0,0 +1,162 @@
+"""
+Консольная утилита pid-sim-batch: пакетная симуляция без Qt и matplotlib.
+
+Наборы параметров читаются из файла или stdin в формате JSON Lines (один словарь на строку,
+ключи как у SideBar.on_simulate) или CSV с заголовком. Для каждого набора в вывод пишется
+строка JSON с параметрами, метриками качества регулирования и, по запросу, траекториями
+(время, температура, уставка, ошибка и мощность).
+Траектории также можно сохранить в колоночное хранилище core.result_store (--store).
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from core.checkpoints import CheckpointStore
+from core.oven_model import DT
+from core.result_cache import SimulationCache
+from core.result_store import COLUMNS, ResultStore
+from core.simulation import Simulator
+from core.tuning import COST_FUNCTIONS, TuningProblem
+
+# Параметры, которые в интерфейсе вводятся целыми числами
+INTEGER_PARAMS = {"sim_time", "thermal_inertia_coeff", "model_version"}
+# Строковые параметры: имя печи, калибровка которой используется в симуляции, и программа уставки
+TEXT_PARAMS = {"furnace", "program"}
+
+
+def _convert_value(key, value):
+    if key in TEXT_PARAMS:
+        return value or None
+    if isinstance(value, str):
+        value = float(value)
+    return int(value) if key in INTEGER_PARAMS else value
+
+
+def read_parameter_sets(stream, input_format="jsonl"):
+    if input_format == "csv":
+        rows = csv.DictReader(stream)
+    else:
+        text = stream.read()
+        if text.lstrip().startswith("["):
+            rows = json.loads(text)
+        else:
+            rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [{key: _convert_value(key, value) for key, value in row.items()} for row in rows]
+
+
+def simulate_parameter_set(params: dict, include_trajectories=False):
+    # Кэш и контрольные точки в пакетном режиме не нужны: каждый набор параметров рассчитывается один раз
+    simulator = Simulator(
+        cache=SimulationCache(memory_budget=0), chunk_steps=sys.maxsize, checkpoints=CheckpointStore(memory_budget=0)
+    )
+    result = simulator.run(params)
+    temperatures = result.temperature[None, :]
+    target_temperatures = result.target
+    errors = result.error[None, :]
+
+    problem = TuningProblem(
+        target_temperatures=target_temperatures,
+        initial_temp=params.get("initial_temp", 0),
+        # Для программы уставки критерии считаются относительно ее конечной уставки
+        final_temp=float(target_temperatures[-1]) if params.get("program") else params.get("final_temp", 0),
+        thermal_inertia_coeff=params.get("thermal_inertia_coeff", 1),
+        # Критерии интегрируются по времени с тем же шагом, что и симуляция
+        dt=params.get("time_step") or DT,
+    )
+    gains = np.array([[params.get("kp", 0), params.get("ki", 0), params.get("kd", 0)]], dtype=float)
+    metrics = {name: float(cost(problem, temperatures, errors, gains)[0]) for name, cost in COST_FUNCTIONS.items()}
+    metrics["final_temperature"] = float(temperatures[0, -1])
+    if result.fast_forward is not None:
+        # Пропущенные шаги и оценка погрешности перемотки установившегося режима
+        metrics["fast_forward_skipped_steps"] = result.fast_forward["skipped_steps"]
+        metrics["fast_forward_error_bound"] = result.fast_forward["error_bound"]
+
+    record = {"params": params, "metrics": metrics}
+    if include_trajectories:
+        record["time"] = result.time
+        record["temperature"] = result.temperature
+        record["target"] = result.target
+        record["error"] = result.error
+        record["power"] = result.power
+    return record
+
+
+def _simulate_with_trajectories(params):
+    return simulate_parameter_set(params, include_trajectories=True)
+
+
+def run_batch(parameter_sets, include_trajectories=False, workers=1):
+    worker = _simulate_with_trajectories if include_trajectories else simulate_parameter_set
+    if workers <= 1:
+        yield from map(worker, parameter_sets)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(worker, parameter_sets, chunksize=max(1, len(parameter_sets) // (workers * 4)))
+
+
+def write_record(output, record, include_trajectories):
+    if include_trajectories:
+        record = {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in record.items()}
+    else:
+        record = {"params": record["params"], "metrics": record["metrics"]}
+    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _open_input(path):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    return open(path, encoding="utf-8", newline="")
+
+
+def _open_output(path):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", write_through=True)
+    return open(path, "w", encoding="utf-8")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pid-sim-batch", description="Пакетная симуляция ПИД-регулятора без графического интерфейса"
+    )
+    parser.add_argument("input", nargs="?", default="-", help="файл с наборами параметров (JSON Lines или CSV), '-' - stdin")
+    parser.add_argument("-o", "--output", default="-", help="файл для результатов в формате JSON Lines, '-' - stdout")
+    parser.add_argument(
+        "-f", "--input-format", choices=["jsonl", "csv"], help="формат входных данных (по умолчанию по расширению)"
+    )
+    parser.add_argument("-t", "--trajectories", action="store_true", help="добавлять в результат полные траектории")
+    parser.add_argument("-s", "--store", help="каталог хранилища, в которое добавляются траектории прогонов")
+    parser.add_argument("--float32", action="store_true", help="хранить траектории в хранилище с одинарной точностью")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="количество процессов для расчета")
+    parser.add_argument("-v", "--verbose", action="store_true", help="выводить журнал расчета в stderr")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr)
+
+    input_format = args.input_format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    with _open_input(args.input) as stream:
+        parameter_sets = read_parameter_sets(stream, input_format)
+
+    store = ResultStore(args.store, dtype=np.float32 if args.float32 else np.float64) if args.store else None
+    include_trajectories = args.trajectories or store is not None
+    with _open_output(args.output) as output:
+        for record in run_batch(parameter_sets, include_trajectories, args.workers):
+            if store is not None:
+                store.append(record["params"], *(record[column] for column in COLUMNS))
+            write_record(output, record, args.trajectories)
+    if store is not None:
+        store.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def _as_floating(values):
+    values = np.asarray(values)
+    return values if values.dtype.kind == "f" else values.astype(float)
+
+
+def lttb(x, y, n_out):
+    """
+    Прореживание ряда методом Largest-Triangle-Three-Buckets.
+
+    Сохраняет первую и последнюю точки, а из каждой промежуточной корзины выбирает точку,
+    образующую треугольник наибольшей площади с уже выбранной точкой и средним следующей корзины.
+    Возвращает прореженные x и y. Если точек меньше n_out, ряд возвращается без изменений.
+    Вещественные массивы (в том числе float32) используются без преобразования типа.
+    """
+    x = _as_floating(x)
+    y = _as_floating(y)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    # Границы корзин: первая и последняя точки выделены в отдельные корзины
+    every = (n - 2) / (n_out - 2)
+    edges = np.append((np.arange(n_out - 1) * every).astype(int) + 1, n)
+    edges[-2] = n - 1
+
+    # Средние значения всех корзин считаем заранее одним проходом
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x, edges[:-1]) / counts
+    mean_y = np.add.reduceat(y, edges[:-1]) / counts
+
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    selected = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_x, next_y = mean_x[bucket + 1], mean_y[bucket + 1]
+        anchor_x, anchor_y = x[selected], y[selected]
+        areas = np.abs((anchor_x - next_x) * (y[start:end] - anchor_y) - (anchor_x - x[start:end]) * (next_y - anchor_y))
+        selected = start + int(np.argmax(areas))
+        indices[bucket + 1] = selected
+
+    return x[indices], y[indices]
+
+
+def visible_slice(x, x_min, x_max):
+    """
+    Срез отсортированного по возрастанию x, покрывающий интервал [x_min, x_max]
+    с одной точкой запаса с каждой стороны, чтобы линия доходила до краев области.
+    """
+    start = max(int(np.searchsorted(x, x_min, side="left")) - 1, 0)
+    stop = min(int(np.searchsorted(x, x_max, side="right")) + 1, len(x))
+    return slice(start, stop)
@@ -0,0 +1,178 @@
+"""
+Загрузка экспериментальных кривых нагрева из data/experiments и воспроизведение их моделью печи.
+
+Каждый файл *_percent.csv содержит строки "секунды,температура" без заголовка, мощность нагрева
+задается в имени файла (например, 30_percent.csv). Как и в docs/oven_model.ipynb, данные усредняются
+по интервалам AGG_TIME секунд - это шаг, на который рассчитаны коэффициенты get_dt.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from core.oven_kernel import DEFAULT_OVEN_MODEL, OvenModel
+from core.oven_model import AGG_TIME, HEAT_CAPACITY_MIN_TEMP, PIPE_MASS, get_dt, quartz_specific_heat
+
+EXPERIMENTS_DIR = Path(__file__).resolve().parents[2] / "data" / "experiments"
+EXPERIMENT_PATTERN = "*_percent.csv"
+# Пределы температуры при воспроизведении: не дают расходящимся кандидатам при подборе уйти в inf
+REPLAY_MIN_TEMP = 40.0
+REPLAY_MAX_TEMP = 5000.0
+# При небольшом числе рядов накладные расходы numpy на шаг больше самого расчета,
+# такие пакеты воспроизводятся циклом по float (как в oven_kernel.advance)
+REPLAY_SCALAR_MAX_SERIES = 8
+
+
+def power_from_filename(path):
+    # 30_percent.csv -> 30
+    try:
+        return int(Path(path).stem.split("_")[0])
+    except ValueError as error:
+        raise ValueError(f"Не удалось извлечь процент мощности из имени файла: {path}") from error
+
+
+def experiment_paths(directory=EXPERIMENTS_DIR, pattern=EXPERIMENT_PATTERN):
+    return sorted(Path(directory).glob(pattern), key=power_from_filename)
+
+
+def load_experiment(path):
+    """
+    Читает файл эксперимента. Возвращает массивы секунд и температур.
+    """
+    data = np.loadtxt(path, delimiter=",", ndmin=2)
+    return data[:, 0], data[:, 1]
+
+
+def aggregate(seconds, temperatures, agg_time=AGG_TIME):
+    """
+    Средняя температура по интервалам agg_time секунд. Интервалы без измерений пропускаются.
+    """
+    bins = (np.asarray(seconds) // agg_time).astype(np.int64)
+    bins -= bins.min()
+    counts = np.bincount(bins)
+    sums = np.bincount(bins, weights=temperatures)
+    filled = counts > 0
+    return sums[filled] / counts[filled]
+
+
+def cooling_mask(temperatures):
+    # Интервал считается охлаждением, если температура упала относительно предыдущего
+    mask = np.zeros(temperatures.shape, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        mask[..., 1:] = np.diff(temperatures, axis=-1) < 0
+    return mask
+
+
+@dataclass
+class ExperimentSet:
+    """
+    Эксперименты, выровненные в двумерные массивы (мощность, интервал).
+    Более короткие ряды дополнены NaN, поэтому все мощности обрабатываются одновременно.
+    """
+
+    powers: np.ndarray
+    temperatures: np.ndarray
+    lengths: np.ndarray
+
+    @classmethod
+    def from_series(cls, powers, series):
+        lengths = np.array([len(values) for values in series], dtype=np.int64)
+        temperatures = np.full((len(series), lengths.max(initial=0)), np.nan)
+        for row, values in enumerate(series):
+            temperatures[row, : len(values)] = values
+        return cls(np.asarray(powers, dtype=float), temperatures, lengths)
+
+    @property
+    def mask(self):
+        return ~np.isnan(self.temperatures)
+
+    @property
+    def cooling(self):
+        return cooling_mask(self.temperatures)
+
+    def heat_flows(self, model: OvenModel = DEFAULT_OVEN_MODEL):
+        # Как в ноутбуке: на интервалах охлаждения нагреватель считается выключенным
+        heat_flows = self.powers[:, None] * model.heat_flow_per_percent * np.ones_like(self.temperatures)
+        return np.where(self.cooling, 0.0, heat_flows)
+
+    def subset(self, powers):
+        rows = np.flatnonzero(np.isin(self.powers, powers))
+        temperatures = self.temperatures[rows, : self.lengths[rows].max(initial=0)]
+        return ExperimentSet(self.powers[rows], temperatures, self.lengths[rows])
+
+
+def load_experiment_set(directory=EXPERIMENTS_DIR, exclude_powers=(), agg_time=AGG_TIME):
+    powers = []
+    series = []
+    for path in experiment_paths(directory):
+        power = power_from_filename(path)
+        if power in exclude_powers:
+            continue
+        powers.append(power)
+        series.append(aggregate(*load_experiment(path), agg_time))
+    if not series:
+        raise FileNotFoundError(f"В каталоге {directory} нет файлов {EXPERIMENT_PATTERN}")
+    return ExperimentSet.from_series(powers, series)
+
+
+def replay_open_loop(coefficients, powers, heat_flows, initial_temps, c1, c2):
+    """
+    Воспроизводит кривые нагрева моделью get_dt без регулятора, один шаг на интервал AGG_TIME.
+
+    coefficients - массив (a1, a2, a3, b1, b2, k_coeff) формы (6,) или (6, n_sets): все наборы
+    коэффициентов рассчитываются одновременно. heat_flows имеет форму (n_series, n_steps),
+    powers и initial_temps - (n_series,). Возвращает температуры формы (n_sets, n_series, n_steps)
+    (или (n_series, n_steps) для одного набора), где шаг k - температура после k-го интервала.
+    """
+    coefficients = np.asarray(coefficients, dtype=float)
+    single_set = coefficients.ndim == 1
+    # Оси: (набор коэффициентов, ряд)
+    a1, a2, a3, b1, b2, k_coeff = coefficients.reshape(6, -1)[:, :, None]
+    heat_flows = np.asarray(heat_flows, dtype=float)
+    powers = np.asarray(powers, dtype=float)
+
+    temperature = np.broadcast_to(np.asarray(initial_temps, dtype=float), (a1.shape[0], heat_flows.shape[0])).copy()
+    predicted = np.empty((a1.shape[0], *heat_flows.shape))
+    if temperature.size <= REPLAY_SCALAR_MAX_SERIES:
+        for set_index, series in np.ndindex(temperature.shape):
+            set_coefficients = coefficients.reshape(6, -1)[:, set_index].tolist()
+            predicted[set_index, series] = _replay_series(
+                set_coefficients, powers[series], heat_flows[series], temperature[set_index, series], c1, c2
+            )
+        return predicted[0] if single_set else predicted
+
+    with np.errstate(all="ignore"):
+        for step in range(heat_flows.shape[1]):
+            temperature = get_dt(heat_flows[:, step], powers, temperature, a1, a2, a3, b1, b2, k_coeff, c1, c2)
+            np.clip(temperature, REPLAY_MIN_TEMP, REPLAY_MAX_TEMP, out=temperature)
+            predicted[:, :, step] = temperature
+    return predicted[0] if single_set else predicted
+
+
+def _replay_series(coefficients, power, heat_flows, temperature, c1, c2):
+    # Та же модель get_dt для одного ряда на скалярах float
+    a1, a2, a3, b1, b2, k_coeff = coefficients
+    power = float(power)
+    temperature = float(temperature)
+    specific_heat = quartz_specific_heat
+    min_heat_capacity = specific_heat(HEAT_CAPACITY_MIN_TEMP) * PIPE_MASS
+    power_loss_numerator = b1 * power + b2
+
+    predicted = []
+    for heat_flow in heat_flows.tolist():
+        if temperature != temperature:
+            # NaN (нет измерений) сохраняется до конца ряда, как и в векторизованном расчете
+            predicted.append(temperature)
+            continue
+        if temperature < HEAT_CAPACITY_MIN_TEMP:
+            heat_capacity = min_heat_capacity
+        else:
+            heat_capacity = specific_heat(temperature) * PIPE_MASS
+        t_t_loss = max((a1 * temperature * temperature + a2 * temperature + a3) / heat_capacity, 0.0)
+        power_t_loss = min(max(power_loss_numerator / heat_capacity, 0.0), k_coeff * t_t_loss)
+        cooling = -(c1 * temperature * temperature + c2)
+        temperature += heat_flow / heat_capacity - cooling - t_t_loss - power_t_loss
+        temperature = min(max(temperature, REPLAY_MIN_TEMP), REPLAY_MAX_TEMP)
+        predicted.append(temperature)
+    return predicted
@@ -0,0 +1,316 @@
+"""
+Симуляция группы печей на общем фидере с ограничением тока.
+
+Все печи продвигаются одновременно векторизованным циклом (как core.batch_simulations), у каждой
+свои программа уставки, коэффициенты ПИД, тепловая инерция, калибровка и момент запуска. Если
+суммарный ток, запрошенный регуляторами, превышает предел фидера, мощности всех печей на этом шаге
+уменьшаются в одинаковое число раз. Регуляторы об ограничении не знают, как и реальные терморегуляторы.
+
+Хранятся только суммарные кривые нагрузки и накопленные показатели каждой печи, поэтому память
+растет линейно по числу печей и по длине смены, а не по их произведению.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import math
+import sys
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+from core.calibration import resolve_model
+from core.cli import read_parameter_sets
+from core.oven_kernel import OvenModel
+from core.oven_model import AGG_TIME, DT, get_dt
+from core.program import program_from_params
+
+# Длительность смены по умолчанию, секунды
+FLEET_SHIFT_TIME = 8 * 3600
+# Отклонение температуры от уставки, считающееся нарушением, °C
+FLEET_VIOLATION_BAND = 5.0
+# Температура цеха, °C: без нагрева печь остывает не ниже нее (или начальной температуры, если та ниже)
+FLEET_AMBIENT_TEMP = 20.0
+# Количество шагов, для которых уставка всех печей строится одной порцией
+FLEET_CHUNK_STEPS = 1000
+
+
+def _stack_models(models):
+    # Модель с полями-массивами (n_ovens,): по одной калибровке на печь
+    return OvenModel(**{field.name: np.array([getattr(model, field.name) for model in models]) for field in fields(OvenModel)})
+
+
+@dataclass
+class FleetResult:
+    time: np.ndarray  # моменты шагов, с
+    commanded_current: np.ndarray  # суммарный ток, запрошенный регуляторами, А
+    delivered_current: np.ndarray  # суммарный ток после ограничения, А
+    current_limit: float
+    mains_voltage: float
+    violation_band: float
+    # Показатели печей, массивы (n_ovens,)
+    violation_seconds: np.ndarray  # время с отклонением от уставки больше violation_band после запуска
+    max_error: np.ndarray  # наибольшее отклонение от уставки после запуска, °C
+    curtailed_seconds: np.ndarray  # время, когда мощность печи урезалась ограничением тока
+    energy_kwh: np.ndarray
+    final_temperature: np.ndarray
+
+    @property
+    def scale(self):
+        # Коэффициент урезания мощности на каждом шаге (1 - без ограничения)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.commanded_current > 0, self.delivered_current / self.commanded_current, 1.0)
+
+    def summary(self):
+        curtailed = self.delivered_current < self.commanded_current
+        dt = self.time[1] - self.time[0] if len(self.time) > 1 else DT
+        return {
+            "ovens": len(self.final_temperature),
+            "current_limit": float(self.current_limit) if math.isfinite(self.current_limit) else None,
+            "peak_commanded_current": float(self.commanded_current.max(initial=0.0)),
+            "peak_delivered_current": float(self.delivered_current.max(initial=0.0)),
+            "peak_delivered_kw": float(self.delivered_current.max(initial=0.0) * self.mains_voltage / 1000),
+            "curtailed_seconds": float(curtailed.sum() * dt),
+            "energy_kwh": float(self.energy_kwh.sum()),
+            "ovens_with_violations": int(np.count_nonzero(self.violation_seconds)),
+        }
+
+    def oven_records(self):
+        return [
+            {
+                "violation_seconds": float(self.violation_seconds[i]),
+                "max_error": float(self.max_error[i]),
+                "curtailed_seconds": float(self.curtailed_seconds[i]),
+                "energy_kwh": float(self.energy_kwh[i]),
+                "final_temperature": float(self.final_temperature[i]),
+            }
+            for i in range(len(self.final_temperature))
+        ]
+
+
+class FleetSimulation:
+    """
+    Описание группы печей. ovens - словари параметров как у Simulator.run (kp, ki, kd, initial_temp,
+    program или final_temp и heating_rate, thermal_inertia_coeff, furnace, model_version) и start_time -
+    момент запуска печи от начала смены, с. До запуска печь выключена и сохраняет начальную температуру,
+    регулятор не накапливает интеграл.
+    """
+
+    def __init__(self, ovens: list[dict], dt=DT):
+        self.ovens = ovens
+        self.dt = dt
+        n_ovens = len(ovens)
+
+        def column(key, default=0.0):
+            return np.array([float(oven.get(key) or default) for oven in ovens])
+
+        self.kp, self.ki, self.kd = column("kp"), column("ki"), column("kd")
+        self.initial_temps = column("initial_temp")
+        self.start_times = column("start_time")
+        self.inertia_steps = np.maximum(1, (column("thermal_inertia_coeff", 1) / dt).astype(int))
+
+        # Одинаковые калибровки и программы не повторяются: на общем фидере обычно несколько рецептов
+        models = {}
+        for oven in ovens:
+            key = (oven.get("furnace"), oven.get("model_version"))
+            if key not in models:
+                models[key] = resolve_model(oven)[0]
+        self.model = _stack_models([models[(oven.get("furnace"), oven.get("model_version"))] for oven in ovens])
+
+        self.program_groups = {}
+        for index, oven in enumerate(ovens):
+            program = program_from_params(oven, dt)
+            key = (type(program).__name__, str(program), program.initial_temp)
+            self.program_groups.setdefault(key, (program, []))[1].append(index)
+        self.program_groups = [(program, np.array(indices)) for program, indices in self.program_groups.values()]
+        self.n_ovens = n_ovens
+
+    def targets(self, start, stop):
+        """
+        Уставки печей на шагах start..stop-1, форма (n_ovens, stop - start).
+        """
+        times = np.arange(start, stop) * self.dt
+        targets = np.empty((self.n_ovens, stop - start))
+        for program, indices in self.program_groups:
+            # До запуска уставка равна начальной точке программы
+            targets[indices] = program.at(np.maximum(times[None, :] - self.start_times[indices, None], 0.0))
+        return targets
+
+    def run(
+        self,
+        sim_time=FLEET_SHIFT_TIME,
+        current_limit=math.inf,
+        violation_band=FLEET_VIOLATION_BAND,
+        chunk_steps=FLEET_CHUNK_STEPS,
+    ):
+        """
+        Рассчитывает смену длительностью sim_time секунд с пределом суммарного тока current_limit (А).
+        """
+        dt, model, n = self.dt, self.model, self.n_ovens
+        num_steps = int(sim_time / dt)
+        state = _FleetState(self, current_limit, violation_band)
+        commanded_current = np.empty(num_steps)
+        delivered_current = np.empty(num_steps)
+
+        # get_dt считает теплоемкость для PIPE_MASS, другая масса учитывается делением коэффициентов
+        # и теплового потока (см. OvenModel.get_dt_coefficients)
+        mass_ratio = model.mass_ratio
+        coefficients = model.get_dt_coefficients
+        amperage_per_percent = model.mains_voltage / model.oven_resistance
+
+        for start in range(0, num_steps, chunk_steps):
+            stop = min(start + chunk_steps, num_steps)
+            targets = self.targets(start, stop)
+            for offset in range(stop - start):
+                time_step = start + offset
+                power = state.controller(targets[:, offset], time_step * dt >= self.start_times)
+                commanded_current[time_step] = state.commanded
+
+                amperage = amperage_per_percent * power / 100
+                heat_flow = amperage * model.mains_voltage * AGG_TIME / mass_ratio
+                desired_temperature_change = get_dt(heat_flow, power, state.temperature, *coefficients)
+                # Модель описывает работающую печь, до запуска температура не меняется
+                delta_t = np.where(state.active, (desired_temperature_change - state.temperature) / AGG_TIME * dt, 0.0)
+                state.advance(delta_t, time_step)
+                delivered_current[time_step] = amperage.sum()
+                state.energy += amperage * model.mains_voltage * dt
+
+        logging.getLogger("PIDSimulationsLogger").info(f"Fleet of {n} ovens simulated for {num_steps} steps")
+        return FleetResult(
+            time=np.arange(num_steps) * dt,
+            commanded_current=commanded_current,
+            delivered_current=delivered_current,
+            current_limit=current_limit,
+            mains_voltage=float(np.max(model.mains_voltage)),
+            violation_band=violation_band,
+            violation_seconds=state.violation_steps * dt,
+            max_error=state.max_error,
+            curtailed_seconds=state.curtailed_steps * dt,
+            energy_kwh=state.energy / 3.6e6,
+            final_temperature=state.temperature.copy(),
+        )
+
+
+class _FleetState:
+    # Состояние регуляторов, буферы тепловой инерции и накопленные показатели всех печей
+
+    def __init__(self, fleet: FleetSimulation, current_limit, violation_band):
+        n = fleet.n_ovens
+        self.fleet = fleet
+        self.current_limit = current_limit
+        self.violation_band = violation_band
+        self.amperage_per_percent = fleet.model.mains_voltage / fleet.model.oven_resistance
+        self.temperature = fleet.initial_temps.copy()
+        # Модель потерь не знает температуры окружающей среды и при долгом простое урезанной печи уходит
+        # в отрицательные температуры, поэтому остывание ограничено снизу
+        self.floor_temperature = np.minimum(fleet.initial_temps, FLEET_AMBIENT_TEMP)
+        self.integral_error = np.zeros(n)
+        self.previous_error = np.zeros(n)
+        self.active = np.zeros(n, dtype=bool)
+        self.commanded = 0.0
+
+        # Кольцевой буфер вкладов тепловой инерции, как в simulate_batch
+        self.window = int(fleet.inertia_steps.max(initial=1))
+        self.contributions = np.zeros((n, self.window))
+        self.total_delta = np.zeros(n)
+        self.rows = np.arange(n)
+
+        self.violation_steps = np.zeros(n, dtype=np.int64)
+        self.curtailed_steps = np.zeros(n, dtype=np.int64)
+        self.max_error = np.zeros(n)
+        self.energy = np.zeros(n)  # Дж
+
+    def controller(self, target, active):
+        """
+        Мощности печей после ограничения суммарного тока. Запрошенный ток сохраняется в commanded.
+        """
+        fleet, dt = self.fleet, self.fleet.dt
+        error = target - self.temperature
+        # При запуске регулятор инициализируется как в OvenState.start
+        starting = active & ~self.active
+        self.integral_error = np.where(starting, error * dt, self.integral_error)
+        self.previous_error = np.where(starting, error, self.previous_error)
+        self.active = active
+
+        self.integral_error = np.where(active, self.integral_error + error * dt, self.integral_error)
+        derivative_error = (error - self.previous_error) / dt
+        power = np.clip(fleet.kp * error + fleet.ki * self.integral_error + fleet.kd * derivative_error, 0, 100)
+        power = np.where(active, power, 0.0)
+        self.previous_error = error
+
+        deviation = np.where(active, np.abs(error), 0.0)
+        self.violation_steps += deviation > self.violation_band
+        np.maximum(self.max_error, deviation, out=self.max_error)
+
+        self.commanded = float((self.amperage_per_percent * power / 100).sum())
+        if self.commanded > self.current_limit:
+            power = power * (self.current_limit / self.commanded)
+            self.curtailed_steps += power > 0
+        return power
+
+    def advance(self, delta_t, time_step):
+        # Изменение за шаг размазывается на окно инерции каждой печи
+        inertia_steps = self.fleet.inertia_steps
+        per_step_contribution = delta_t / inertia_steps
+        slots = time_step % inertia_steps
+        self.total_delta += per_step_contribution - self.contributions[self.rows, slots]
+        self.contributions[self.rows, slots] = per_step_contribution
+        if time_step % self.window == self.window - 1:
+            # Периодически пересчитываем сумму, чтобы не накапливать ошибку округления
+            self.total_delta = self.contributions.sum(axis=1)
+        self.temperature = np.maximum(self.temperature + self.total_delta, self.floor_temperature)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pid-sim-fleet", description="Симуляция группы печей на общем фидере с ограничением тока"
+    )
+    parser.add_argument("input", nargs="?", default="-", help="параметры печей (JSON Lines или CSV), '-' - stdin")
+    parser.add_argument("-o", "--output", default="-", help="файл для итогов в формате JSON, '-' - stdout")
+    parser.add_argument(
+        "-f", "--input-format", choices=["jsonl", "csv"], help="формат входных данных (по умолчанию по расширению)"
+    )
+    parser.add_argument("-t", "--sim-time", type=float, default=FLEET_SHIFT_TIME, help="длительность смены, с")
+    parser.add_argument("-l", "--current-limit", type=float, default=math.inf, help="предел суммарного тока фидера, А")
+    parser.add_argument("-b", "--violation-band", type=float, default=FLEET_VIOLATION_BAND, help="допустимое отклонение, °C")
+    parser.add_argument("--dt", type=float, default=DT, help="шаг расчета, с")
+    parser.add_argument("--load-curve", help="CSV-файл для кривой нагрузки: время, запрошенный и фактический ток")
+    parser.add_argument("-v", "--verbose", action="store_true", help="выводить журнал расчета в stderr")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr)
+
+    input_format = args.input_format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    if args.input == "-":
+        ovens = read_parameter_sets(sys.stdin, input_format)
+    else:
+        with open(args.input, encoding="utf-8", newline="") as stream:
+            ovens = read_parameter_sets(stream, input_format)
+
+    result = FleetSimulation(ovens, args.dt).run(args.sim_time, args.current_limit, args.violation_band)
+    report = {
+        "summary": result.summary(),
+        "ovens": [{"params": oven, **record} for oven, record in zip(ovens, result.oven_records(), strict=True)],
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str) + "\n"
+    if args.output == "-":
+        sys.stdout.write(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as output:
+            output.write(text)
+
+    if args.load_curve:
+        with open(args.load_curve, "w", encoding="utf-8", newline="") as stream:
+            writer = csv.writer(stream)
+            writer.writerow(["time", "commanded_current", "delivered_current"])
+            rows = (result.time.tolist(), result.commanded_current.tolist(), result.delivered_current.tolist())
+            writer.writerows(zip(*rows, strict=True))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
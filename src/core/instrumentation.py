@@ -0,0 +1,70 @@
+import logging
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+# Логгер замеров этапов. Записи уходят только в журнал JSON Lines, если он включен в setup_logger
+TIMINGS_LOGGER_NAME = "PIDSimulationsLogger.timings"
+
+
+@dataclass
+class StageTiming:
+    seconds: float = 0.0
+    # Чистое изменение количества занятых блоков памяти интерпретатора (sys.getallocatedblocks) за этап:
+    # сколько блоков осталось занято после этапа. Блоки, выделенные и освобожденные внутри этапа,
+    # не учитываются, поэтому это не количество выделений
+    retained_blocks: int = 0
+    calls: int = 0
+    # Память по tracemalloc (включая буферы NumPy), только когда трассировка включена (trace_allocations):
+    # наибольший объем, выделенный этапом сверх занятого на его начало, и чистое изменение занятого объема.
+    # Пик общий для процесса, поэтому в него входят и выделения других потоков за время этапа
+    peak_bytes: int | None = None
+    retained_bytes: int | None = None
+
+
+def trace_allocations():
+    # Включает замер памяти этапов через tracemalloc; трассировка замедляет выделения, поэтому она
+    # включается только вместе с журналом замеров
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+class StageTimer:
+    """
+    Замеры времени и удержанных блоков памяти по этапам расчета, а при включенном tracemalloc -
+    и выделенной памяти. Повторные замеры одного этапа (например, цикла, идущего порциями)
+    суммируются, пик берется наибольший.
+    """
+
+    def __init__(self, event: str):
+        self.event = event
+        self.stages: dict[str, StageTiming] = {}
+
+    @contextmanager
+    def measure(self, stage: str):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            traced_before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing = self.stages.setdefault(stage, StageTiming())
+            timing.seconds += time.perf_counter() - start
+            timing.retained_blocks += sys.getallocatedblocks() - blocks
+            timing.calls += 1
+            if tracing:
+                traced_after, traced_peak = tracemalloc.get_traced_memory()
+                timing.peak_bytes = max(timing.peak_bytes or 0, traced_peak - traced_before)
+                timing.retained_bytes = (timing.retained_bytes or 0) + traced_after - traced_before
+
+    def as_dict(self):
+        return {"event": self.event, "stages": {stage: asdict(timing) for stage, timing in self.stages.items()}}
+
+    def log(self, **context):
+        # Структурированная запись для журнала JSON Lines (см. logger_config.JsonLinesFormatter)
+        logging.getLogger(TIMINGS_LOGGER_NAME).info(self.event, extra={"fields": {**self.as_dict(), **context}})
@@ -1,8 +1,23 @@
 # logger_config.py
+import functools
+import json
 import logging
 
+from core.instrumentation import TIMINGS_LOGGER_NAME, trace_allocations
 
-def setup_logger():
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Одна запись - одна строка JSON: время, сообщение и поля из extra={"fields": {...}}.
+    """
+
+    def format(self, record):
+        entry = {"time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"), "message": record.getMessage()}
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logger(timings_log=None):
     # Настраиваем глобальный логгер с именем 'PIDSimulationsLogger'
     logger = logging.getLogger("PIDSimulationsLogger")
     logger.setLevel(logging.INFO)
@@ -20,4 +35,30 @@ def setup_logger():
         logger.addHandler(console_handler)
     else:
         pass
+
+    # Замеры этапов пишутся только в отдельный журнал JSON Lines, в консоль они не выводятся
+    timings_logger = logging.getLogger(TIMINGS_LOGGER_NAME)
+    timings_logger.propagate = False
+    if timings_log and not timings_logger.handlers:
+        timings_handler = logging.FileHandler(timings_log, encoding="utf-8")
+        timings_handler.setFormatter(JsonLinesFormatter())
+        timings_logger.addHandler(timings_handler)
+        timings_logger.setLevel(logging.INFO)
+        # В журнал вместе со временем этапов пишется выделенная ими память
+        trace_allocations()
     return logger
+
+
+def log_exceptions(func):
+    # wraps сохраняет имя метода: по нему pyqtSlot различает слоты одного класса
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        self = args[0]
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            method_name = func.__name__
+            self.logger.error(f"Error in {method_name}: {str(e)}", exc_info=True)
+            raise
+
+    return wrapper
@@ -0,0 +1,322 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from core.oven_model import (
+    A1,
+    A2,
+    A3,
+    AGG_TIME,
+    B1,
+    B2,
+    C1,
+    C2,
+    HEAT_CAPACITY_MIN_TEMP,
+    K_COEFF,
+    MAINS_VOLTAGE,
+    OVEN_RESISTANCE,
+    PIPE_MASS,
+    get_dt,
+    quartz_specific_heat,
+)
+
+# Перемотка установившегося режима (advance_fast_forward): минимальное окно проверки в шагах
+# и допустимое изменение температуры за шаг (°C), при котором режим считается установившимся
+STEADY_STATE_WINDOW = 300
+STEADY_STATE_TOLERANCE = 1e-6
+
+
+@dataclass(frozen=True)
+class OvenModel:
+    """
+    Коэффициенты модели печи и заранее вычисленные из них константы шага.
+    """
+
+    a1: float = A1
+    a2: float = A2
+    a3: float = A3
+    b1: float = B1
+    b2: float = B2
+    k_coeff: float = K_COEFF
+    c1: float = C1
+    c2: float = C2
+    pipe_mass: float = PIPE_MASS
+    mains_voltage: float = MAINS_VOLTAGE
+    oven_resistance: float = OVEN_RESISTANCE
+
+    @property
+    def heat_flow_per_percent(self):
+        # Тепловой поток за период агрегации при 1% мощности
+        return (self.mains_voltage / self.oven_resistance) / 100 * self.mains_voltage * AGG_TIME
+
+    @property
+    def min_heat_capacity(self):
+        # Теплоемкость трубы ниже HEAT_CAPACITY_MIN_TEMP
+        return quartz_specific_heat(HEAT_CAPACITY_MIN_TEMP) * self.pipe_mass
+
+    @property
+    def mass_ratio(self):
+        # Отношение массы трубы к PIPE_MASS, для которой get_dt считает теплоемкость
+        return self.pipe_mass / PIPE_MASS
+
+    @property
+    def get_dt_coefficients(self):
+        """
+        Коэффициенты get_dt (a1, a2, a3, b1, b2, k_coeff, c1, c2) для массы трубы модели. Все слагаемые
+        get_dt, кроме охлаждения, обратно пропорциональны теплоемкости, поэтому другая масса учитывается
+        делением a1..b2 на mass_ratio; тепловой поток, передаваемый в get_dt, делится так же.
+        """
+        mass_ratio = self.mass_ratio
+        scaled = (self.a1, self.a2, self.a3, self.b1, self.b2)
+        return (*(value / mass_ratio for value in scaled), self.k_coeff, self.c1, self.c2)
+
+
+DEFAULT_OVEN_MODEL = OvenModel()
+
+
+@dataclass
+class OvenState:
+    """
+    Полное состояние симуляции между шагами: температура, состояние ПИД-регулятора
+    и кольцевой буфер тепловой инерции со скользящей суммой.
+    """
+
+    temperature: float
+    integral_error: float
+    previous_error: float
+    contributions: list[float] = field(default_factory=lambda: [0.0])
+    position: int = 0
+    total_delta: float = 0.0
+    step: int = 0
+
+    @classmethod
+    def start(cls, initial_temp, initial_target_temp, dt, thermal_inertia_coeff):
+        initial_error = initial_target_temp - initial_temp
+        inertia_steps = max(1, int(thermal_inertia_coeff / dt))
+        return cls(
+            temperature=initial_temp,
+            integral_error=initial_error * dt,
+            previous_error=initial_error,
+            contributions=[0.0] * inertia_steps,
+        )
+
+    def copy(self):
+        return OvenState(
+            self.temperature,
+            self.integral_error,
+            self.previous_error,
+            list(self.contributions),
+            self.position,
+            self.total_delta,
+            self.step,
+        )
+
+
+def advance(state: OvenState, target_temperatures, kp, ki, kd, dt, model: OvenModel = DEFAULT_OVEN_MODEL):
+    """
+    Продвигает состояние на len(target_temperatures) шагов. На каждом шаге используется
+    соответствующая уставка. Возвращает списки новых температур и ошибок, состояние
+    изменяется на месте, поэтому расчет можно продолжать порциями.
+    """
+    if hasattr(target_temperatures, "tolist"):
+        # Арифметика со скалярами numpy в цикле заметно медленнее, чем с float
+        target_temperatures = target_temperatures.tolist()
+    # Состояние могло быть создано из скаляров numpy (например, первой точки массива уставки)
+    temperature = float(state.temperature)
+    integral_error = float(state.integral_error)
+    previous_error = float(state.previous_error)
+    contributions = state.contributions
+    position = state.position
+    total_delta = state.total_delta
+    inertia_steps = len(contributions)
+
+    a1, a2, a3 = model.a1, model.a2, model.a3
+    b1, b2, k_coeff = model.b1, model.b2, model.k_coeff
+    c1, c2 = model.c1, model.c2
+    pipe_mass = model.pipe_mass
+    # Локальное имя вместо глобального: поиск функции не повторяется на каждом шаге
+    specific_heat = quartz_specific_heat
+    min_heat_capacity = model.min_heat_capacity
+    heat_flow_per_percent = model.heat_flow_per_percent
+
+    oven_temperatures = []
+    errors = []
+    for target_temperature in target_temperatures:
+        error = target_temperature - temperature
+        errors.append(error)
+
+        # PID контроллер
+        integral_error += error * dt
+        derivative_error = (error - previous_error) / dt
+        power = kp * error + ki * integral_error + kd * derivative_error
+        if power < 0:
+            power = 0.0
+        elif power > 100:
+            power = 100.0
+
+        # Модель печи (get_dt) с теплоемкостью, вычисляемой один раз за шаг
+        if temperature < HEAT_CAPACITY_MIN_TEMP:
+            heat_capacity = min_heat_capacity
+        else:
+            heat_capacity = specific_heat(temperature) * pipe_mass
+        t_t_loss = (a1 * temperature * temperature + a2 * temperature + a3) / heat_capacity
+        if t_t_loss < 0:
+            t_t_loss = 0.0
+        power_t_loss = (b1 * power + b2) / heat_capacity
+        if power_t_loss < 0:
+            power_t_loss = 0.0
+        if power_t_loss > k_coeff * t_t_loss:
+            power_t_loss = k_coeff * t_t_loss
+        cooling = -(c1 * temperature * temperature + c2)
+        model_dt = power * heat_flow_per_percent / heat_capacity - cooling - t_t_loss - power_t_loss
+
+        # Изменение за шаг dt (модель дает изменение за AGG_TIME секунд), размазанное на окно инерции
+        per_step_contribution = model_dt * dt / AGG_TIME / inertia_steps
+        total_delta += per_step_contribution - contributions[position]
+        contributions[position] = per_step_contribution
+        position += 1
+        if position == inertia_steps:
+            position = 0
+            # Раз в окно пересчитываем сумму, чтобы не накапливать ошибку округления
+            total_delta = sum(contributions)
+
+        temperature += total_delta
+        oven_temperatures.append(temperature)
+        previous_error = error
+
+    state.temperature = temperature
+    state.integral_error = integral_error
+    state.previous_error = previous_error
+    state.position = position
+    state.total_delta = total_delta
+    state.step += len(errors)
+    return oven_temperatures, errors
+
+
+def controller_terms(errors, integral_error, previous_error, kp, ki, kd, dt):
+    """
+    Составляющие ПИД-регулятора и мощность для последовательности ошибок, как в цикле advance:
+    integral_error и previous_error - состояние регулятора до первой ошибки. Возвращает массивы
+    P, I, D и мощности после ограничения 0..100%. Для пакета прогонов errors имеет форму
+    (n_runs, num_steps), а состояние и коэффициенты - форму (n_runs, 1) или являются числами.
+    """
+    errors = np.asarray(errors, dtype=float)
+    initial_shape = (*errors.shape[:-1], 1)
+    # Накопление в том же порядке, что и в цикле, дает совпадение до последнего бита
+    initial_integral = np.broadcast_to(integral_error, initial_shape)
+    integral = np.cumsum(np.concatenate((initial_integral, errors * dt), axis=-1), axis=-1)[..., 1:]
+    derivative = np.diff(errors, axis=-1, prepend=np.broadcast_to(previous_error, initial_shape)) / dt
+    p_term, i_term, d_term = kp * errors, ki * integral, kd * derivative
+    power = np.clip(p_term + i_term + d_term, 0.0, 100.0)
+    return p_term, i_term, d_term, power
+
+
+@dataclass
+class FastForwardReport:
+    """
+    Итоги перемотки установившегося режима. error_bound - оценка сверху отклонения температуры
+    от расчета с постоянным шагом: остаточный дрейф за шаг, умноженный на число пропущенных шагов,
+    суммарно по всем перемоткам.
+    """
+
+    skipped_steps: int = 0
+    jumps: int = 0
+    error_bound: float = 0.0
+
+
+def advance_fast_forward(
+    state: OvenState,
+    target_temperatures,
+    kp,
+    ki,
+    kd,
+    dt,
+    model: OvenModel = DEFAULT_OVEN_MODEL,
+    report: FastForwardReport | None = None,
+    window=STEADY_STATE_WINDOW,
+    tolerance=STEADY_STATE_TOLERANCE,
+):
+    """
+    То же, что advance, но установившийся режим перематывается. Расчет идет окнами не короче
+    окна инерции; если в окне уставка постоянна, а температура менялась не больше чем на tolerance
+    за шаг, состояние сохраняется неизменным до следующей смены уставки: температура и ошибка
+    повторяются, интеграл ошибки накапливается точно. Возвращает массивы температур и ошибок,
+    пропущенные шаги и оценка погрешности добавляются в report.
+    """
+    targets = np.asarray(target_temperatures, dtype=float)
+    num_steps = len(targets)
+    oven_temperatures = np.empty(num_steps)
+    errors = np.empty(num_steps)
+    report = report if report is not None else FastForwardReport()
+    window = max(window, len(state.contributions))
+
+    done = 0
+    while done < num_steps:
+        start, done = done, min(done + window, num_steps)
+        oven_temperatures[start:done], errors[start:done] = advance(state, targets[start:done], kp, ki, kd, dt, model)
+        if done - start < window or done == num_steps or targets[start] != targets[done - 1]:
+            continue
+        block = oven_temperatures[start:done]
+        drift = float(np.max(np.abs(np.diff(block))))
+        if drift > tolerance or np.ptp(targets[start:done]) > 0:
+            continue
+
+        # Установившийся режим держится до следующей смены уставки
+        changes = np.flatnonzero(targets[done:] != targets[done - 1])
+        skipped = int(changes[0]) if changes.size else num_steps - done
+        if skipped == 0:
+            continue
+        error = targets[done - 1] - state.temperature
+        oven_temperatures[done : done + skipped] = state.temperature
+        errors[done : done + skipped] = error
+        state.integral_error += error * dt * skipped
+        state.previous_error = error
+        state.step += skipped
+        report.skipped_steps += skipped
+        report.jumps += 1
+        report.error_bound += drift * skipped
+        done += skipped
+    return oven_temperatures, errors
+
+
+def reference_oven_temperature(initial_temp, target_temperatures, kp, ki, kd, dt, num_steps, thermal_inertia_coeff):
+    """
+    Исходная реализация цикла симуляции с очередью на списке. Сложность шага растет
+    с коэффициентом инерции, поэтому используется только для проверки advance.
+    """
+    current_temperature = initial_temp
+    oven_temperatures = [current_temperature]
+
+    initial_error = target_temperatures[0] - current_temperature
+    errors = [initial_error]
+
+    integral_error = initial_error * dt
+    previous_error = initial_error
+
+    inertia_steps = max(1, int(thermal_inertia_coeff / dt))
+    contributions_queue = [0.0] * inertia_steps
+
+    for time_step in range(num_steps):
+        error = target_temperatures[time_step] - current_temperature
+        errors.append(error)
+
+        integral_error += error * dt
+        derivative_error = (error - previous_error) / dt
+        power = kp * error + ki * integral_error + kd * derivative_error
+        power = max(0, min(power, 100))
+
+        amperage = (MAINS_VOLTAGE / OVEN_RESISTANCE) * power / 100
+        heat_flow = amperage * MAINS_VOLTAGE * AGG_TIME
+
+        desired_temperature_change = get_dt(heat_flow, power, current_temperature, A1, A2, A3, B1, B2, K_COEFF)
+        delta_t = (desired_temperature_change - current_temperature) / AGG_TIME
+        per_step_contribution = delta_t / inertia_steps
+
+        contributions_queue.pop(0)
+        contributions_queue.append(per_step_contribution)
+
+        current_temperature = current_temperature + sum(contributions_queue)
+        oven_temperatures.append(current_temperature)
+        previous_error = error
+
+    return oven_temperatures, errors
@@ -0,0 +1,68 @@
+import numpy as np
+
+# Коэффициенты в уравнении потерь при нагревании печи, полученные из docs/oven_model
+A1 = 0.004433988115689157
+A2 = -2.1383429579319655
+A3 = 537.4230466267185
+B1 = 730.5861414838458
+B2 = 595.3779940428719
+K_COEFF = 0.49505773085774213
+# Коэффициенты в уравнении охлаждения печи
+C1 = -3.89357385551864e-06
+C2 = -0.21203098043962063
+
+OVEN_RESISTANCE = 19  # Ом - сопротивление печи
+MAINS_VOLTAGE = 230  # Вольт - напряжение в сети
+PIPE_MASS = 1.04  # Масса печи в Кг
+AGG_TIME = 5  # Время агрегации в секундах
+DT = 1  # Период симуляции в секундах
+# Ниже этой температуры теплоемкость кварца считается постоянной
+HEAT_CAPACITY_MIN_TEMP = 300.0
+
+
+def cooling_t_loss(temperature, c1=C1, c2=C2):
+    # Работает как со скалярами, так и с массивами numpy
+    return (c1 * temperature**2 + c2) * -1
+
+
+def multiply_by_pipe_mass(func):
+    def wrapper(temperature):
+        return func(temperature) * PIPE_MASS
+
+    return wrapper
+
+
+# согласно литературному источнику literature/sergeev1982
+def quartz_specific_heat(temperature):
+    # Удельная теплоемкость кварца без ограничения снизу. Работает со скалярами float и массивами numpy,
+    # поэтому ее используют и векторизованная модель, и циклы на скалярах (oven_kernel, experiments)
+    return 931.3 + 0.256 * temperature - 24 * temperature ** (-2)
+
+
+@multiply_by_pipe_mass
+def quartz_heat_capacity(temperature):
+    # Ниже HEAT_CAPACITY_MIN_TEMP теплоемкость считаем постоянной
+    return quartz_specific_heat(np.maximum(temperature, HEAT_CAPACITY_MIN_TEMP))
+
+
+def get_dt(heat_flow, power, t, a1, a2, a3, b1, b2, k_coeff, c1=C1, c2=C2):
+    # Все аргументы могут быть массивами numpy одинаковой (или совместимой) формы
+    heat_capacity = quartz_heat_capacity(t)
+    t_increase = heat_flow / heat_capacity
+
+    t_t_loss = np.maximum((a1 * t**2 + a2 * t + a3) / heat_capacity, 0)
+
+    power_t_loss = np.maximum((b1 * power + b2) / heat_capacity, 0)
+    power_t_loss = np.minimum(power_t_loss, k_coeff * t_t_loss)
+
+    dt = t_increase - cooling_t_loss(t, c1, c2) - t_t_loss - power_t_loss
+    return t + dt
+
+
+def calculate_target_curve(initial_temp, final_temperature, heating_rate, sim_time):
+    # Замкнутая форма цикла current = min(current + increment, final_temperature):
+    # точка k равна min(initial_temp + k * increment, final_temperature), точка 0 - initial_temp
+    increment = heating_rate / 60 * DT  # в градусах на секунду
+    target_temperatures = np.minimum(initial_temp + np.arange(sim_time + 1) * increment, final_temperature)
+    target_temperatures[0] = initial_temp
+    return target_temperatures
@@ -0,0 +1,279 @@
+"""
+Эмулятор печи в реальном времени для проверки внешнего регулятора.
+
+Сервер asyncio принимает TCP-соединения; каждое соединение - отдельная печь, поэтому в одном процессе
+работает сколько угодно печей. Модель (get_dt) продвигается на шаг dt каждые dt / speedup секунд
+реального времени, после каждого шага клиенту отправляется показание датчика. Протокол текстовый,
+по одной команде в строке:
+
+    клиент -> сервер:  P <мощность, %>      задать мощность (действует со следующего шага)
+                       STATS                запросить статистику такта
+                       QUIT                 закрыть соединение
+    сервер -> клиент:  OVEN <номер> <dt> <speedup>   приветствие после подключения
+                       T <время, с> <температура, °C> показание после каждого шага
+                       STATS <json>                  ответ на STATS
+
+Для каждой печи собирается статистика такта: задержка пробуждения относительно расписания
+и джиттер - отклонение интервала между тактами от номинального периода.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import sys
+from dataclasses import dataclass
+
+from core.oven_kernel import DEFAULT_OVEN_MODEL, OvenModel
+from core.oven_model import AGG_TIME, DT, get_dt
+
+PLANT_HOST = "127.0.0.1"
+PLANT_PORT = 8765
+# Очередь ожидающих подключений: при одновременном подключении сотен регуляторов
+# значение по умолчанию (100) заставляет часть клиентов ждать повторной отправки SYN
+PLANT_BACKLOG = 1024
+# Период вывода сводной статистики всех печей, секунды реального времени
+PLANT_STATS_INTERVAL = 10.0
+
+
+class RunningStatistics:
+    """
+    Среднее, СКО (алгоритм Уэлфорда) и максимум без хранения выборки.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.max = max(self.max, value)
+
+    @property
+    def std(self):
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def as_dict(self, scale=1.0):
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "mean": self.mean * scale, "std": self.std * scale, "max": self.max * scale}
+
+
+@dataclass
+class TickStatistics:
+    lateness: RunningStatistics  # задержка пробуждения относительно расписания, с
+    jitter: RunningStatistics  # отклонение интервала между тактами от периода, с
+    overruns: int = 0  # такты, на которые эмулятор опоздал больше чем на период
+
+    @classmethod
+    def empty(cls):
+        return cls(RunningStatistics(), RunningStatistics())
+
+    def as_dict(self):
+        # Времена в миллисекундах
+        return {"lateness_ms": self.lateness.as_dict(1000), "jitter_ms": self.jitter.as_dict(1000), "overruns": self.overruns}
+
+
+class EmulatedOven:
+    """
+    Разомкнутая модель печи: мощность задается извне, температура меняется по get_dt
+    с размазыванием на окно тепловой инерции, как в oven_kernel.advance.
+    """
+
+    def __init__(self, oven_id, initial_temp, thermal_inertia_coeff=1, dt=DT, model: OvenModel = DEFAULT_OVEN_MODEL):
+        self.oven_id = oven_id
+        self.temperature = float(initial_temp)
+        self.power = 0.0
+        self.time = 0.0
+        self.dt = dt
+        self.model = model
+        self.contributions = [0.0] * max(1, int(thermal_inertia_coeff / dt))
+        self.position = 0
+        self.total_delta = 0.0
+        self.statistics = TickStatistics.empty()
+
+    def set_power(self, power):
+        power = float(power)
+        # nan и inf прошли бы через ограничение 0..100 и испортили бы температуру до конца соединения
+        if not math.isfinite(power):
+            raise ValueError(f"Мощность должна быть конечным числом: {power}")
+        self.power = min(max(power, 0.0), 100.0)
+
+    def step(self):
+        model = self.model
+        # Масса трубы учитывается так же, как в simulate_batch (см. OvenModel.get_dt_coefficients)
+        heat_flow = self.power * model.heat_flow_per_percent / model.mass_ratio
+        change = get_dt(heat_flow, self.power, self.temperature, *model.get_dt_coefficients) - self.temperature
+        contribution = float(change) * self.dt / AGG_TIME / len(self.contributions)
+
+        self.total_delta += contribution - self.contributions[self.position]
+        self.contributions[self.position] = contribution
+        self.position = (self.position + 1) % len(self.contributions)
+        if self.position == 0:
+            self.total_delta = sum(self.contributions)
+        self.temperature += self.total_delta
+        self.time += self.dt
+        return self.temperature
+
+
+class PlantServer:
+    def __init__(self, speedup=1.0, initial_temp=25.0, thermal_inertia_coeff=1, dt=DT, model: OvenModel = DEFAULT_OVEN_MODEL):
+        self.logger = logging.getLogger("PIDSimulationsLogger")
+        self.speedup = speedup
+        self.initial_temp = initial_temp
+        self.thermal_inertia_coeff = thermal_inertia_coeff
+        self.dt = dt
+        self.model = model
+        self.ovens: dict[int, EmulatedOven] = {}
+        self._next_id = 0
+        # Статистика завершенных соединений, чтобы итог не терял отключившиеся печи
+        self.finished = TickStatistics.empty()
+
+    @property
+    def period(self):
+        # Период такта в секундах реального времени
+        return self.dt / self.speedup
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        oven = EmulatedOven(self._next_id, self.initial_temp, self.thermal_inertia_coeff, self.dt, self.model)
+        self._next_id += 1
+        self.ovens[oven.oven_id] = oven
+        self.logger.info(f"Oven {oven.oven_id} connected from {writer.get_extra_info('peername')}")
+        writer.write(f"OVEN {oven.oven_id} {self.dt:g} {self.speedup:g}\n".encode())
+
+        ticker = asyncio.create_task(self._tick(oven, writer))
+        try:
+            await self._read_commands(oven, reader, writer)
+        except (ConnectionError, asyncio.CancelledError):
+            # Обрыв соединения или остановка сервера: обработчик соединения - задача верхнего уровня
+            pass
+        finally:
+            ticker.cancel()
+            del self.ovens[oven.oven_id]
+            self._merge_finished(oven.statistics)
+            writer.close()
+            self.logger.info(f"Oven {oven.oven_id} disconnected: {oven.statistics.as_dict()}")
+
+    async def _read_commands(self, oven, reader, writer):
+        while line := await reader.readline():
+            command, *args = line.decode().split() or [""]
+            command = command.upper()
+            if command == "P" and len(args) == 1:
+                try:
+                    oven.set_power(args[0])
+                except ValueError:
+                    writer.write(f"ERROR bad power {args[0]!r}\n".encode())
+            elif command == "STATS":
+                writer.write(f"STATS {json.dumps(oven.statistics.as_dict())}\n".encode())
+            elif command == "QUIT":
+                return
+            elif command:
+                writer.write(f"ERROR unknown command {command!r}\n".encode())
+
+    async def _tick(self, oven: EmulatedOven, writer: asyncio.StreamWriter):
+        # Такты идут по абсолютному расписанию, поэтому задержка одного такта не сдвигает следующие
+        loop = asyncio.get_running_loop()
+        period = self.period
+        start = loop.time()
+        tick = 0
+        previous = start
+        while True:
+            tick += 1
+            deadline = start + tick * period
+            await asyncio.sleep(deadline - loop.time())
+            now = loop.time()
+            oven.statistics.lateness.add(now - deadline)
+            oven.statistics.jitter.add(now - previous - period)
+            previous = now
+            if now - deadline > period:
+                # Эмулятор не успевает: пропущенные такты не догоняются, расписание сдвигается
+                oven.statistics.overruns += 1
+                start, tick = now, 0
+
+            temperature = oven.step()
+            writer.write(f"T {oven.time:g} {temperature:.6f}\n".encode())
+            try:
+                await writer.drain()
+            except ConnectionError:
+                return
+
+    def _merge_finished(self, statistics: TickStatistics):
+        # Сводная статистика считается по средним и максимумам каждой печи
+        for name in ("lateness", "jitter"):
+            source = getattr(statistics, name)
+            if source.count:
+                getattr(self.finished, name).add(source.max)
+        self.finished.overruns += statistics.overruns
+
+    def summary(self):
+        """
+        Сводка по всем печам: число подключенных печей и распределение их худших задержек и джиттера.
+        """
+        worst = TickStatistics.empty()
+        for name in ("lateness", "jitter"):
+            target = getattr(worst, name)
+            for oven in self.ovens.values():
+                source = getattr(oven.statistics, name)
+                if source.count:
+                    target.add(source.max)
+        return {
+            "ovens": len(self.ovens),
+            "ticks": sum(oven.statistics.lateness.count for oven in self.ovens.values()),
+            "worst_per_oven": worst.as_dict(),
+            "disconnected_worst_per_oven": self.finished.as_dict(),
+        }
+
+
+async def serve(server: PlantServer, host=PLANT_HOST, port=PLANT_PORT, stats_interval=PLANT_STATS_INTERVAL, output=None):
+    output = output or sys.stdout
+    tcp_server = await asyncio.start_server(server.handle_connection, host, port, backlog=PLANT_BACKLOG)
+    addresses = ", ".join(str(sock.getsockname()) for sock in tcp_server.sockets)
+    server.logger.info(f"Plant emulator listening on {addresses}, period {server.period:g} s")
+    async with tcp_server:
+        while True:
+            await asyncio.sleep(stats_interval)
+            output.write(json.dumps(server.summary()) + "\n")
+            output.flush()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pid-sim-plant", description="Эмулятор печи в реальном времени для внешнего регулятора"
+    )
+    parser.add_argument("--host", default=PLANT_HOST, help="адрес для подключения регуляторов")
+    parser.add_argument("-p", "--port", type=int, default=PLANT_PORT, help="TCP-порт")
+    parser.add_argument("-s", "--speedup", type=float, default=1.0, help="ускорение относительно реального времени")
+    parser.add_argument("--dt", type=float, default=DT, help="шаг модели, секунды")
+    parser.add_argument("--initial-temp", type=float, default=25.0, help="начальная температура печей, °C")
+    parser.add_argument("--inertia", type=int, default=1, help="коэффициент тепловой инерции")
+    parser.add_argument("-f", "--furnace", help="печь, калибровка которой используется (по умолчанию - core.oven_model)")
+    parser.add_argument("-m", "--model-version", type=int, help="версия калибровки (по умолчанию - последняя)")
+    parser.add_argument("--stats-interval", type=float, default=PLANT_STATS_INTERVAL, help="период вывода статистики, с")
+    parser.add_argument("-v", "--verbose", action="store_true", help="выводить журнал в stderr")
+    return parser
+
+
+def main(argv=None):
+    # Калибровка нужна только при запуске сервера
+    from core.calibration import resolve_model
+
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr)
+
+    model, _ = resolve_model({"furnace": args.furnace, "model_version": args.model_version})
+    server = PlantServer(args.speedup, args.initial_temp, args.inertia, args.dt, model)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.stats_interval))
+    except KeyboardInterrupt:
+        sys.stdout.write(json.dumps(server.summary()) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Программы уставки из нескольких участков: нагрев или охлаждение с заданной скоростью, выдержка
+и мгновенная смена уставки.
+
+Программа хранится как кусочно-линейная функция времени (узлы и наклоны участков), поэтому
+уставка в любой момент вычисляется в замкнутой форме, а длинная программа может строиться
+порциями без хранения всей кривой. Текстовая запись участков разделяется ";" или переводом строки:
+
+    ramp 10 250; hold 2h; ramp 5 25
+
+ramp СКОРОСТЬ ЦЕЛЬ - изменение уставки до ЦЕЛЬ (°C) со скоростью СКОРОСТЬ (°C/мин) в любую сторону,
+hold ДЛИТЕЛЬНОСТЬ - выдержка (секунды или с суффиксом s, m, h, d), step ЦЕЛЬ - мгновенная смена уставки.
+"""
+
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from core.oven_model import DT
+
+# Множители суффиксов длительности выдержки
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+# Количество точек программы, строящихся за одну порцию по умолчанию
+PROGRAM_CHUNK_STEPS = 100_000
+
+
+@dataclass(frozen=True)
+class Ramp:
+    rate: float  # °C/мин, направление определяется целью
+    target: float
+
+    def __str__(self):
+        return f"ramp {self.rate:g} {self.target:g}"
+
+
+@dataclass(frozen=True)
+class Hold:
+    duration: float  # секунды
+
+    def __str__(self):
+        return f"hold {self.duration:g}"
+
+
+@dataclass(frozen=True)
+class Step:
+    target: float
+
+    def __str__(self):
+        return f"step {self.target:g}"
+
+
+def _parse_duration(text):
+    unit = text[-1].lower()
+    if unit in DURATION_UNITS:
+        return float(text[:-1]) * DURATION_UNITS[unit]
+    return float(text)
+
+
+def parse_segments(text: str):
+    """
+    Разбирает текстовую запись программы в список участков.
+    """
+    segments = []
+    for part in text.replace("\n", ";").split(";"):
+        words = part.split()
+        if not words:
+            continue
+        kind, args = words[0].lower(), words[1:]
+        try:
+            if kind == "ramp" and len(args) == 2:
+                segment = Ramp(float(args[0]), float(args[1]))
+                if segment.rate <= 0:
+                    raise ValueError
+            elif kind == "hold" and len(args) == 1:
+                segment = Hold(_parse_duration(args[0]))
+                if segment.duration < 0:
+                    raise ValueError
+            elif kind == "step" and len(args) == 1:
+                segment = Step(float(args[0]))
+            else:
+                raise ValueError
+        except ValueError as error:
+            raise ValueError(f"Некорректный участок программы: {part.strip()!r}") from error
+        segments.append(segment)
+    return segments
+
+
+class SetpointProgram:
+    """
+    Программа уставки, начинающаяся с температуры initial_temp. После последнего участка
+    уставка остается постоянной.
+    """
+
+    def __init__(self, initial_temp, segments, dt=DT):
+        self.initial_temp = float(initial_temp)
+        self.segments = list(segments)
+        self.dt = dt
+
+        # Узлы кусочно-линейной функции: время начала участка, уставка и наклон (°C/с).
+        # Мгновенная смена уставки - участок нулевой длины, в момент смены действует новое значение
+        times, values, slopes = [0.0], [self.initial_temp], []
+        for segment in self.segments:
+            time, value = times[-1], values[-1]
+            if isinstance(segment, Ramp):
+                slope = math.copysign(segment.rate / 60, segment.target - value)
+                duration = abs(segment.target - value) / (segment.rate / 60)
+                end_value = segment.target
+            elif isinstance(segment, Hold):
+                slope, duration, end_value = 0.0, segment.duration, value
+            else:
+                slope, duration, end_value = 0.0, 0.0, segment.target
+            slopes.append(slope)
+            times.append(time + duration)
+            values.append(end_value)
+        slopes.append(0.0)
+        self._times = np.array(times)
+        self._values = np.array(values)
+        self._slopes = np.array(slopes)
+
+    @classmethod
+    def parse(cls, text: str, initial_temp, dt=DT):
+        return cls(initial_temp, parse_segments(text), dt)
+
+    def __str__(self):
+        return "; ".join(str(segment) for segment in self.segments)
+
+    @property
+    def duration(self):
+        # Длительность программы в секундах
+        return float(self._times[-1])
+
+    def at(self, times):
+        """
+        Уставка в моменты времени times (секунды), в замкнутой форме для массива любой формы.
+        """
+        times = np.asarray(times, dtype=float)
+        segment = np.searchsorted(self._times, times, side="right") - 1
+        segment = np.clip(segment, 0, len(self._times) - 1)
+        return self._values[segment] + self._slopes[segment] * (times - self._times[segment])
+
+    def values(self, start, stop):
+        # Уставка на шагах start..stop-1
+        return self.at(np.arange(start, stop) * self.dt)
+
+    def curve(self, num_steps):
+        """
+        Уставка на шагах 0..num_steps включительно, как у calculate_target_curve.
+        """
+        return self.values(0, num_steps + 1)
+
+    def chunks(self, num_steps, chunk_steps=PROGRAM_CHUNK_STEPS):
+        """
+        Строит ту же кривую, что и curve, порциями не длиннее chunk_steps точек.
+        """
+        for start in range(0, num_steps + 1, chunk_steps):
+            yield self.values(start, min(start + chunk_steps, num_steps + 1))
+
+
+class LinearRampProgram(SetpointProgram):
+    """
+    Исходная целевая кривая (calculate_target_curve) в интерфейсе программы: уставка растет
+    со скоростью heating_rate и ограничивается сверху final_temp, в момент 0 равна initial_temp.
+    """
+
+    def __init__(self, initial_temp, final_temp, heating_rate, dt=DT):
+        super().__init__(initial_temp, [], dt)
+        self.final_temp = final_temp
+        self.heating_rate = heating_rate
+
+    def __str__(self):
+        return f"ramp {self.heating_rate:g} {self.final_temp:g}"
+
+    @property
+    def duration(self):
+        if self.heating_rate <= 0 or self.final_temp <= self.initial_temp:
+            return 0.0
+        return (self.final_temp - self.initial_temp) / (self.heating_rate / 60)
+
+    def at(self, times):
+        times = np.asarray(times, dtype=float)
+        values = np.minimum(self.initial_temp + times * (self.heating_rate / 60), self.final_temp)
+        return np.where(times <= 0, self.initial_temp, values)
+
+
+def program_from_params(data: dict, dt=DT):
+    """
+    Программа уставки для словаря параметров симуляции: текст из ключа program или,
+    если его нет, один участок нагрева от initial_temp до final_temp со скоростью heating_rate.
+    """
+    initial_temp = data.get("initial_temp", 0)
+    if data.get("program"):
+        return SetpointProgram.parse(data["program"], initial_temp, dt)
+    return LinearRampProgram(initial_temp, data.get("final_temp", 0), data.get("heating_rate", 0), dt)
+
+
+def simulation_steps(data: dict, program: SetpointProgram, dt=DT):
+    """
+    Количество шагов симуляции: sim_time из параметров, а для программы без sim_time -
+    ее длительность, округленная вверх до целого шага.
+    """
+    sim_time = data.get("sim_time", 0)
+    if not sim_time and data.get("program"):
+        return math.ceil(program.duration / dt)
+    return int(sim_time / dt)
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+
+# Бюджет памяти массивов результатов в кэше по умолчанию, байт
+SIMULATION_CACHE_MEMORY_BUDGET = 256 * 2**20
+
+
+def params_key(params: dict):
+    """
+    Хешируемый ключ для словаря параметров симуляции. Порядок ключей не важен,
+    целые и вещественные значения, равные по величине, дают одинаковый ключ.
+    """
+    return tuple(sorted(params.items()))
+
+
+class SimulationCache:
+    """
+    LRU-кэш результатов симуляции, ключом служит словарь параметров. Размер ограничен суммарным
+    объемом массивов результатов (nbytes): длинные траектории вытесняют больше коротких.
+    """
+
+    def __init__(self, memory_budget=SIMULATION_CACHE_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, params: dict):
+        return params_key(params) in self._entries
+
+    def get(self, params: dict):
+        key = params_key(params)
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, params: dict, result):
+        key = params_key(params)
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.nbytes -= previous.nbytes
+        self._entries[key] = result
+        self.nbytes += result.nbytes
+        # Результат больше всего бюджета не сохраняется: вытесняется последним
+        while self.nbytes > self.memory_budget and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
@@ -0,0 +1,167 @@
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+# Числовые параметры прогона, по которым строится индекс для выборок
+INDEX_FIELDS = (
+    "kp",
+    "ki",
+    "kd",
+    "initial_temp",
+    "final_temp",
+    "heating_rate",
+    "sim_time",
+    "thermal_inertia_coeff",
+)
+# Колонки с траекториями. Каждая колонка шарда - один плоский массив .npy,
+# траектории прогонов лежат в нем подряд, границы задаются offset и length из индекса
+COLUMNS = ("temperature", "target", "error")
+# Сколько значений одной колонки накапливается в памяти перед записью шарда
+SHARD_MAX_VALUES = 5_000_000
+
+INDEX_DTYPE = np.dtype([(name, "f8") for name in INDEX_FIELDS] + [("offset", "i8"), ("length", "i8")])
+
+
+@dataclass
+class StoredRun:
+    params: dict
+    temperature: np.ndarray
+    target: np.ndarray
+    error: np.ndarray
+
+
+class ResultStore:
+    """
+    Колоночное хранилище результатов симуляции на диске.
+
+    Прогоны добавляются методом append и записываются шардами (каталоги shard_NNNNN). Траектории
+    читаются через np.load(mmap_mode="r"), поэтому выборка из миллионов прогонов не загружает
+    в память ничего, кроме индекса и реально используемых участков колонок.
+    """
+
+    def __init__(self, path, dtype=np.float64, shard_max_values=SHARD_MAX_VALUES):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dtype = np.dtype(dtype)
+        self.shard_max_values = shard_max_values
+        self._buffer_params = []
+        self._buffer_columns = {column: [] for column in COLUMNS}
+        self._buffer_values = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def shard_paths(self):
+        return sorted(path for path in self.path.glob("shard_*") if path.is_dir())
+
+    def append(self, params: dict, temperature, target, error):
+        arrays = [np.asarray(values, dtype=self.dtype) for values in (temperature, target, error)]
+        if len({len(values) for values in arrays}) != 1:
+            raise ValueError("Колонки прогона должны иметь одинаковую длину")
+
+        self._buffer_params.append(params)
+        for column, values in zip(COLUMNS, arrays, strict=True):
+            self._buffer_columns[column].append(values)
+        self._buffer_values += len(arrays[0])
+        if self._buffer_values >= self.shard_max_values:
+            self.flush()
+
+    def flush(self):
+        """
+        Записывает накопленные прогоны в новый шард.
+        """
+        if not self._buffer_params:
+            return
+
+        lengths = np.array([len(values) for values in self._buffer_columns["temperature"]], dtype=np.int64)
+        index = np.zeros(len(lengths), dtype=INDEX_DTYPE)
+        for name in INDEX_FIELDS:
+            index[name] = [params.get(name, np.nan) for params in self._buffer_params]
+        index["length"] = lengths
+        index["offset"] = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        # Шард пишется во временный каталог и переименовывается, чтобы читатели не видели его частично
+        shard_path = self.path / f"shard_{len(self.shard_paths()):05d}"
+        temporary_path = self.path / f".{shard_path.name}.tmp"
+        if temporary_path.exists():
+            shutil.rmtree(temporary_path)
+        temporary_path.mkdir()
+        np.save(temporary_path / "index.npy", index)
+        for column in COLUMNS:
+            np.save(temporary_path / f"{column}.npy", np.concatenate(self._buffer_columns[column]))
+        with open(temporary_path / "params.jsonl", "w", encoding="utf-8") as params_file:
+            for params in self._buffer_params:
+                params_file.write(json.dumps(params, ensure_ascii=False) + "\n")
+        os.replace(temporary_path, shard_path)
+
+        self._buffer_params = []
+        self._buffer_columns = {column: [] for column in COLUMNS}
+        self._buffer_values = 0
+
+    def index(self):
+        """
+        Индекс всех записанных прогонов с номером шарда в поле shard.
+        """
+        parts = []
+        for shard_number, shard_path in enumerate(self.shard_paths()):
+            shard_index = np.load(shard_path / "index.npy")
+            with_shard = np.zeros(len(shard_index), dtype=INDEX_DTYPE.descr + [("shard", "i8")])
+            for name in INDEX_DTYPE.names:
+                with_shard[name] = shard_index[name]
+            with_shard["shard"] = shard_number
+            parts.append(with_shard)
+        if not parts:
+            return np.zeros(0, dtype=INDEX_DTYPE.descr + [("shard", "i8")])
+        return np.concatenate(parts)
+
+    def query(self, **conditions):
+        """
+        Перебирает прогоны, удовлетворяющие условиям. Условие - число (точное совпадение)
+        или пара (min, max) включительно, например query(kp=(2, 4), thermal_inertia_coeff=30).
+        Траектории возвращаются как представления файлов, отображенных в память.
+        """
+        unknown = set(conditions) - set(INDEX_FIELDS)
+        if unknown:
+            raise ValueError(f"Поля не входят в индекс: {', '.join(sorted(unknown))}")
+
+        for shard_path in self.shard_paths():
+            index = np.load(shard_path / "index.npy")
+            rows = np.flatnonzero(_match(index, conditions))
+            if len(rows) == 0:
+                continue
+
+            columns = {column: np.load(shard_path / f"{column}.npy", mmap_mode="r") for column in COLUMNS}
+            params = _read_params(shard_path, rows)
+            for row in rows:
+                start = index["offset"][row]
+                stop = start + index["length"][row]
+                yield StoredRun(params[row], *(columns[column][start:stop] for column in COLUMNS))
+
+
+def _match(index, conditions):
+    mask = np.ones(len(index), dtype=bool)
+    for name, condition in conditions.items():
+        if isinstance(condition, tuple | list):
+            low, high = condition
+            mask &= (index[name] >= low) & (index[name] <= high)
+        else:
+            mask &= index[name] == condition
+    return mask
+
+
+def _read_params(shard_path, rows):
+    # Читаем только строки параметров нужных прогонов
+    wanted = set(rows.tolist())
+    params = {}
+    with open(shard_path / "params.jsonl", encoding="utf-8") as params_file:
+        for row, line in enumerate(params_file):
+            if row in wanted:
+                params[row] = json.loads(line)
+    return params
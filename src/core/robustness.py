@@ -0,0 +1,231 @@
+"""
+Проверка устойчивости настройки регулятора методом Монте-Карло.
+
+Для заданных kp, ki, kd рассчитываются тысячи прогонов с возмущенной моделью печи: коэффициенты
+A1–C2 и K_COEFF, масса трубы, просадка напряжения сети и шум датчика температуры. Прогоны считаются
+пакетами векторизованного движка в пуле процессов, а процентили температуры накапливаются потоково
+(алгоритм P², Jain и Chlamtac), поэтому память не зависит от количества прогонов.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from core.batch_simulations import simulate_batch
+from core.oven_kernel import OvenModel
+from core.tuning import TuningProblem
+
+# Процентили полос по умолчанию
+ROBUSTNESS_PERCENTILES = (5, 50, 95)
+ROBUSTNESS_SAMPLES = 1000
+# Прогонов в одном пакете дочернего процесса
+ROBUSTNESS_BATCH_RUNS = 32
+# Количество точек времени, в которых накапливаются процентили
+ROBUSTNESS_BAND_POINTS = 1000
+# Коэффициенты модели, возмущаемые с относительным разбросом coefficient_spread
+PERTURBED_COEFFICIENTS = ("a1", "a2", "a3", "b1", "b2", "k_coeff", "c1", "c2")
+
+
+@dataclass(frozen=True)
+class Perturbations:
+    coefficient_spread: float = 0.05  # относительное СКО коэффициентов A1–C2 и K_COEFF
+    pipe_mass_spread: float = 0.05  # относительное СКО массы трубы
+    voltage_sag: float = 0.1  # наибольшая относительная просадка напряжения, распределена равномерно
+    sensor_noise: float = 0.5  # СКО шума датчика температуры, °C
+
+    def sample_models(self, model: OvenModel, runs, rng):
+        """
+        Модель с полями-массивами формы (runs,): по одному возмущенному набору на прогон.
+        """
+
+        def spread(value, sigma):
+            return value * (1 + sigma * rng.standard_normal(runs))
+
+        coefficients = {name: spread(getattr(model, name), self.coefficient_spread) for name in PERTURBED_COEFFICIENTS}
+        return replace(
+            model,
+            **coefficients,
+            pipe_mass=spread(model.pipe_mass, self.pipe_mass_spread),
+            mains_voltage=model.mains_voltage * (1 - self.voltage_sag * rng.random(runs)),
+        )
+
+
+class StreamingPercentiles:
+    """
+    Потоковая оценка процентилей для каждой точки ряда (алгоритм P²). На каждую пару процентиль-точка
+    хранится пять маркеров, выборки добавляются по одной строке, обновление векторизовано по точкам.
+    Пока выборок меньше пяти, процентили считаются точно.
+    """
+
+    def __init__(self, percentiles, n_points):
+        self.percentiles = tuple(percentiles)
+        self.n_points = n_points
+        self.count = 0
+        p = np.asarray(self.percentiles, dtype=float)[:, None] / 100
+        zeros, ones = np.zeros_like(p), np.ones_like(p)
+        # Желаемые положения маркеров и их приращения на одну выборку, форма (n_percentiles, 5)
+        self._desired = np.hstack([zeros, 2 * p, 4 * p, 2 + 2 * p, 4 * ones])
+        self._increments = np.hstack([zeros, p / 2, p, (1 + p) / 2, ones])
+        self._first_samples = []
+        # Высоты и положения маркеров, форма (n_percentiles, 5, n_points)
+        self._heights = None
+        self._positions = None
+
+    def update(self, samples):
+        # samples - одна выборка (n_points,) или несколько строк (n, n_points)
+        for sample in np.atleast_2d(np.asarray(samples, dtype=float)):
+            self._add(sample)
+
+    def _add(self, x):
+        self.count += 1
+        if self._heights is None:
+            self._first_samples.append(x)
+            if len(self._first_samples) == 5:
+                heights = np.sort(np.array(self._first_samples), axis=0)
+                self._heights = np.repeat(heights[None], len(self.percentiles), axis=0)
+                self._positions = np.broadcast_to(np.arange(5.0)[None, :, None], self._heights.shape).copy()
+                self._first_samples = []
+            return
+
+        q, n = self._heights, self._positions
+        q[:, 0] = np.minimum(q[:, 0], x)
+        q[:, 4] = np.maximum(q[:, 4], x)
+        # Сдвигаются все маркеры выше новой выборки
+        n[:, 1:4] += x < q[:, 1:4]
+        n[:, 4] += 1
+        self._desired += self._increments
+
+        for i in (1, 2, 3):
+            d = self._desired[:, i, None] - n[:, i]
+            move = ((d >= 1) & (n[:, i + 1] - n[:, i] > 1)) | ((d <= -1) & (n[:, i - 1] - n[:, i] < -1))
+            if not move.any():
+                continue
+            step = np.where(move, np.sign(d), 0.0)
+            # Параболическая поправка высоты, при выходе за соседние маркеры - линейная
+            parabolic = q[:, i] + step / (n[:, i + 1] - n[:, i - 1]) * (
+                (n[:, i] - n[:, i - 1] + step) * (q[:, i + 1] - q[:, i]) / (n[:, i + 1] - n[:, i])
+                + (n[:, i + 1] - n[:, i] - step) * (q[:, i] - q[:, i - 1]) / (n[:, i] - n[:, i - 1])
+            )
+            neighbour = np.where(step > 0, i + 1, i - 1)
+            neighbour_q = np.take_along_axis(q, neighbour[:, None], axis=1)[:, 0]
+            neighbour_n = np.take_along_axis(n, neighbour[:, None], axis=1)[:, 0]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                linear = q[:, i] + step * (neighbour_q - q[:, i]) / (neighbour_n - n[:, i])
+            inside = (q[:, i - 1] < parabolic) & (parabolic < q[:, i + 1])
+            q[:, i] = np.where(move, np.where(inside, parabolic, linear), q[:, i])
+            n[:, i] += step
+
+    def result(self):
+        # Оценки процентилей формы (n_percentiles, n_points)
+        if self._heights is None:
+            if not self._first_samples:
+                return np.full((len(self.percentiles), self.n_points), np.nan)
+            return np.percentile(np.array(self._first_samples), self.percentiles, axis=0)
+        return self._heights[:, 2].copy()
+
+
+@dataclass
+class RobustnessResult:
+    time: np.ndarray
+    percentiles: tuple
+    bands: np.ndarray  # (n_percentiles, n_points)
+    nominal: np.ndarray  # температура невозмущенной модели
+    target: np.ndarray
+    samples: int
+    total_samples: int
+
+    def as_payload(self):
+        # Словарь для PlotCanvas.plot_bands
+        return {
+            "x": self.time,
+            "bands": {f"P{percentile:g}": band for percentile, band in zip(self.percentiles, self.bands, strict=True)},
+            "nominal": self.nominal,
+            "samples": self.samples,
+            "total_samples": self.total_samples,
+        }
+
+
+def _perturbed_batch(problem: TuningProblem, gains, perturbations: Perturbations, runs, seed, indices):
+    # Выполняется в дочернем процессе: возвращает только точки indices, чтобы не передавать полные траектории
+    rng = np.random.default_rng(seed)
+    models = perturbations.sample_models(problem.model, runs, rng)
+    with np.errstate(all="ignore"):
+        temperatures, _ = simulate_batch(
+            problem.initial_temp,
+            problem.target_temperatures,
+            *(np.full(runs, gain, dtype=float) for gain in gains),
+            problem.thermal_inertia_coeff,
+            problem.dt,
+            models,
+            sensor_noise=perturbations.sensor_noise,
+            rng=rng,
+        )
+    return temperatures[:, indices]
+
+
+def robustness_analysis(
+    params: dict,
+    samples=ROBUSTNESS_SAMPLES,
+    perturbations: Perturbations | None = None,
+    percentiles=ROBUSTNESS_PERCENTILES,
+    band_points=ROBUSTNESS_BAND_POINTS,
+    batch_runs=ROBUSTNESS_BATCH_RUNS,
+    max_workers=None,
+    seed=None,
+    on_update=None,
+    cancel_event=None,
+):
+    """
+    Рассчитывает samples возмущенных прогонов для kp, ki, kd из params (словарь как у request_slot)
+    и возвращает полосы процентилей температуры (RobustnessResult). После каждого обработанного
+    пакета вызывается on_update(result) с текущими оценками. При установленном cancel_event
+    расчет прерывается и возвращаются оценки по уже обработанным прогонам.
+    """
+    perturbations = perturbations if perturbations is not None else Perturbations()
+    problem = TuningProblem.from_params(params)
+    gains = (params.get("kp", 0), params.get("ki", 0), params.get("kd", 0))
+
+    num_points = len(problem.target_temperatures)
+    indices = np.unique(np.linspace(0, num_points - 1, min(band_points, num_points)).round().astype(int))
+    nominal = np.asarray(problem.simulate([gains])[0][0])[indices]
+    statistics = StreamingPercentiles(percentiles, len(indices))
+
+    def current_result():
+        return RobustnessResult(
+            time=indices * problem.dt,
+            percentiles=statistics.percentiles,
+            bands=statistics.result(),
+            nominal=nominal,
+            target=problem.target_temperatures[indices],
+            samples=statistics.count,
+            total_samples=samples,
+        )
+
+    def collect(future):
+        statistics.update(future.result())
+        if on_update is not None:
+            on_update(current_result())
+
+    # Одинаковый seed дает одинаковые возмущения независимо от числа процессов
+    batch_sizes = [min(batch_runs, samples - start) for start in range(0, samples, batch_runs)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batch_sizes))
+    workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # В работе держится не больше двух пакетов на процесс, результаты обрабатываются по порядку
+        pending = deque()
+        for runs, batch_seed in zip(batch_sizes, seeds, strict=True):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            pending.append(executor.submit(_perturbed_batch, problem, gains, perturbations, runs, batch_seed, indices))
+            if len(pending) >= 2 * workers:
+                collect(pending.popleft())
+        while pending:
+            if cancel_event is not None and cancel_event.is_set():
+                for future in pending:
+                    future.cancel()
+                break
+            collect(pending.popleft())
+    return current_result()
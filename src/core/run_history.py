@@ -0,0 +1,99 @@
+"""
+История расчетов для сравнения настроек на одном графике.
+
+Хранятся кривые температуры последних N завершенных расчетов. Пока суммарный объем массивов
+не превышает бюджета памяти, кривые хранятся в полном разрешении (при масштабировании они
+прореживаются по видимому участку, как текущий расчет). При превышении бюджета самые старые
+кривые заменяются компактными копиями (LTTB), а если этого недостаточно - удаляются.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from core.decimation import lttb
+
+# Количество расчетов в истории по умолчанию
+RUN_HISTORY_SIZE = 10
+# Бюджет памяти массивов истории, байт
+RUN_HISTORY_MEMORY_BUDGET = 32 * 2**20
+# Точек компактной кривой: с запасом больше ширины графика в пикселях
+RUN_HISTORY_COMPACT_POINTS = 4000
+
+
+@dataclass(eq=False)
+class HistoryRun:
+    run_id: int  # порядковый номер расчета, задает стиль линии
+    label: str
+    params: dict
+    x: np.ndarray
+    y: np.ndarray
+    visible: bool = True
+    compact: bool = False
+
+    @property
+    def nbytes(self):
+        return self.x.nbytes + self.y.nbytes
+
+
+def run_label(params: dict):
+    # Подпись расчета в легенде и списке истории
+    return f"kp={params.get('kp', 0):g}, ki={params.get('ki', 0):g}, kd={params.get('kd', 0):g}"
+
+
+class RunHistory:
+    """
+    Последние size расчетов, от старых к новым, с ограничением памяти memory_budget байт.
+    """
+
+    def __init__(
+        self, size=RUN_HISTORY_SIZE, memory_budget=RUN_HISTORY_MEMORY_BUDGET, compact_points=RUN_HISTORY_COMPACT_POINTS
+    ):
+        self.size = size
+        self.memory_budget = memory_budget
+        self.compact_points = compact_points
+        self.runs: deque[HistoryRun] = deque()
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.runs)
+
+    def __iter__(self):
+        return iter(self.runs)
+
+    @property
+    def nbytes(self):
+        return sum(run.nbytes for run in self.runs)
+
+    def add(self, params: dict, x, y):
+        """
+        Добавляет кривую расчета. Массивы копируются: колонка результата - представление общего
+        массива всех колонок, и ссылка на нее удерживала бы в памяти весь результат.
+        """
+        run = HistoryRun(self._next_id, run_label(params), dict(params), np.array(x), np.array(y))
+        self._next_id += 1
+        self.runs.append(run)
+        self._enforce_limits()
+        return run
+
+    def resize(self, size):
+        self.size = size
+        self._enforce_limits()
+
+    def clear(self):
+        self.runs.clear()
+
+    def _enforce_limits(self):
+        while len(self.runs) > self.size:
+            self.runs.popleft()
+
+        # Сначала сжимаются самые старые кривые, затем они удаляются; последняя кривая остается всегда
+        for run in self.runs:
+            if self.nbytes <= self.memory_budget:
+                return
+            if not run.compact:
+                run.x, run.y = (np.array(values) for values in lttb(run.x, run.y, self.compact_points))
+                run.compact = True
+        while self.nbytes > self.memory_budget and len(self.runs) > 1:
+            self.runs.popleft()
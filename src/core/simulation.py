@@ -0,0 +1,197 @@
+import logging
+from dataclasses import asdict, replace
+
+import numpy as np
+
+from core.calibration import resolve_model
+from core.checkpoints import CheckpointStore, Trajectory
+from core.instrumentation import StageTimer
+from core.logger_config import log_exceptions
+from core.oven_kernel import FastForwardReport, OvenState, advance, advance_fast_forward, controller_terms
+from core.oven_model import DT, calculate_target_curve
+from core.program import program_from_params, simulation_steps
+from core.result_cache import SimulationCache
+from core.simulation_result import SimulationResult
+
+# Количество шагов, рассчитываемых между отправками промежуточных результатов и проверками отмены
+SIMULATION_CHUNK_STEPS = 10000
+
+
+class Simulator:
+    """
+    Расчет симуляции без зависимости от Qt. Используется графическим приложением
+    через PIDSimulations и консольной утилитой pid-sim-batch.
+    """
+
+    def __init__(
+        self,
+        cache: SimulationCache | None = None,
+        chunk_steps=SIMULATION_CHUNK_STEPS,
+        checkpoints: CheckpointStore | None = None,
+        dtype=np.float64,
+    ):
+        self.logger = logging.getLogger("PIDSimulationsLogger")
+        self.cache = cache if cache is not None else SimulationCache()
+        self.chunk_steps = chunk_steps
+        # Контрольные точки для продолжения расчета с общего префикса (см. core.checkpoints)
+        self.checkpoints = checkpoints if checkpoints is not None else CheckpointStore()
+        # Тип колонок SimulationResult: float32 вдвое сокращает память длинных траекторий
+        self.dtype = dtype
+        # Замеры этапов последнего запуска run
+        self.timings = StageTimer("simulation")
+
+        # Сохраняем параметры
+        self.kp = 0
+        self.ki = 0
+        self.kd = 0
+        self.initial_temp = 0
+        self.final_temp = 0
+        self.heating_rate = 0
+        self.sim_time = 0
+        self.thermal_inertia_coeff = 0
+
+    @log_exceptions
+    def _calculate_oven_temperature(self, initial_temp, target_temperatures, kp, ki, kd, dt, num_steps, thermal_inertia_coeff):
+        # Состояние регулятора и очереди тепловой инерции хранится в OvenState,
+        # очередь реализована кольцевым буфером со скользящей суммой (O(1) на шаг)
+        state = OvenState.start(initial_temp, target_temperatures[0], dt, thermal_inertia_coeff)
+        oven_temperatures, errors = advance(state, target_temperatures[:num_steps], kp, ki, kd, dt)
+        return [initial_temp, *oven_temperatures], [target_temperatures[0] - initial_temp, *errors]
+
+    @log_exceptions
+    def _calculate_target_curve(self, initial_temp, final_temperature, heating_rate, sim_time):
+        return calculate_target_curve(initial_temp, final_temperature, heating_rate, sim_time)
+
+    @log_exceptions
+    def run(self, data: dict, cancel_event=None, on_update=None):
+        """
+        Выполняет симуляцию по словарю параметров порциями по chunk_steps шагов.
+
+        Возвращает SimulationResult. После каждой порции вызывается on_update(result, percent)
+        с представлением уже рассчитанной части траектории (без копирования данных).
+        Если установлен cancel_event, расчет прерывается и возвращается None.
+        Ключи furnace и model_version выбирают сохраненную калибровку модели печи (см. core.calibration).
+        Ключ program задает многоучастковую программу уставки (см. core.program) вместо нагрева
+        от initial_temp до final_temp; без sim_time симуляция длится до конца программы.
+        Ключ time_step задает шаг расчета в секундах (по умолчанию DT). При fast_forward установившийся
+        режим перематывается до следующей смены уставки (см. oven_kernel.advance_fast_forward),
+        число пропущенных шагов и оценка погрешности возвращаются в result.fast_forward.
+        Если уставка совпадает с ранее рассчитанной траекторией той же динамики до некоторого шага
+        (например, увеличен sim_time), расчет продолжается с последней контрольной точки до этого шага.
+        """
+        self.logger.info(f"Received data for simulation: {data}")
+
+        # Получение данных из входного словаря
+        self.initial_temp = data.get("initial_temp", 0)
+        self.final_temp = data.get("final_temp", 0)
+        self.heating_rate = data.get("heating_rate", 0)
+        self.sim_time = data.get("sim_time", 0)
+        self.kp = data.get("kp", 0)
+        self.ki = data.get("ki", 0)
+        self.kd = data.get("kd", 0)
+        self.thermal_inertia_coeff = data.get("thermal_inertia_coeff", 1)
+        dt = data.get("time_step") or DT
+        fast_forward = FastForwardReport() if data.get("fast_forward") else None
+
+        # Замеры этапов: поиск в кэше, целевая кривая, цикл симуляции и передача результатов
+        self.timings = timer = StageTimer("simulation")
+
+        # Без явной версии берется последняя калибровка печи, поэтому в ключ кэша входит фактическая версия
+        with timer.measure("cache"):
+            model, model_version = resolve_model(data)
+            cache_params = data if model_version is None else {**data, "model_version": model_version}
+
+            # Повторный запрос с уже рассчитанными параметрами отдаем из кэша
+            cached_result = self.cache.get(cache_params)
+        if cached_result is not None:
+            self.logger.info("Simulation result taken from cache")
+            if on_update is not None:
+                with timer.measure("emit"):
+                    on_update(cached_result, 100)
+            timer.log(status="cached", sim_time=self.sim_time)
+            return cached_result
+
+        program = program_from_params(data, dt)
+        num_steps = simulation_steps(data, program, dt)
+        self.sim_time = num_steps * dt
+
+        # Колонки выделяются заранее и заполняются порциями. Отданные части больше не изменяются,
+        # поэтому их представления можно безопасно передавать в другой поток без копирования.
+        # Уставка строится в замкнутой форме той же порцией, что и рассчитывается
+        result = SimulationResult.allocate(num_steps, dt, self.dtype)
+        with timer.measure("target_curve"):
+            initial_target = float(program.at(0.0))
+        state = OvenState.start(self.initial_temp, initial_target, dt, self.thermal_inertia_coeff)
+        initial_error = initial_target - self.initial_temp
+        # В начальной точке интеграл ошибки уже накоплен за первый шаг, производная равна нулю
+        p_term, i_term, d_term, power = controller_terms([initial_error], 0.0, initial_error, *self.gains, dt)
+        result.fill(0, 1, temperature=self.initial_temp, target=initial_target, error=initial_error)
+        result.fill(0, 1, power=power, p_term=p_term, i_term=i_term, d_term=d_term)
+
+        trajectory = Trajectory(result)
+        with timer.measure("resume"):
+            state, fast_forward = self._resume(cache_params, program, num_steps, trajectory, state, fast_forward)
+        resumed_steps = completed_steps = state.step
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                self.logger.info(f"Simulation cancelled at step {completed_steps} of {num_steps}")
+                # Рассчитанная часть пригодится следующему запросу с тем же префиксом
+                self._save_checkpoints(cache_params, trajectory, state, fast_forward, final=True)
+                timer.log(status="cancelled", sim_time=self.sim_time, completed_steps=completed_steps)
+                return None
+
+            stop = min(completed_steps + self.chunk_steps, num_steps)
+            with timer.measure("target_curve"):
+                result.fill(completed_steps + 1, stop + 1, target=program.values(completed_steps + 1, stop + 1))
+            with timer.measure("step_loop"):
+                self._advance_chunk(state, result, completed_steps, stop, dt, model, fast_forward)
+            completed_steps = result.completed_steps = stop
+            self._save_checkpoints(cache_params, trajectory, state, fast_forward, final=completed_steps >= num_steps)
+
+            if on_update is not None:
+                with timer.measure("emit"):
+                    on_update(result.view(stop), 100 * completed_steps // num_steps if num_steps else 100)
+            if completed_steps >= num_steps:
+                break
+
+        report = {}
+        if fast_forward is not None:
+            result.fast_forward = report = asdict(fast_forward)
+            self.logger.info(f"Fast-forward skipped {fast_forward.skipped_steps} of {num_steps} steps")
+        self.cache.put(cache_params, result)
+        timer.log(status="completed", sim_time=self.sim_time, resumed_steps=resumed_steps, **report)
+        return result
+
+    @property
+    def gains(self):
+        return self.kp, self.ki, self.kd
+
+    def _advance_chunk(self, state: OvenState, result: SimulationResult, start, stop, dt, model, fast_forward):
+        # Шаги start..stop-1 используют уставку в тех же точках, результаты записываются в точки start+1..stop
+        chunk_targets = result.target[start:stop]
+        integral_error, previous_error = state.integral_error, state.previous_error
+        if fast_forward is None:
+            temperatures, errors = advance(state, chunk_targets, *self.gains, dt, model)
+        else:
+            temperatures, errors = advance_fast_forward(state, chunk_targets, *self.gains, dt, model, fast_forward)
+        p_term, i_term, d_term, power = controller_terms(errors, integral_error, previous_error, *self.gains, dt)
+        result.fill(start + 1, stop + 1, temperature=temperatures, error=errors)
+        result.fill(start + 1, stop + 1, power=power, p_term=p_term, i_term=i_term, d_term=d_term)
+
+    def _resume(self, params, program, num_steps, trajectory: Trajectory, state, fast_forward):
+        # Состояние и итоги перемотки с последней подходящей контрольной точки, если она есть
+        checkpoint = self.checkpoints.resume(params, program, num_steps, trajectory)
+        if checkpoint is None:
+            return state, fast_forward
+        self.logger.info(f"Simulation resumed from checkpoint at step {checkpoint.step} of {num_steps}")
+        return checkpoint.state.copy(), replace(checkpoint.report) if fast_forward is not None else None
+
+    def _save_checkpoints(self, params, trajectory: Trajectory, state, fast_forward, final=False):
+        # Точки ставятся не чаще чем через interval_steps шагов и в конце расчета. Перемотка зависит
+        # от границ порций, поэтому при fast_forward точки ставятся только на границах порций от начала
+        aligned = fast_forward is None or state.step % self.chunk_steps == 0
+        last_step = trajectory.checkpoints[-1].step if trajectory.checkpoints else 0
+        if aligned and state.step > last_step and (final or state.step - last_step >= self.checkpoints.interval_steps):
+            trajectory.record(state, fast_forward)
+        if final:
+            self.checkpoints.put(params, trajectory)
@@ -0,0 +1,70 @@
+"""
+Результат симуляции: колонки траектории в одном заранее выделенном массиве NumPy с общей осью времени.
+"""
+
+import numpy as np
+
+# Колонки результата в порядке строк массива data
+SIMULATION_COLUMNS = ("temperature", "target", "error", "power", "p_term", "i_term", "d_term")
+# Колонки, которые рисуются на графике, и подписи их линий
+PLOT_LABELS = {"temperature": "температура_печи", "target": "целевая_температура", "error": "значение_ошибки"}
+
+
+def _column(name):
+    index = SIMULATION_COLUMNS.index(name)
+    return property(lambda self: self.data[index])
+
+
+class SimulationResult:
+    """
+    Траектория симуляции. Колонки - строки двумерного массива data (float64 или float32 для экономии
+    памяти), ось времени общая для всех колонок и всегда float64. Точка k соответствует моменту k * dt:
+    температура и ошибка после k шагов, мощность и составляющие ПИД, которые дали точку k.
+    Атрибуты колонок и view возвращают представления без копирования.
+    """
+
+    temperature = _column("temperature")
+    target = _column("target")
+    error = _column("error")
+    power = _column("power")  # мощность после ограничения 0..100%
+    p_term = _column("p_term")
+    i_term = _column("i_term")
+    d_term = _column("d_term")
+
+    def __init__(self, time: np.ndarray, data: np.ndarray, completed_steps=0):
+        self.time = time
+        self.data = data
+        # Заполнены точки 0..completed_steps
+        self.completed_steps = completed_steps
+        # Итоги перемотки установившегося режима (FastForwardReport в виде словаря), если она включалась
+        self.fast_forward: dict | None = None
+
+    @classmethod
+    def allocate(cls, num_steps, dt, dtype=np.float64):
+        return cls(np.arange(num_steps + 1) * dt, np.empty((len(SIMULATION_COLUMNS), num_steps + 1), dtype=dtype))
+
+    def __len__(self):
+        return len(self.time)
+
+    @property
+    def num_steps(self):
+        return len(self.time) - 1
+
+    @property
+    def nbytes(self):
+        return self.time.nbytes + self.data.nbytes
+
+    def view(self, steps):
+        """
+        Первые steps шагов (steps + 1 точек) без копирования данных.
+        """
+        return SimulationResult(self.time[: steps + 1], self.data[:, : steps + 1], min(steps, self.completed_steps))
+
+    def fill(self, start, stop, **columns):
+        # Записывает значения колонок в точки start..stop-1
+        for name, values in columns.items():
+            self.data[SIMULATION_COLUMNS.index(name), start:stop] = values
+
+    def series(self):
+        # Линии графика {подпись: колонка} для PlotCanvas.plot_data
+        return {label: getattr(self, name) for name, label in PLOT_LABELS.items()}
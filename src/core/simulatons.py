@@ -1,181 +1,269 @@
+# Qt-адаптер для расчетного ядра. Сам расчет не зависит от Qt и находится в core.simulation,
+# физическая модель - в core.oven_model (имена модели реэкспортируются для обратной совместимости).
 import logging
+import threading
+
+import numpy as np
+from PyQt6.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+from core.logger_config import log_exceptions
+from core.oven_model import (  # noqa: F401
+    A1,
+    A2,
+    A3,
+    AGG_TIME,
+    B1,
+    B2,
+    C1,
+    C2,
+    DT,
+    K_COEFF,
+    MAINS_VOLTAGE,
+    OVEN_RESISTANCE,
+    PIPE_MASS,
+    calculate_target_curve,
+    cooling_t_loss,
+    get_dt,
+    multiply_by_pipe_mass,
+    quartz_heat_capacity,
+)
+from core.robustness import ROBUSTNESS_SAMPLES, robustness_analysis
+from core.simulation import SIMULATION_CHUNK_STEPS, Simulator  # noqa: F401
+from core.simulation_result import SimulationResult
+from core.stability_map import stability_map
+from core.tuning import DEFAULT_GAIN_BOUNDS, tune_pid
 
-from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
 
-# Коэффициенты в уравнении потерь при нагревании печи, полученные из docs/oven_model
-A1 = 0.004433988115689157
-A2 = -2.1383429579319655
-A3 = 537.4230466267185
-B1 = 730.5861414838458
-B2 = 595.3779940428719
-K_COEFF = 0.49505773085774213
-# Коэффициенты в уравнении охлаждения печи
-C1 = -3.89357385551864e-06
-C2 = -0.21203098043962063
-
-OVEN_RESISTANCE = 19  # Ом - сопротивление печи
-MAINS_VOLTAGE = 230  # Вольт - напряжение в сети
-PIPE_MASS = 1.04  # Масса печи в Кг
-AGG_TIME = 5  # Время агрегации в секундах
-DT = 1  # Период симуляции в секундах
-
-
-def log_exceptions(func):
-    def wrapper(*args, **kwargs):
-        self = args[0]
-        try:
-            return func(*args, **kwargs)
-        except Exception as e:
-            method_name = func.__name__
-            self.logger.error(f"Error in {method_name}: {str(e)}", exc_info=True)
-            raise
-
-    return wrapper
-
-
-def cooling_t_loss(temperature):
-    return (C1 * temperature**2 + C2) * -1
-
-
-def multiply_by_pipe_mass(func):
-    def wrapper(temperature):
-        return func(temperature) * PIPE_MASS
-
-    return wrapper
-
-
-# согласно литературному источнику literature/sergeev1982
-@multiply_by_pipe_mass
-def quartz_heat_capacity(temperature):
-    if temperature < 300:
-        return 931.3 + 0.256 * 300 - 24 * 300 ** (-2)
-    return 931.3 + 0.256 * temperature - 24 * temperature ** (-2)
-
-
-def get_dt(heat_flow, power, t, a1, a2, a3, b1, b2, k_coeff):
-    t_increase = heat_flow / quartz_heat_capacity(t)
-
-    t_t_loss = (a1 * t**2 + a2 * t + a3) / quartz_heat_capacity(t)
-    if t_t_loss < 0:
-        t_t_loss = 0
-
-    power_t_loss = (b1 * power + b2) / quartz_heat_capacity(t)
-    if power_t_loss < 0:
-        power_t_loss = 0
+class PIDSimulations(QObject):
+    # Рассчитанная часть траектории (SimulationResult), передается без копирования
+    simulations_data_signal = pyqtSignal(object)
+    simulation_progress_signal = pyqtSignal(int)
+    # Завершение последнего запроса: True - рассчитан, False - отменен. Расчет, замененный более
+    # новым запросом, не сообщает о завершении: о нем сообщит новый расчет
+    simulation_finished_signal = pyqtSignal(bool)
+    # Замеры этапов завершенного или отмененного расчета (StageTimer.as_dict)
+    simulation_timings_signal = pyqtSignal(dict)
+    _pending_request_signal = pyqtSignal()
 
-    if power_t_loss > k_coeff * t_t_loss:
-        power_t_loss = k_coeff * t_t_loss
+    def __init__(self):
+        super().__init__()
+        self.logger = logging.getLogger("PIDSimulationsLogger")
+        # Колонки траекторий для графиков хранятся в float32: кэш, контрольные точки и история
+        # расчетов занимают вдвое меньше памяти, а точности хватает для отображения
+        self.simulator = Simulator(dtype=np.float32)
+
+        # Последний незапущенный запрос и флаг отмены текущего расчета.
+        # submit и cancel вызываются из GUI-потока, расчет идет в потоке объекта.
+        self._pending_lock = threading.Lock()
+        self._pending_request = None
+        self.cancel_event = threading.Event()
+        # Номера последнего поставленного в очередь и выполняемого запросов
+        self._submitted_run_id = 0
+        self._running_run_id = 0
+        self._pending_request_signal.connect(self._process_pending_request)
+
+    @property
+    def cache(self):
+        return self.simulator.cache
+
+    def submit(self, data: dict):
+        """
+        Потокобезопасно ставит запрос в очередь, прерывая текущий расчет.
+        Если несколько запросов пришли до начала расчета, выполняется только последний.
+        """
+        with self._pending_lock:
+            self._pending_request = data
+            self._submitted_run_id += 1
+            self.cancel_event.set()
+        self._pending_request_signal.emit()
+
+    def cancel(self):
+        """
+        Потокобезопасно отменяет текущий и ожидающий расчеты.
+        """
+        with self._pending_lock:
+            self._pending_request = None
+            self.cancel_event.set()
+
+    @pyqtSlot()
+    def _process_pending_request(self):
+        with self._pending_lock:
+            data = self._pending_request
+            self._pending_request = None
+            if data is None:
+                return
+            self._running_run_id = self._submitted_run_id
+            self.cancel_event.clear()
+        self.request_slot(data)
+
+    def _on_simulation_update(self, result: SimulationResult, percent: int):
+        self.simulations_data_signal.emit(result)
+        self.simulation_progress_signal.emit(percent)
 
-    dt = t_increase - cooling_t_loss(t) - t_t_loss - power_t_loss
-    return t + dt
+    @pyqtSlot(dict)
+    @log_exceptions
+    def request_slot(self, data: dict):
+        result = self.simulator.run(data, cancel_event=self.cancel_event, on_update=self._on_simulation_update)
+        self.simulation_timings_signal.emit(self.simulator.timings.as_dict())
+        with self._pending_lock:
+            superseded = self._running_run_id != self._submitted_run_id
+        if not superseded:
+            self.simulation_finished_signal.emit(result is not None)
 
 
-class PIDSimulations(QObject):
-    simulations_data_signal = pyqtSignal(dict)
+class PIDTuner(QObject):
+    tuning_result_signal = pyqtSignal(dict)
 
     def __init__(self):
         super().__init__()
         self.logger = logging.getLogger("PIDSimulationsLogger")
 
-        # Сохраняем параметры
-        self.kp = 0
-        self.ki = 0
-        self.kd = 0
-        self.initial_temp = 0
-        self.final_temp = 0
-        self.heating_rate = 0
-        self.sim_time = 0
-        self.thermal_inertia_coeff = 0
-
+    @pyqtSlot(dict)
     @log_exceptions
-    def _calculate_oven_temperature(self, initial_temp, target_temperatures, kp, ki, kd, dt, num_steps, thermal_inertia_coeff):
-        current_temperature = initial_temp
-        oven_temperatures = [current_temperature]
-
-        initial_target_temp = target_temperatures[0]
-        initial_error = initial_target_temp - current_temperature
-        errors = [initial_error]
+    def request_slot(self, data: dict):
+        self.logger.info(f"Received data for PID tuning: {data}")
 
-        integral_error = initial_error * dt
-        previous_error = initial_error
+        cost = data.get("cost", "itae")
+        strategy = data.get("strategy", "grid")
+        result = tune_pid(data, cost=cost, strategy=strategy)
 
-        # Инициализируем очередь для учета тепловой инерции
-        inertia_steps = max(1, int(thermal_inertia_coeff / dt))
-        contributions_queue = [0.0] * inertia_steps
+        self.logger.info(f"Tuning finished: {result}")
+        self.tuning_result_signal.emit(result.as_dict())
 
-        for time_step in range(num_steps):
-            target_temperature = target_temperatures[time_step]
-            error = target_temperature - current_temperature
-            errors.append(error)
 
-            # PID контроллер
-            integral_error += error * dt
-            derivative_error = (error - previous_error) / dt
-            power = kp * error + ki * integral_error + kd * derivative_error
-            power = max(0, min(power, 100))  # Ограничение мощности
+class PIDRobustness(QObject):
+    # Текущие полосы процентилей (RobustnessResult.as_payload), отправляются после каждого пакета прогонов
+    robustness_bands_signal = pyqtSignal(dict)
+    # Завершение проверки: True - все прогоны рассчитаны, False - отменена
+    robustness_finished_signal = pyqtSignal(bool)
 
-            # Расчет тока и теплового потока
-            amperage = (MAINS_VOLTAGE / OVEN_RESISTANCE) * power / 100
-            heat_flow = amperage * MAINS_VOLTAGE * AGG_TIME  # Модель расчитана на период дискретизации в 5 секунд
+    def __init__(self):
+        super().__init__()
+        self.logger = logging.getLogger("PIDSimulationsLogger")
+        # Отмена устанавливается из GUI-потока, проверяется между пакетами прогонов
+        self.cancel_event = threading.Event()
 
-            # Вычисление новой температуры через 5 секунд
-            desired_temperature_change = get_dt(heat_flow, power, current_temperature, A1, A2, A3, B1, B2, K_COEFF)
+    def cancel(self):
+        self.cancel_event.set()
 
-            # Вычисление изменения температуры через 1 секунду
-            delta_t = (desired_temperature_change - current_temperature) / AGG_TIME
-            # Размазываем изменение во времени. Пересчет на инерциальность печи
-            per_step_contribution = delta_t / inertia_steps
+    @pyqtSlot(dict)
+    @log_exceptions
+    def request_slot(self, data: dict):
+        self.logger.info(f"Received data for robustness analysis: {data}")
 
-            # Обновление очереди тепловой инерции
-            if len(contributions_queue) >= inertia_steps:
-                contributions_queue.pop(0)
-            contributions_queue.append(per_step_contribution)
+        result = robustness_analysis(
+            data,
+            samples=data.get("samples", ROBUSTNESS_SAMPLES),
+            on_update=lambda partial: self.robustness_bands_signal.emit(partial.as_payload()),
+            cancel_event=self.cancel_event,
+        )
+        self.logger.info(f"Robustness analysis finished: {result.samples} of {result.total_samples} samples")
+        self.robustness_finished_signal.emit(not self.cancel_event.is_set())
 
-            # Вычисление суммарного изменения температуры
-            total_delta = sum(contributions_queue)
 
-            # Обновление текущей температуры
-            new_temperature = current_temperature + total_delta
-            oven_temperatures.append(new_temperature)
+class PIDStabilityMap(QObject):
+    # Текущая карта метрики (StabilityMap.as_payload), отправляется после каждого пакета точек
+    stability_map_signal = pyqtSignal(dict)
+    # Завершение построения карты: True - все точки рассчитаны, False - отменено
+    stability_map_finished_signal = pyqtSignal(bool)
 
-            current_temperature = new_temperature
-            previous_error = error
+    def __init__(self):
+        super().__init__()
+        self.logger = logging.getLogger("PIDSimulationsLogger")
+        # Отмена устанавливается из GUI-потока, проверяется между пакетами точек
+        self.cancel_event = threading.Event()
 
-        return oven_temperatures, errors
+    def cancel(self):
+        self.cancel_event.set()
 
+    @pyqtSlot(dict)
     @log_exceptions
-    def _calculate_target_curve(self, initial_temp, final_temperature, heating_rate, sim_time):
-        current_target_temp = initial_temp
-        target_temperatures = [current_target_temp]
-        increment = heating_rate / 60 * DT  # в градусах на секунду
-
-        for _ in range(sim_time):
-            current_target_temp = min(current_target_temp + increment, final_temperature)
-            target_temperatures.append(current_target_temp)
-        return target_temperatures
+    def request_slot(self, data: dict):
+        self.logger.info(f"Received data for stability map: {data}")
+
+        result = stability_map(
+            data,
+            metric=data.get("metric", "itae"),
+            kp_bounds=data.get("kp_bounds", DEFAULT_GAIN_BOUNDS[0]),
+            ki_bounds=data.get("ki_bounds", DEFAULT_GAIN_BOUNDS[1]),
+            on_update=lambda partial: self.stability_map_signal.emit(partial.as_payload()),
+            cancel_event=self.cancel_event,
+        )
+        self.logger.info(f"Stability map finished: {result.evaluations} of {result.dense_evaluations} grid points")
+        self.stability_map_finished_signal.emit(not self.cancel_event.is_set())
+
+
+class SimulationController(QObject):
+    """
+    Запускает симуляцию и автоподбор в отдельных потоках, чтобы не блокировать интерфейс.
+    Живет в GUI-потоке: его слоты вызываются напрямую и передают запросы рабочим объектам.
+    """
+
+    _tuning_request_signal = pyqtSignal(dict)
+    _robustness_request_signal = pyqtSignal(dict)
+    _stability_map_request_signal = pyqtSignal(dict)
+
+    def __init__(
+        self,
+        simulations: PIDSimulations,
+        tuner: PIDTuner,
+        robustness: PIDRobustness | None = None,
+        stability: PIDStabilityMap | None = None,
+    ):
+        super().__init__()
+        self.simulations = simulations
+        self.tuner = tuner
+        self.robustness = robustness if robustness is not None else PIDRobustness()
+        self.stability = stability if stability is not None else PIDStabilityMap()
+
+        self.simulation_thread = QThread()
+        self.simulations.moveToThread(self.simulation_thread)
+        self.simulation_thread.start()
+
+        self.tuning_thread = QThread()
+        self.tuner.moveToThread(self.tuning_thread)
+        self._tuning_request_signal.connect(self.tuner.request_slot)
+        # Проверка устойчивости, как и автоподбор, нагружает пул процессов и выполняется в том же потоке
+        self.robustness.moveToThread(self.tuning_thread)
+        self._robustness_request_signal.connect(self.robustness.request_slot)
+        self.stability.moveToThread(self.tuning_thread)
+        self._stability_map_request_signal.connect(self.stability.request_slot)
+        self.tuning_thread.start()
 
     @pyqtSlot(dict)
     def request_slot(self, data: dict):
-        self.logger.info(f"Received data for simulation: {data}")
-
-        # Получение данных из входного словаря
-        self.initial_temp = data.get("initial_temp", 0)
-        self.final_temp = data.get("final_temp", 0)
-        self.heating_rate = data.get("heating_rate", 0)
-        self.sim_time = data.get("sim_time", 0)
-        self.kp = data.get("kp", 0)
-        self.ki = data.get("ki", 0)
-        self.kd = data.get("kd", 0)
-        self.thermal_inertia_coeff = data.get("thermal_inertia_coeff", 1)
-
-        num_steps = int(self.sim_time / DT)
-        time_array = [i * DT for i in range(num_steps + 1)]
-        target_temperatures = self._calculate_target_curve(self.initial_temp, self.final_temp, self.heating_rate, num_steps)
-
-        oven_temperatures, errors = self._calculate_oven_temperature(
-            self.initial_temp, target_temperatures, self.kp, self.ki, self.kd, DT, num_steps, self.thermal_inertia_coeff
-        )
+        # Новый запрос заменяет выполняющийся расчет
+        self.simulations.submit(data)
+
+    @pyqtSlot(dict)
+    def tuning_request_slot(self, data: dict):
+        self._tuning_request_signal.emit(data)
 
-        self.simulations_data_signal.emit({"x": time_array, "y": oven_temperatures, "label": "температура_печи"})
-        self.simulations_data_signal.emit({"x": time_array, "y": target_temperatures, "label": "целевая_температура"})
-        self.simulations_data_signal.emit({"x": time_array, "y": errors, "label": "значение_ошибки"})
+    @pyqtSlot(dict)
+    def robustness_request_slot(self, data: dict):
+        # Отмена сбрасывается при отправке запроса, а не в начале расчета: иначе отмена, нажатая,
+        # пока запрос ждет в очереди рабочего потока, была бы потеряна
+        self.robustness.cancel_event.clear()
+        self._robustness_request_signal.emit(data)
+
+    @pyqtSlot(dict)
+    def stability_map_request_slot(self, data: dict):
+        # Как и у проверки устойчивости, отмена сбрасывается при отправке запроса
+        self.stability.cancel_event.clear()
+        self._stability_map_request_signal.emit(data)
+
+    @pyqtSlot()
+    def cancel_slot(self):
+        self.simulations.cancel()
+        self.robustness.cancel()
+        self.stability.cancel()
+
+    @pyqtSlot()
+    def shutdown(self):
+        self.simulations.cancel()
+        self.robustness.cancel()
+        self.stability.cancel()
+        for thread in (self.simulation_thread, self.tuning_thread):
+            # Автоподбор не прерывается, поэтому выход дожидается его завершения
+            thread.quit()
+            thread.wait()
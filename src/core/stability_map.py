@@ -0,0 +1,208 @@
+"""
+Карта качества регулирования на плоскости kp–ki при фиксированном kd.
+
+Метрика (функция стоимости из core.tuning или размах незатухающих колебаний) считается сначала
+на грубой сетке, затем ячейки, в углах которых метрика заметно различается, делятся на четыре
+(квадродерево) до заданной глубины. Гладкие области заполняются билинейной интерполяцией по углам,
+поэтому картина близка к плотной сетке при доле ее прогонов. Точки считаются пакетами
+векторизованного движка в пуле процессов, изображение обновляется по мере готовности пакетов.
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+import numpy as np
+
+from core.tuning import COST_FUNCTIONS, DEFAULT_GAIN_BOUNDS, GRID_CHUNK_SIZE, TuningProblem, evaluate_gains
+
+# Точек грубой сетки по каждой оси и количество делений ячеек пополам
+STABILITY_MAP_COARSE_POINTS = 9
+STABILITY_MAP_DEPTH = 4
+# Ячейка делится, если размах метрики в ее углах больше этой доли диапазона цветовой шкалы
+STABILITY_MAP_TOLERANCE = 0.05
+# Процентили значений метрики, задающие диапазон цветовой шкалы (выбросы не растягивают шкалу)
+STABILITY_MAP_COLOR_PERCENTILES = (5, 95)
+# Доля симуляции в конце, по которой оценивается размах незатухающих колебаний
+DIVERGENCE_TAIL = 0.25
+
+
+def divergence_metric(problem, temperatures, errors, gains):
+    # Размах ошибки на последней четверти симуляции: у устойчивой настройки близок к нулю
+    tail = errors[:, int(errors.shape[1] * (1 - DIVERGENCE_TAIL)) :]
+    return np.ptp(tail, axis=1)
+
+
+STABILITY_METRICS = {**COST_FUNCTIONS, "divergence": divergence_metric}
+
+
+@dataclass
+class StabilityMap:
+    kp: np.ndarray  # значения kp по строкам изображения
+    ki: np.ndarray  # значения ki по столбцам изображения
+    image: np.ndarray  # метрика (kp, ki), NaN - еще не рассчитано, inf - расходящийся прогон
+    evaluated: np.ndarray  # маска рассчитанных точек
+    metric: str
+    kd: float
+    evaluations: int
+    dense_evaluations: int  # прогонов плотной сетки того же разрешения
+
+    def as_payload(self):
+        # Словарь для StabilityMapCanvas.plot_map
+        finite = self.image[np.isfinite(self.image)]
+        limits = np.percentile(finite, STABILITY_MAP_COLOR_PERCENTILES) if finite.size else (0.0, 1.0)
+        return {
+            "kp": self.kp,
+            "ki": self.ki,
+            "image": self.image,
+            "color_limits": tuple(float(limit) for limit in limits),
+            "metric": self.metric,
+            "kd": self.kd,
+            "evaluations": self.evaluations,
+            "dense_evaluations": self.dense_evaluations,
+        }
+
+
+class AdaptiveLattice:
+    """
+    Решетка точек самого мелкого разрешения и квадродерево ячеек на ней. Ячейка (i, j, size)
+    покрывает узлы i..i+size по kp и j..j+size по ki; рассчитываются только углы ячеек.
+    """
+
+    def __init__(self, coarse_points, depth):
+        self.cell_size = 2**depth
+        self.size = (coarse_points - 1) * self.cell_size + 1
+        self.values = np.full((self.size, self.size), np.nan)
+        self.image = np.full((self.size, self.size), np.nan)
+        self.evaluated = np.zeros((self.size, self.size), dtype=bool)
+        starts = range(0, self.size - 1, self.cell_size)
+        self.cells = [(i, j, self.cell_size) for i in starts for j in starts]
+
+    @staticmethod
+    def corners(cell):
+        i, j, size = cell
+        return [(i, j), (i, j + size), (i + size, j), (i + size, j + size)]
+
+    def missing_points(self, cells):
+        # Нерассчитанные углы ячеек без повторов
+        points = {point for cell in cells for point in self.corners(cell)}
+        return sorted(point for point in points if not self.evaluated[point])
+
+    def store(self, points, values):
+        rows, columns = np.array(points).T
+        self.values[rows, columns] = values
+        self.evaluated[rows, columns] = True
+
+    def fill_ready(self, cells):
+        # Заполняет изображение ячеек, все углы которых рассчитаны; возвращает остальные
+        waiting = []
+        for cell in cells:
+            if all(self.evaluated[point] for point in self.corners(cell)):
+                self._fill(cell)
+            else:
+                waiting.append(cell)
+        return waiting
+
+    def _fill(self, cell):
+        i, j, size = cell
+        c00, c01, c10, c11 = (self.values[point] for point in self.corners(cell))
+        u = np.linspace(0.0, 1.0, size + 1)[:, None]
+        v = np.linspace(0.0, 1.0, size + 1)[None, :]
+        if np.isfinite([c00, c01, c10, c11]).all():
+            block = (1 - u) * ((1 - v) * c00 + v * c01) + u * ((1 - v) * c10 + v * c11)
+        else:
+            # Граница области расхождения: каждый узел получает значение ближайшего угла
+            block = np.where(u < 0.5, np.where(v < 0.5, c00, c01), np.where(v < 0.5, c10, c11))
+        self.image[i : i + size + 1, j : j + size + 1] = block
+
+    def _needs_split(self, cell, low, high, tolerance):
+        corners = np.array([self.values[point] for point in self.corners(cell)])
+        finite = np.isfinite(corners)
+        if not finite.all():
+            # Граница области расхождения делится, область целиком расходящихся прогонов - нет
+            return bool(finite.any())
+        if high <= low:
+            return False
+        return np.ptp(np.clip(corners, low, high)) / (high - low) > tolerance
+
+    def refine(self, tolerance):
+        """
+        Делит ячейки с заметным размахом метрики в углах и возвращает новые ячейки.
+        """
+        finite = self.values[self.evaluated & np.isfinite(self.values)]
+        if finite.size:
+            low, high = np.percentile(finite, STABILITY_MAP_COLOR_PERCENTILES)
+        else:
+            low, high = 0.0, 0.0
+        children = []
+        for cell in self.cells:
+            i, j, size = cell
+            if size > 1 and self._needs_split(cell, low, high, tolerance):
+                half = size // 2
+                children.extend((i + di, j + dj, half) for di in (0, half) for dj in (0, half))
+        self.cells = children
+        return children
+
+
+def stability_map(
+    params: dict,
+    metric="itae",
+    kp_bounds=DEFAULT_GAIN_BOUNDS[0],
+    ki_bounds=DEFAULT_GAIN_BOUNDS[1],
+    coarse_points=STABILITY_MAP_COARSE_POINTS,
+    depth=STABILITY_MAP_DEPTH,
+    tolerance=STABILITY_MAP_TOLERANCE,
+    batch_size=GRID_CHUNK_SIZE,
+    max_workers=None,
+    on_update=None,
+    cancel_event=None,
+):
+    """
+    Строит карту метрики на плоскости kp–ki для kd и параметров симуляции из params (словарь как
+    у request_slot). После каждого рассчитанного пакета точек вызывается on_update(StabilityMap).
+    При установленном cancel_event расчет прерывается и возвращается карта по уже рассчитанным точкам.
+    """
+    if metric not in STABILITY_METRICS:
+        raise ValueError(f"Неизвестная метрика карты: {metric}")
+    problem = TuningProblem.from_params(params)
+    kd = float(params.get("kd", 0))
+    lattice = AdaptiveLattice(coarse_points, depth)
+    kp_axis = np.linspace(*kp_bounds, lattice.size)
+    ki_axis = np.linspace(*ki_bounds, lattice.size)
+
+    def current_map():
+        return StabilityMap(
+            kp=kp_axis,
+            ki=ki_axis,
+            image=lattice.image.copy(),
+            evaluated=lattice.evaluated.copy(),
+            metric=metric,
+            kd=kd,
+            evaluations=int(lattice.evaluated.sum()),
+            dense_evaluations=lattice.size**2,
+        )
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    cells = lattice.cells
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        while cells and not cancelled():
+            points = lattice.missing_points(cells)
+            pending = {}
+            for start in range(0, len(points), batch_size):
+                batch = points[start : start + batch_size]
+                gains = [(kp_axis[i], ki_axis[j], kd) for i, j in batch]
+                pending[executor.submit(evaluate_gains, gains, problem, metric, STABILITY_METRICS)] = batch
+            # Пакеты обрабатываются по мере готовности, изображение дополняется готовыми ячейками
+            while pending and not cancelled():
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    lattice.store(pending.pop(future), future.result())
+                cells = lattice.fill_ready(cells)
+                if on_update is not None:
+                    on_update(current_map())
+            for future in pending:
+                future.cancel()
+            cells = lattice.refine(tolerance)
+    return current_map()
@@ -0,0 +1,237 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from core.batch_simulations import simulate_batch
+from core.calibration import resolve_model
+from core.oven_kernel import DEFAULT_OVEN_MODEL, OvenModel, OvenState, advance, controller_terms
+from core.oven_model import DT
+from core.program import program_from_params, simulation_steps
+
+# Диапазоны поиска коэффициентов (kp, ki, kd) по умолчанию
+DEFAULT_GAIN_BOUNDS = ((0.0, 20.0), (0.0, 1.0), (0.0, 100.0))
+# Полоса установления: доля от величины скачка уставки, но не меньше SETTLING_BAND_MIN градусов
+SETTLING_BAND_RATIO = 0.02
+SETTLING_BAND_MIN = 1.0
+# Размер порции кандидатов, рассчитываемой одним векторизованным прогоном
+GRID_CHUNK_SIZE = 256
+
+
+@dataclass(frozen=True)
+class TuningProblem:
+    """
+    Неизменяемое описание задачи подбора: целевая кривая и параметры печи.
+    Передается в дочерние процессы пула, поэтому содержит только массивы и числа.
+    """
+
+    target_temperatures: np.ndarray
+    initial_temp: float
+    final_temp: float
+    thermal_inertia_coeff: float
+    dt: float = DT
+    model: OvenModel = DEFAULT_OVEN_MODEL
+
+    @classmethod
+    def from_params(cls, data: dict):
+        # Принимает тот же словарь, что и PIDSimulations.request_slot; шаг расчета - как у Simulator.run
+        dt = data.get("time_step") or DT
+        program = program_from_params(data, dt)
+        target_temperatures = program.curve(simulation_steps(data, program, dt))
+        return cls(
+            target_temperatures=target_temperatures,
+            initial_temp=data.get("initial_temp", 0),
+            # Для программы уставки критерии считаются относительно ее конечной уставки
+            final_temp=float(target_temperatures[-1]) if data.get("program") else data.get("final_temp", 0),
+            thermal_inertia_coeff=data.get("thermal_inertia_coeff", 1),
+            dt=dt,
+            model=resolve_model(data)[0],
+        )
+
+    def simulate(self, gains):
+        # Одиночный прогон быстрее считать скалярным ядром, пакет - векторизованным движком
+        gains = np.atleast_2d(np.asarray(gains, dtype=float))
+        if gains.shape[0] == 1:
+            kp, ki, kd = gains[0]
+            state = OvenState.start(self.initial_temp, self.target_temperatures[0], self.dt, self.thermal_inertia_coeff)
+            temperatures, errors = advance(state, self.target_temperatures[:-1], kp, ki, kd, self.dt, self.model)
+            initial_error = self.target_temperatures[0] - self.initial_temp
+            return np.array([[self.initial_temp, *temperatures]]), np.array([[initial_error, *errors]])
+        return simulate_batch(
+            self.initial_temp,
+            self.target_temperatures,
+            gains[:, 0],
+            gains[:, 1],
+            gains[:, 2],
+            self.thermal_inertia_coeff,
+            self.dt,
+            self.model,
+        )
+
+
+@dataclass
+class TuningResult:
+    kp: float
+    ki: float
+    kd: float
+    cost: float
+    cost_name: str
+    strategy: str
+    evaluations: int
+
+    def as_dict(self):
+        return {
+            "kp": self.kp,
+            "ki": self.ki,
+            "kd": self.kd,
+            "cost": self.cost,
+            "cost_name": self.cost_name,
+            "strategy": self.strategy,
+            "evaluations": self.evaluations,
+        }
+
+
+def itae_cost(problem, temperatures, errors, gains):
+    # Интеграл модуля ошибки, взвешенного по времени
+    time_array = np.arange(errors.shape[1]) * problem.dt
+    return np.sum(time_array * np.abs(errors), axis=1) * problem.dt
+
+
+def overshoot_cost(problem, temperatures, errors, gains):
+    # Максимальное превышение уставки final_temp
+    return np.maximum(np.max(temperatures, axis=1) - problem.final_temp, 0)
+
+
+def settling_time_cost(problem, temperatures, errors, gains):
+    # Время, после которого ошибка остается в полосе установления до конца симуляции
+    band = max(SETTLING_BAND_RATIO * abs(problem.final_temp - problem.initial_temp), SETTLING_BAND_MIN)
+    outside = np.abs(errors) > band
+    last_outside = errors.shape[1] - 1 - np.argmax(outside[:, ::-1], axis=1)
+    settling_steps = np.where(outside.any(axis=1), last_outside + 1, 0)
+    return settling_steps * problem.dt
+
+
+def saturation_time_cost(problem, temperatures, errors, gains):
+    # Время, проведенное регулятором на пределах мощности (0% или 100%); первый столбец errors -
+    # начальная ошибка, с которой регулятор стартует так же, как OvenState.start
+    kp, ki, kd = (gains[:, i : i + 1] for i in range(3))
+    initial_errors = errors[:, :1]
+    *_, power = controller_terms(errors[:, 1:], initial_errors * problem.dt, initial_errors, kp, ki, kd, problem.dt)
+    return np.sum((power <= 0) | (power >= 100), axis=1) * problem.dt
+
+
+COST_FUNCTIONS = {
+    "itae": itae_cost,
+    "overshoot": overshoot_cost,
+    "settling_time": settling_time_cost,
+    "saturation_time": saturation_time_cost,
+}
+
+
+def evaluate_gains(gains, problem: TuningProblem, cost_name, cost_functions=COST_FUNCTIONS):
+    """
+    Значения функции стоимости для набора коэффициентов формы (n, 3). Функция берется по имени
+    из cost_functions (например, STABILITY_METRICS карты kp–ki). Расходящиеся прогоны получают
+    бесконечную стоимость.
+    """
+    gains = np.atleast_2d(np.asarray(gains, dtype=float))
+    with np.errstate(all="ignore"):
+        temperatures, errors = problem.simulate(gains)
+        costs = cost_functions[cost_name](problem, temperatures, errors, gains)
+    return np.where(np.isfinite(costs), costs, np.inf)
+
+
+def _evaluate_single(gains, problem, cost_name):
+    return float(evaluate_gains(gains, problem, cost_name)[0])
+
+
+def _evaluate_chunks(executor, candidates, problem, cost_name):
+    # Кандидаты делятся на порции по GRID_CHUNK_SIZE, каждая рассчитывается одним векторизованным прогоном
+    chunks = np.array_split(candidates, max(1, int(np.ceil(len(candidates) / GRID_CHUNK_SIZE))))
+    return np.concatenate(list(executor.map(evaluate_gains, chunks, [problem] * len(chunks), [cost_name] * len(chunks))))
+
+
+def _nelder_mead_from(x0, problem, cost_name, bounds, max_iterations):
+    # scipy импортируется только при подборе, чтобы не замедлять запуск консольной утилиты
+    from scipy.optimize import minimize
+
+    result = minimize(
+        _evaluate_single,
+        x0,
+        args=(problem, cost_name),
+        method="Nelder-Mead",
+        bounds=bounds,
+        options={"maxiter": max_iterations, "xatol": 1e-3, "fatol": 1e-3},
+    )
+    return result.x, float(result.fun), int(result.nfev)
+
+
+def _grid_search(executor, problem, cost_name, bounds, grid_points=7, **_):
+    axes = [np.linspace(low, high, grid_points) for low, high in bounds]
+    candidates = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+    costs = _evaluate_chunks(executor, candidates, problem, cost_name)
+    best = int(np.argmin(costs))
+    return candidates[best], float(costs[best]), len(candidates)
+
+
+def _nelder_mead_search(executor, problem, cost_name, bounds, starts=8, max_iterations=200, seed=None, **_):
+    # Несколько стартовых точек (центр диапазона и случайные), каждая оптимизируется в своем процессе
+    rng = np.random.default_rng(seed)
+    low, high = np.array(bounds, dtype=float).T
+    start_points = [(low + high) / 2, *rng.uniform(low, high, size=(max(starts - 1, 0), 3))]
+    futures = [executor.submit(_nelder_mead_from, x0, problem, cost_name, bounds, max_iterations) for x0 in start_points]
+    results = [future.result() for future in futures]
+    best_x, best_cost, _ = min(results, key=lambda item: item[1])
+    return best_x, best_cost, sum(item[2] for item in results)
+
+
+def _evolution_search(executor, problem, cost_name, bounds, max_iterations=50, population_size=15, seed=None, **_):
+    from scipy.optimize import differential_evolution
+
+    evaluations = 0
+
+    def evaluate_population(population):
+        # С vectorized=True поколение передается целиком в форме (3, S) и рассчитывается порциями, как сетка
+        nonlocal evaluations
+        evaluations += population.shape[1]
+        return _evaluate_chunks(executor, population.T, problem, cost_name)
+
+    result = differential_evolution(
+        evaluate_population,
+        bounds,
+        maxiter=max_iterations,
+        popsize=population_size,
+        seed=seed,
+        polish=False,
+        vectorized=True,
+        updating="deferred",
+    )
+    return result.x, float(result.fun), evaluations
+
+
+STRATEGIES = {
+    "grid": _grid_search,
+    "nelder_mead": _nelder_mead_search,
+    "evolution": _evolution_search,
+}
+
+
+def tune_pid(params: dict, cost="itae", strategy="grid", bounds=DEFAULT_GAIN_BOUNDS, max_workers=None, **options):
+    """
+    Подбирает коэффициенты kp, ki, kd для параметров симуляции params (словарь как у request_slot).
+    Кандидаты рассчитываются параллельно в пуле процессов. Дополнительные параметры стратегий:
+    grid_points (сетка), starts и max_iterations (Нелдер-Мид), max_iterations, population_size и seed
+    (эволюционный поиск).
+    """
+    if cost not in COST_FUNCTIONS:
+        raise ValueError(f"Неизвестная функция стоимости: {cost}")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Неизвестная стратегия подбора: {strategy}")
+
+    problem = TuningProblem.from_params(params)
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        best_gains, best_cost, evaluations = STRATEGIES[strategy](executor, problem, cost, bounds, **options)
+
+    kp, ki, kd = (float(value) for value in best_gains)
+    return TuningResult(kp, ki, kd, best_cost, cost, strategy, evaluations)
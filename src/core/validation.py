@@ -0,0 +1,155 @@
+"""
+Проверка модели печи по записанным кривым нагрева.
+
+Каждая кривая воспроизводится моделью без регулятора при постоянной мощности эксперимента,
+все файлы рассчитываются одним векторизованным прогоном. Файлы читаются потоково порциями
+по chunk_rows строк, поэтому длинные журналы промышленных печей не загружаются в память целиком.
+"""
+
+import argparse
+import json
+import logging
+import sys
+from dataclasses import asdict, dataclass
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+from core.experiments import EXPERIMENTS_DIR, experiment_paths, power_from_filename, replay_open_loop
+from core.oven_kernel import DEFAULT_OVEN_MODEL, OvenModel
+from core.oven_model import AGG_TIME
+
+# Количество строк файла, читаемых за одну порцию
+VALIDATION_CHUNK_ROWS = 100_000
+
+
+@dataclass
+class PowerValidation:
+    power: int
+    rmse: float
+    max_deviation: float
+    samples: int
+    sources: list[str]
+
+
+def stream_experiment(path, agg_time=AGG_TIME, chunk_rows=VALIDATION_CHUNK_ROWS):
+    """
+    Потоково читает файл эксперимента и выдает порции средних температур по интервалам agg_time
+    секунд - тот же результат, что и experiments.aggregate для всего файла. Время в файле должно
+    возрастать; интервал, попавший на границу порций, выдается один раз с учетом обеих частей.
+    """
+    carry = None  # (номер интервала, сумма, количество) незавершенного последнего интервала
+    with open(path, encoding="utf-8") as stream:
+        while True:
+            lines = list(islice(stream, chunk_rows))
+            if not lines:
+                break
+            data = np.loadtxt(lines, delimiter=",", ndmin=2)
+            bins, inverse = np.unique((data[:, 0] // agg_time).astype(np.int64), return_inverse=True)
+            sums = np.bincount(inverse, weights=data[:, 1])
+            counts = np.bincount(inverse).astype(float)
+
+            finished = []
+            if carry is not None:
+                if carry[0] == bins[0]:
+                    sums[0] += carry[1]
+                    counts[0] += carry[2]
+                else:
+                    finished.append(carry[1] / carry[2])
+            carry = (bins[-1], sums[-1], counts[-1])
+            yield np.concatenate([finished, sums[:-1] / counts[:-1]])
+    if carry is not None:
+        yield np.array([carry[1] / carry[2]])
+
+
+def validate_model(
+    model: OvenModel = DEFAULT_OVEN_MODEL, paths=None, directory=EXPERIMENTS_DIR, chunk_rows=VALIDATION_CHUNK_ROWS
+):
+    """
+    Воспроизводит все эксперименты при постоянной мощности и возвращает RMSE и максимальное
+    отклонение модели от измерений для каждого уровня мощности (список PowerValidation).
+    """
+    paths = [Path(path) for path in (paths if paths is not None else experiment_paths(directory))]
+    powers = np.array([power_from_filename(path) for path in paths], dtype=float)
+    coefficients = np.array([model.a1, model.a2, model.a3, model.b1, model.b2, model.k_coeff])
+
+    streams = [stream_experiment(path, chunk_rows=chunk_rows) for path in paths]
+    active = np.ones(len(paths), dtype=bool)
+    temperatures = np.full(len(paths), np.nan)  # Текущая расчетная температура каждого ряда
+    squared_error = np.zeros(len(paths))
+    max_deviation = np.zeros(len(paths))
+    samples = np.zeros(len(paths), dtype=np.int64)
+
+    while active.any():
+        # Следующая порция каждого активного файла, короткие порции дополняются NaN
+        rows = np.flatnonzero(active)
+        chunks = [next(streams[row], None) for row in rows]
+        active[rows[[chunk is None for chunk in chunks]]] = False
+        rows, chunks = rows[active[rows]], [chunk for chunk in chunks if chunk is not None]
+        if not chunks:
+            break
+        lengths = np.array([len(chunk) for chunk in chunks])
+        measured = np.full((len(rows), lengths.max()), np.nan)
+        for position, chunk in enumerate(chunks):
+            measured[position, : len(chunk)] = chunk
+
+        # Первая порция ряда начинается с измеренной температуры, следующие - с расчетной
+        initial = np.where(np.isnan(temperatures[rows]), measured[:, 0], temperatures[rows])
+        heat_flows = np.broadcast_to(powers[rows, None] * model.heat_flow_per_percent, measured.shape)
+        predicted = replay_open_loop(coefficients, powers[rows], heat_flows, initial, model.c1, model.c2)
+
+        deviation = np.abs(predicted - measured)
+        squared_error[rows] += np.nansum(deviation**2, axis=1)
+        max_deviation[rows] = np.fmax(max_deviation[rows], np.nanmax(deviation, axis=1, initial=0.0))
+        samples[rows] += lengths
+        filled = lengths > 0
+        temperatures[rows[filled]] = predicted[filled, lengths[filled] - 1]
+
+    # Несколько файлов с одной мощностью объединяются в одну строку отчета
+    report = []
+    for power in np.unique(powers):
+        same_power = powers == power
+        count = int(samples[same_power].sum())
+        report.append(
+            PowerValidation(
+                power=int(power),
+                rmse=float(np.sqrt(squared_error[same_power].sum() / count)) if count else float("nan"),
+                max_deviation=float(max_deviation[same_power].max()),
+                samples=count,
+                sources=[path.name for path, selected in zip(paths, same_power, strict=True) if selected],
+            )
+        )
+    return report
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pid-sim-validate", description="Проверка модели печи по экспериментальным кривым нагрева"
+    )
+    parser.add_argument("paths", nargs="*", help="файлы экспериментов (по умолчанию - все *_percent.csv из --data-dir)")
+    parser.add_argument("-d", "--data-dir", default=str(EXPERIMENTS_DIR), help="каталог с файлами *_percent.csv")
+    parser.add_argument("-f", "--furnace", help="печь, калибровка которой проверяется (по умолчанию - core.oven_model)")
+    parser.add_argument("-m", "--model-version", type=int, help="версия калибровки (по умолчанию - последняя)")
+    parser.add_argument("--models-dir", help="каталог сохраненных калибровок")
+    parser.add_argument("--chunk-rows", type=int, default=VALIDATION_CHUNK_ROWS, help="строк файла в одной порции")
+    parser.add_argument("-v", "--verbose", action="store_true", help="выводить журнал в stderr")
+    return parser
+
+
+def main(argv=None):
+    # core.calibration сам импортирует этот модуль, поэтому импорт выполняется при запуске
+    from core.calibration import MODELS_DIR, resolve_model
+
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr)
+
+    model, _ = resolve_model({"furnace": args.furnace, "model_version": args.model_version}, args.models_dir or MODELS_DIR)
+    report = validate_model(model, paths=args.paths or None, directory=args.data_dir, chunk_rows=args.chunk_rows)
+    for row in report:
+        sys.stdout.write(json.dumps(asdict(row), ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
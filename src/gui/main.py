@@ -1,20 +1,19 @@
+import logging
+import multiprocessing
 import os
 import sys
+import time
 
-from PyQt6.QtCore import Qt
-from PyQt6.QtWidgets import QApplication, QHBoxLayout, QMainWindow, QSplitter, QWidget
-
-from src.core.logger_config import setup_logger
-from src.core.simulatons import PIDSimulations
-from src.gui.plot_canvas import PlotCanvas
-from src.gui.side_bar import SideBar
-
-# Добавляем путь к корневой директории проекта
-current_dir = os.path.dirname(os.path.abspath(__file__))
-src_dir = os.path.dirname(os.path.dirname(current_dir))
-if src_dir not in sys.path:
-    sys.path.append(src_dir)
+from PyQt6.QtCore import Qt, QTimer, pyqtSlot
+from PyQt6.QtWidgets import QApplication, QHBoxLayout, QLabel, QMainWindow, QSplitter, QTabWidget, QWidget
 
+from core.instrumentation import StageTimer
+from core.logger_config import setup_logger
+from core.simulatons import PIDRobustness, PIDSimulations, PIDStabilityMap, PIDTuner, SimulationController
+from gui.plot_backend import load_plot_stack
+from gui.plot_canvas import PlotCanvas
+from gui.side_bar import SideBar
+from gui.stability_map_canvas import StabilityMapCanvas
 
 MIN_WIDTH_SIDEBAR = 80
 MIN_WIDTH_PLOTCANVAS = 300
@@ -22,6 +21,19 @@ MIN_HEIGHT_MAINWINDOW = 300
 SPLITTER_WIDTH = 50
 COMPONENTS_MIN_WIDTH = MIN_WIDTH_SIDEBAR + MIN_WIDTH_PLOTCANVAS
 
+# Подписи этапов расчета в строке состояния (см. core.instrumentation)
+STAGE_LABELS = {
+    "cache": "кэш",
+    "target_curve": "целевая кривая",
+    "step_loop": "цикл",
+    "emit": "передача",
+    "plot_redraw": "отрисовка",
+}
+# Путь к журналу замеров этапов в формате JSON Lines; если переменная не задана, журнал не ведется
+TIMINGS_LOG_ENV = "PID_SIM_TIMINGS_LOG"
+# Задержка загрузки matplotlib после показа окна, мс: окно успевает отрисоваться до долгого импорта
+PLOT_STACK_DELAY_MS = 50
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -44,24 +56,118 @@ class MainWindow(QMainWindow):
         self.plot_canvas = PlotCanvas()  # Убираем передачу ширины
         self.plot_canvas.setMinimumWidth(MIN_WIDTH_PLOTCANVAS)  # Устанавливаем минимальную ширину через метод
 
+        # График симуляции и карта kp–ki на отдельных вкладках
+        self.stability_map_canvas = StabilityMapCanvas()
+        self.tabs = QTabWidget()
+        self.tabs.addTab(self.plot_canvas, "Симуляция")
+        self.tabs.addTab(self.stability_map_canvas, "Карта kp–ki")
+
         # Add widgets to splitter
         splitter.addWidget(self.side_bar)
-        splitter.addWidget(self.plot_canvas)
+        splitter.addWidget(self.tabs)
 
         # Add splitter to layout
         layout.addWidget(splitter)
 
+        # Строка состояния с замерами последнего расчета и последней перерисовки
+        self.stage_timings: dict[str, dict] = {}
+        self.timings_label = QLabel()
+        self.statusBar().addPermanentWidget(self.timings_label)
+        self.plot_canvas.timings_signal.connect(self.show_timings)
+
+    def load_plots(self, startup: StageTimer, started: float):
+        """
+        Загружает стек графиков и создает фигуры холстов, затем выводит отчет о запуске: время каждого
+        этапа и каждого импорта matplotlib. started - момент начала main по time.perf_counter.
+        """
+        load_plot_stack(startup)
+        with startup.measure("plot_figures"):
+            self.plot_canvas.ensure_figure()
+            self.stability_map_canvas.ensure_figure()
+        ready_seconds = time.perf_counter() - started
+        startup.log(ready_seconds=ready_seconds)
+
+        report = ", ".join(f"{stage} {timing.seconds * 1000:.1f} ms" for stage, timing in startup.stages.items())
+        logging.getLogger("PIDSimulationsLogger").info(f"Startup: {report}; plots ready after {ready_seconds * 1000:.0f} ms")
+
+    @pyqtSlot()
+    def show_stability_map(self):
+        self.tabs.setCurrentWidget(self.stability_map_canvas)
+
+    @pyqtSlot()
+    def show_plot(self):
+        self.tabs.setCurrentWidget(self.plot_canvas)
+
+    @pyqtSlot(dict)
+    def show_timings(self, timings: dict):
+        if timings["event"] == "simulation":
+            # Новый расчет заменяет замеры предыдущего, замер последней перерисовки остается
+            self.stage_timings = (
+                {"plot_redraw": self.stage_timings["plot_redraw"]} if "plot_redraw" in self.stage_timings else {}
+            )
+        self.stage_timings.update(timings["stages"])
+
+        parts = []
+        for stage, label in STAGE_LABELS.items():
+            timing = self.stage_timings.get(stage)
+            if timing is not None:
+                part = f"{label}: {timing['seconds'] * 1000:.1f} мс, {timing['retained_blocks']:+d} блоков удержано"
+                # Пик памяти этапа известен, только если включен журнал замеров (tracemalloc)
+                if timing.get("peak_bytes") is not None:
+                    part += f", пик {timing['peak_bytes'] / 2**20:.1f} МБ"
+                parts.append(part)
+        self.timings_label.setText(" | ".join(parts))
 
-def main():
-    app = QApplication(sys.argv)
-    setup_logger()
-    window = MainWindow()
-    simulations = PIDSimulations()
 
-    window.side_bar.simulation_coeffs_signal.connect(simulations.request_slot)
+def main():
+    # В собранном PyInstaller приложении процессы пулов (автоподбор, проверка устойчивости, карта kp–ki)
+    # запускают тот же исполняемый файл; без этого вызова каждый из них снова открывал бы окно
+    multiprocessing.freeze_support()
+    # Замеры запуска. Импорты модуля (PyQt6, NumPy, core) подробно показывает python -X importtime
+    started = time.perf_counter()
+    startup = StageTimer("startup")
+    with startup.measure("qt_application"):
+        app = QApplication(sys.argv)
+    setup_logger(timings_log=os.environ.get(TIMINGS_LOG_ENV))
+    with startup.measure("main_window"):
+        window = MainWindow()
+    with startup.measure("workers"):
+        simulations = PIDSimulations()
+        tuner = PIDTuner()
+        robustness = PIDRobustness()
+        stability = PIDStabilityMap()
+        # Расчеты выполняются в рабочих потоках контроллера
+        controller = SimulationController(simulations, tuner, robustness, stability)
+    app.aboutToQuit.connect(controller.shutdown)
+
+    window.side_bar.simulation_coeffs_signal.connect(controller.request_slot)
+    window.side_bar.cancel_signal.connect(controller.cancel_slot)
     simulations.simulations_data_signal.connect(window.plot_canvas.plot_data)
-
-    window.show()
+    # Кривая завершенного расчета переходит в историю сравнения при запуске следующего
+    window.side_bar.simulation_coeffs_signal.connect(window.plot_canvas.start_run)
+    simulations.simulation_finished_signal.connect(window.plot_canvas.finish_run)
+    simulations.simulation_progress_signal.connect(window.side_bar.on_progress)
+    simulations.simulation_finished_signal.connect(window.side_bar.on_simulation_finished)
+    simulations.simulation_timings_signal.connect(window.show_timings)
+    window.side_bar.tuning_request_signal.connect(controller.tuning_request_slot)
+    tuner.tuning_result_signal.connect(window.side_bar.on_tuning_result)
+    # Полосы устойчивости относятся к конкретным параметрам и убираются при новом расчете
+    window.side_bar.robustness_request_signal.connect(controller.robustness_request_slot)
+    window.side_bar.simulation_coeffs_signal.connect(window.plot_canvas.clear_bands)
+    robustness.robustness_bands_signal.connect(window.plot_canvas.plot_bands)
+    robustness.robustness_finished_signal.connect(window.side_bar.on_robustness_finished)
+    # Карта kp–ki строится на своей вкладке; щелчок по карте переносит kp и ki в боковую панель
+    window.side_bar.stability_map_request_signal.connect(controller.stability_map_request_slot)
+    window.side_bar.stability_map_request_signal.connect(window.show_stability_map)
+    stability.stability_map_signal.connect(window.stability_map_canvas.plot_map)
+    stability.stability_map_finished_signal.connect(window.side_bar.on_stability_map_finished)
+    window.stability_map_canvas.gains_selected_signal.connect(window.side_bar.on_map_gains_selected)
+    window.stability_map_canvas.gains_selected_signal.connect(window.show_plot)
+
+    with startup.measure("window_show"):
+        window.show()
+    # matplotlib загружается после показа окна; данные, пришедшие раньше, загрузят его сами
+    QTimer.singleShot(PLOT_STACK_DELAY_MS, lambda: window.load_plots(startup, started))
     sys.exit(app.exec())
 
 
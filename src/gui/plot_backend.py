@@ -0,0 +1,65 @@
+"""
+Отложенная загрузка matplotlib для холстов графиков.
+
+Импорт matplotlib и бэкенда QtAgg занимает большую часть времени запуска, поэтому модули холстов
+не импортируют их при загрузке. Стек графиков загружается один раз при создании первой фигуры:
+главное окно делает это сразу после показа, а пришедшие раньше данные вызывают загрузку сами.
+"""
+
+import importlib
+import logging
+
+from core.instrumentation import StageTimer
+
+CANVAS_BIG_SIZE = 12
+CANVAS_MEDIUM_SIZE = 10
+CANVAS_SMALL_SIZE = 8
+
+# Надпись на месте графика, пока загружается matplotlib
+LOADING_TEXT = "Загрузка графиков…"
+
+# Модули стека графиков в порядке загрузки; каждый импорт замеряется отдельным этапом
+PLOT_STACK_MODULES = (
+    "matplotlib",
+    "matplotlib.style",
+    "matplotlib.figure",
+    "matplotlib.lines",
+    "matplotlib.colors",
+    "matplotlib.backends.backend_qtagg",
+)
+PLOT_STYLE = "seaborn-v0_8-darkgrid"
+# Размеры шрифтов поверх стиля: основной, заголовки и подписи осей, метки осей, легенда, заголовок фигуры
+PLOT_RC_PARAMS = {
+    "font.size": CANVAS_MEDIUM_SIZE,
+    "axes.titlesize": CANVAS_BIG_SIZE,
+    "axes.labelsize": CANVAS_MEDIUM_SIZE,
+    "xtick.labelsize": CANVAS_SMALL_SIZE,
+    "ytick.labelsize": CANVAS_SMALL_SIZE,
+    "legend.fontsize": CANVAS_SMALL_SIZE,
+    "figure.titlesize": CANVAS_BIG_SIZE,
+}
+
+_style_applied = False
+
+
+def load_plot_stack(timer: StageTimer | None = None):
+    """
+    Импортирует модули matplotlib (уже загруженные берутся из sys.modules) и один раз применяет
+    стиль графиков. Если передан timer, импорт каждого модуля и настройка стиля замеряются отдельно.
+    Возвращает {имя модуля: модуль}.
+    """
+    global _style_applied
+    timer = timer or StageTimer("plot_stack")
+    modules = {}
+    for name in PLOT_STACK_MODULES:
+        with timer.measure(f"import {name}"):
+            modules[name] = importlib.import_module(name)
+
+    if not _style_applied:
+        with timer.measure("plot_style"):
+            # Стиль меняет глобальные rcParams, поэтому применяется до создания первой фигуры
+            modules["matplotlib.style"].use([PLOT_STYLE])
+            modules["matplotlib"].rcParams.update(PLOT_RC_PARAMS)
+        _style_applied = True
+        logging.getLogger("PIDSimulationsLogger").debug("Plot stack loaded")
+    return modules
@@ -1,77 +1,382 @@
 import logging
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.backends.backend_qtagg import NavigationToolbar2QT as NavigationToolbar
-from matplotlib.figure import Figure
-from matplotlib.lines import Line2D
-from PyQt6.QtCore import pyqtSlot
-from PyQt6.QtWidgets import QVBoxLayout, QWidget
+import numpy as np
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal, pyqtSlot
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import QHBoxLayout, QLabel, QListWidget, QListWidgetItem, QSpinBox, QVBoxLayout, QWidget
 
-from core.simulatons import log_exceptions
+from core.decimation import lttb, visible_slice
+from core.instrumentation import StageTimer
+from core.logger_config import log_exceptions
+from core.run_history import RUN_HISTORY_MEMORY_BUDGET, RUN_HISTORY_SIZE, RunHistory
+from core.simulation_result import PLOT_LABELS, SimulationResult
+from gui.plot_backend import LOADING_TEXT, load_plot_stack
 
-CANVAS_BIG_SIZE = 12
-CANVAS_MEDIUM_SIZE = 10
-CANVAS_SMALL_SIZE = 8
+if TYPE_CHECKING:
+    from matplotlib.lines import Line2D
+
+# Количество отображаемых точек линии на пиксель ширины области графика
+PLOT_POINTS_PER_PIXEL = 2
+MIN_PLOT_POINTS = 500
+
+# Стили линий истории расчетов: цвета после цветов линий текущего расчета и штриховки.
+# Количества взаимно просты, поэтому сочетания повторяются только через 21 расчет
+HISTORY_COLORS = ("C3", "C4", "C5", "C6", "C7", "C8", "C9")
+HISTORY_LINESTYLES = ("--", "-.", ":")
+MAX_HISTORY_SIZE = 50
+HISTORY_LIST_HEIGHT = 90
 
 
 class PlotCanvas(QWidget):
-    def __init__(self, parent: Optional[QWidget] = None):
+    # Замеры каждой перерисовки (StageTimer.as_dict)
+    timings_signal = pyqtSignal(dict)
+
+    def __init__(
+        self,
+        parent: Optional[QWidget] = None,
+        history_size=RUN_HISTORY_SIZE,
+        history_memory_budget=RUN_HISTORY_MEMORY_BUDGET,
+    ):
         super().__init__(parent)
         self.logger = logging.getLogger("PIDSimulationsLogger")
 
-        # Настройка стиля matplotlib
-        plt.style.use(["seaborn-v0_8-darkgrid"])  # Используем встроенный стиль вместо science
-        plt.rc("font", size=CANVAS_MEDIUM_SIZE)  # Основной размер шрифта
-        plt.rc("axes", titlesize=CANVAS_BIG_SIZE)  # Размер шрифта заголовков осей
-        plt.rc("axes", labelsize=CANVAS_MEDIUM_SIZE)  # Размер шрифта меток осей
-        plt.rc("xtick", labelsize=CANVAS_SMALL_SIZE)  # Размер шрифта меток по оси X
-        plt.rc("ytick", labelsize=CANVAS_SMALL_SIZE)  # Размер шрифта меток по оси Y
-        plt.rc("legend", fontsize=CANVAS_SMALL_SIZE)  # Размер шрифта легенды
-        plt.rc("figure", titlesize=CANVAS_BIG_SIZE)  # Размер шрифта заголовка фигуры
-
-        # Создание фигуры matplotlib и холста
-        self.figure = Figure()
-        self.canvas = FigureCanvas(self.figure)
-        self.axes = self.figure.add_subplot(111)  # Добавляем начальную область для графика
-
-        # Панель инструментов для холста
-        self.toolbar = NavigationToolbar(self.canvas, self)
+        # Фигура, холст и панель инструментов создаются в ensure_figure: загрузка matplotlib
+        # не задерживает показ окна
+        self.figure = None
+        self.canvas = None
+        self.axes = None
+        self.toolbar = None
 
         # Словарь для хранения линий графиков по именам
         self.lines: dict[str, Line2D] = {}
+        # Полные (не прореженные) данные линий. На холст передается только прореженная видимая часть
+        self.series: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+        # Данные, пришедшие с момента последней отрисовки. Несколько обновлений подряд
+        # объединяются в одну перерисовку
+        self._pending_series: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._flush_scheduled = False
+
+        # Полосы процентилей проверки устойчивости (core.robustness). Рисуются в фоне под линиями,
+        # частые обновления также объединяются в одну перерисовку
+        self.band_artists = []
+        self._pending_bands = None
+
+        # Кривые температуры прошлых расчетов для сравнения (core.run_history). Их линии входят в фон
+        # и не перерисовываются при обновлениях текущего расчета
+        self.history = RunHistory(history_size, history_memory_budget)
+        self.history_lines: dict[int, Line2D] = {}
+        # Параметры текущего расчета; его кривая попадает в историю, если он завершился
+        self._run_params = None
+        self._run_completed = False
+
+        # Фон области графика без линий для быстрого обновления (blitting)
+        self._background = None
+        self._updating_view = False
+
+        # Список истории: флажок показывает или скрывает кривую расчета
+        self.history_list = QListWidget()
+        self.history_list.setMaximumHeight(HISTORY_LIST_HEIGHT)
+        self.history_list.itemChanged.connect(self._on_history_item_changed)
+        self.history_size_input = QSpinBox()
+        self.history_size_input.setRange(0, MAX_HISTORY_SIZE)
+        self.history_size_input.setValue(history_size)
+        self.history_size_input.valueChanged.connect(self._on_history_size_changed)
+        history_header = QHBoxLayout()
+        history_header.addWidget(QLabel("Сравнение расчетов, хранить последних:"))
+        history_header.addWidget(self.history_size_input)
+        history_header.addStretch()
 
         # Настройка компоновки для PlotCanvas
+        self.placeholder = QLabel(LOADING_TEXT)
+        self.placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout = QVBoxLayout()
-        layout.addWidget(self.toolbar)  # Добавляем панель инструментов сверху
-        layout.addWidget(self.canvas)  # Добавляем холст под панелью инструментов
+        layout.addWidget(self.placeholder, 1)
+        layout.addLayout(history_header)
+        layout.addWidget(self.history_list)
         self.setLayout(layout)
 
-    @pyqtSlot(dict)
     @log_exceptions
-    def plot_data(self, params: dict):
-        x = params.get("x")
-        y = params.get("y")
-        label = params.get("label")
-        self.logger.debug(f"Plotting data with label: {label}")
-        self.logger.debug(f"x shape: {len(x)}, y shape: {len(y)}")
-
-        if label in self.lines:
-            # Обновляем данные существующей линии
-            self.logger.debug("Updating existing line")
-            self.lines[label].set_data(x, y)
-        else:
-            # Создаем новую линию
-            self.logger.debug("Creating new line")
-            (line,) = self.axes.plot(x, y, label=label)
-            self.lines[label] = line
+    def ensure_figure(self):
+        """
+        Загружает matplotlib (см. gui.plot_backend) и создает фигуру, если это еще не сделано.
+        """
+        if self.figure is not None:
+            return
+        modules = load_plot_stack()
+        backend = modules["matplotlib.backends.backend_qtagg"]
+
+        # Создание фигуры matplotlib и холста
+        self.figure = modules["matplotlib.figure"].Figure()
+        self.canvas = backend.FigureCanvasQTAgg(self.figure)
+        self.axes = self.figure.add_subplot(111)  # Добавляем начальную область для графика
 
         # Добавляем подписи осей
         self.axes.set_xlabel("Время (с)")
         self.axes.set_ylabel("Температура (°C)")
 
-        self.axes.relim()
-        self.axes.autoscale_view()
-        self.axes.legend()
+        # Панель инструментов для холста
+        self.toolbar = backend.NavigationToolbar2QT(self.canvas, self)
+
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.axes.callbacks.connect("xlim_changed", self._on_xlim_changed)
+
+        # Панель инструментов сверху, холст под ней вместо надписи о загрузке, список истории внизу
+        layout = self.layout()
+        layout.removeWidget(self.placeholder)
+        self.placeholder.deleteLater()
+        self.placeholder = None
+        layout.insertWidget(0, self.toolbar)
+        layout.insertWidget(1, self.canvas, 1)
+
+    @pyqtSlot(object)
+    @log_exceptions
+    def plot_data(self, params: dict | SimulationResult):
+        # Принимает результат симуляции (его колонки используются без копирования), одну линию
+        # {"x", "y", "label"} или несколько линий с общей осью времени {"x", "series": {label: y}}
+        if isinstance(params, SimulationResult):
+            x, series = params.time, params.series()
+        else:
+            x = np.asarray(params.get("x"))
+            series = params.get("series") or {params.get("label"): params.get("y")}
+        for label, y in series.items():
+            self.logger.debug(f"Plotting data with label: {label}, x shape: {len(x)}, y shape: {len(y)}")
+            self._pending_series[label] = (x, np.asarray(y))
+
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            QTimer.singleShot(0, self.flush)
+
+    @log_exceptions
+    def flush(self):
+        """
+        Применяет накопленные данные одной перерисовкой.
+        """
+        self._flush_scheduled = False
+        if not self._pending_series:
+            return
+
+        self.ensure_figure()
+        timer = StageTimer("redraw")
+        with timer.measure("plot_redraw"):
+            points = self._apply_pending_series()
+        timer.log(points=points)
+        self.timings_signal.emit(timer.as_dict())
+
+    @pyqtSlot(dict)
+    @log_exceptions
+    def start_run(self, params: dict):
+        """
+        Начало нового расчета: кривая температуры завершенного предыдущего расчета переходит в историю.
+        Отмененные расчеты и повтор с теми же параметрами историю не пополняют.
+        """
+        previous, completed = self._run_params, self._run_completed
+        self._run_params, self._run_completed = dict(params), False
+        temperature = {**self.series, **self._pending_series}.get(PLOT_LABELS["temperature"])
+        if not completed or previous == params or temperature is None or self.history.size == 0:
+            return
+        self.history.add(previous, *temperature)
+        self.logger.debug(f"Run history: {len(self.history)} runs, {self.history.nbytes} bytes")
+        self._sync_history()
+
+    @pyqtSlot(bool)
+    def finish_run(self, completed: bool):
+        self._run_completed = completed
+
+    @log_exceptions
+    def _sync_history(self):
+        """
+        Приводит линии и список истории к self.history: линии удаленных расчетов убираются,
+        новые создаются, сжатые получают новые данные.
+        """
+        self.ensure_figure()
+        from matplotlib.colors import to_hex  # matplotlib уже загружен в ensure_figure
+
+        run_ids = {run.run_id for run in self.history}
+        for run_id in [run_id for run_id in self.history_lines if run_id not in run_ids]:
+            self.history_lines.pop(run_id).remove()
+
+        self.history_list.blockSignals(True)
+        self.history_list.clear()
+        for run in self.history:
+            line = self.history_lines.get(run.run_id)
+            if line is None:
+                color = HISTORY_COLORS[run.run_id % len(HISTORY_COLORS)]
+                linestyle = HISTORY_LINESTYLES[run.run_id % len(HISTORY_LINESTYLES)]
+                (line,) = self.axes.plot([], [], color=color, linestyle=linestyle, linewidth=1, label=run.label)
+                self.history_lines[run.run_id] = line
+            line.set_visible(run.visible)
+
+            item = QListWidgetItem(run.label + (" (сжато)" if run.compact else ""))
+            item.setData(Qt.ItemDataRole.UserRole, run.run_id)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked if run.visible else Qt.CheckState.Unchecked)
+            item.setForeground(QColor(to_hex(line.get_color())))
+            self.history_list.addItem(item)
+        self.history_list.blockSignals(False)
+
+        self._decimate_history(self.axes.get_xlim())
+        self._update_legend()
+        self._redraw()
+
+    def _on_history_item_changed(self, item: QListWidgetItem):
+        run_id = item.data(Qt.ItemDataRole.UserRole)
+        run = next((run for run in self.history if run.run_id == run_id), None)
+        if run is None:
+            return
+        run.visible = item.checkState() == Qt.CheckState.Checked
+        self.history_lines[run_id].set_visible(run.visible)
+        self._decimate_history(self.axes.get_xlim())
+        self._update_legend()
+        self._redraw()
+
+    def _on_history_size_changed(self, size: int):
+        self.history.resize(size)
+        if self.figure is not None:
+            self._sync_history()
+
+    def _update_legend(self):
+        # Скрытые кривые истории в легенду не попадают
+        handles = [handle for handle in self.axes.get_legend_handles_labels()[0] if handle.get_visible()]
+        self.axes.legend(handles=handles)
+
+    @pyqtSlot(dict)
+    @log_exceptions
+    def plot_bands(self, params: dict):
+        # Принимает {"x", "bands": {label: y}} с процентилями по возрастанию (RobustnessResult.as_payload)
+        if self._pending_bands is None:
+            QTimer.singleShot(0, self._flush_bands)
+        self._pending_bands = params
+
+    @pyqtSlot()
+    def clear_bands(self):
+        self._pending_bands = None
+        if self.band_artists:
+            self._remove_bands()
+            self._redraw()
+
+    def _remove_bands(self):
+        for artist in self.band_artists:
+            artist.remove()
+        self.band_artists = []
+
+    @log_exceptions
+    def _flush_bands(self):
+        """
+        Крайние процентили попарно образуют заполненные области, средний (при нечетном количестве) -
+        пунктирную линию.
+        """
+        params, self._pending_bands = self._pending_bands, None
+        if params is None:
+            return
+        self.ensure_figure()
+        self._remove_bands()
+        x = np.asarray(params["x"])
+        bands = list(params["bands"].items())
+        for level in range(len(bands) // 2):
+            (low_label, low), (high_label, high) = bands[level], bands[-1 - level]
+            band = self.axes.fill_between(
+                x, low, high, color="tab:blue", alpha=0.15 + 0.1 * level, linewidth=0, label=f"{low_label}–{high_label}"
+            )
+            self.band_artists.append(band)
+        if len(bands) % 2:
+            label, y = bands[len(bands) // 2]
+            self.band_artists.extend(self.axes.plot(x, y, "--", color="tab:blue", linewidth=1, label=label))
+
+        self._updating_view = True
+        try:
+            self.axes.autoscale_view()
+        finally:
+            self._updating_view = False
+        self._update_legend()
+        self._redraw()
+
+    def _apply_pending_series(self):
+        # Возвращает количество точек всех линий (полное, до прореживания) для журнала замеров
+        new_lines = False
+        for label, data in self._pending_series.items():
+            self.series[label] = data
+            if label not in self.lines:
+                # Создаем новую линию
+                self.logger.debug("Creating new line")
+                (line,) = self.axes.plot([], [], label=label)
+                self.lines[label] = line
+                new_lines = True
+        self._pending_series = {}
+
+        previous_limits = (self.axes.get_xlim(), self.axes.get_ylim())
+        self._updating_view = True
+        try:
+            self._decimate_lines()
+            # Скрытые кривые истории не влияют на масштаб
+            self.axes.relim(visible_only=True)
+            self.axes.autoscale_view()
+            if not self.axes.get_autoscalex_on():
+                # График увеличен панелью инструментов: пределы не меняются, и прореживание
+                # по всему ряду заменило бы детали видимого участка
+                self._decimate_lines(self.axes.get_xlim())
+        finally:
+            self._updating_view = False
+
+        if new_lines:
+            self._update_legend()
+
+        limits_unchanged = previous_limits == (self.axes.get_xlim(), self.axes.get_ylim())
+        if not new_lines and limits_unchanged and self._background is not None:
+            self._blit_lines()
+        else:
+            self._redraw()
+        return sum(len(x) for x, _ in self.series.values())
+
+    def _max_points(self):
+        return max(MIN_PLOT_POINTS, int(self.axes.bbox.width * PLOT_POINTS_PER_PIXEL))
+
+    def _decimate_lines(self, x_limits=None):
+        # Передаем в matplotlib только видимую часть линии, прореженную до разрешения экрана
+        max_points = self._max_points()
+        for label, (x, y) in self.series.items():
+            self.lines[label].set_data(*_decimate(x, y, x_limits, max_points))
+
+    def _decimate_history(self, x_limits):
+        # Прореживаются только показанные кривые истории; скрытые получат данные при включении
+        max_points = self._max_points()
+        for run in self.history:
+            if run.visible:
+                self.history_lines[run.run_id].set_data(*_decimate(run.x, run.y, x_limits, max_points))
+
+    def _redraw(self):
+        # Полная перерисовка: фон запоминается без линий, затем линии дорисовываются поверх
+        for line in self.lines.values():
+            line.set_visible(False)
         self.canvas.draw()
+        self._background = self.canvas.copy_from_bbox(self.axes.bbox)
+        for line in self.lines.values():
+            line.set_visible(True)
+        self._blit_lines()
+
+    def _blit_lines(self):
+        # Быстрое обновление: восстанавливаем фон и перерисовываем только линии
+        self.canvas.restore_region(self._background)
+        for line in self.lines.values():
+            self.axes.draw_artist(line)
+        self.canvas.blit(self.axes.bbox)
+
+    def _on_draw(self, event):
+        # Любая внешняя перерисовка (изменение размера, панорамирование) делает фон недействительным
+        self._background = None
+
+    def _on_xlim_changed(self, axes):
+        # При масштабировании и панорамировании через панель инструментов прореживаем заново
+        # только видимый участок; перерисовку выполнит сама панель инструментов
+        if self._updating_view or not self.series:
+            return
+        self._decimate_lines(axes.get_xlim())
+        self._decimate_history(axes.get_xlim())
+
+
+def _decimate(x, y, x_limits, max_points):
+    if x_limits is not None:
+        visible = visible_slice(x, *x_limits)
+        x, y = x[visible], y[visible]
+    return lttb(x, y, max_points)
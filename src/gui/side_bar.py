@@ -1,10 +1,13 @@
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 from PyQt6.QtGui import QIntValidator
 from PyQt6.QtWidgets import (
+    QCheckBox,
+    QComboBox,
     QFormLayout,
     QGroupBox,
     QLineEdit,
     QMessageBox,
+    QProgressBar,
     QPushButton,
     QSizePolicy,
     QSpacerItem,
@@ -12,6 +15,14 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
+from core.calibration import available_calibrations
+from core.program import parse_segments
+from core.robustness import ROBUSTNESS_SAMPLES
+from core.tuning import DEFAULT_GAIN_BOUNDS
+
+# Задержка перед автоматическим пересчетом после последнего изменения поля, мс
+LIVE_SIMULATION_DELAY_MS = 400
+
 
 class PIDCoefficientsWidget(QWidget):
     def __init__(self):
@@ -52,6 +63,11 @@ class PIDCoefficientsWidget(QWidget):
         except ValueError:
             return None
 
+    def set_pid_coeffs_values(self, kp, ki, kd):
+        self.kp_input.setText(f"{kp:.6g}")
+        self.ki_input.setText(f"{ki:.6g}")
+        self.kd_input.setText(f"{kd:.6g}")
+
 
 class SimulationParametersWidget(QWidget):
     def __init__(self):
@@ -66,6 +82,19 @@ class SimulationParametersWidget(QWidget):
         self.final_temp_input = QLineEdit()
         self.sim_time_input = QLineEdit()
         self.thermal_inertia_coeff_input = QLineEdit()
+        # Необязательная программа уставки (core.program), заменяет нагрев до уставки
+        self.program_input = QLineEdit()
+        # Перемотка установившегося режима (oven_kernel.advance_fast_forward) для длинных выдержек
+        self.fast_forward_input = QCheckBox("Перематывать установившийся режим")
+        self.fast_forward_input.setToolTip(
+            "Пока уставка постоянна и температура не меняется, шаги пропускаются до следующей смены уставки"
+        )
+
+        # Модель печи: коэффициенты по умолчанию или сохраненная калибровка (core.calibration)
+        self.model_input = QComboBox()
+        self.model_input.addItem("Коэффициенты по умолчанию", None)
+        for furnace, version in available_calibrations():
+            self.model_input.addItem(f"{furnace}, версия {version}", (furnace, version))
 
         # Устанавливаем значения по умолчанию
         self.initial_temp_input.setText("25")
@@ -85,6 +114,12 @@ class SimulationParametersWidget(QWidget):
         self.heating_rate.setPlaceholderText("°C/мин")
         self.sim_time_input.setPlaceholderText("сек")
         self.thermal_inertia_coeff_input.setPlaceholderText("Безразмерный коэффициент")
+        self.program_input.setPlaceholderText("ramp 10 250; hold 2h; ramp 5 25")
+        self.program_input.setToolTip(
+            "Участки через «;»: ramp СКОРОСТЬ ЦЕЛЬ, hold ДЛИТЕЛЬНОСТЬ (s, m, h, d), step ЦЕЛЬ.\n"
+            "Если поле заполнено, уставка и скорость нагрева не используются, "
+            "а время симуляции 0 означает длительность программы."
+        )
 
         # Добавляем поля ввода на форму с соответствующими метками
         layout.addRow("Начальная температура (°C):", self.initial_temp_input)
@@ -92,6 +127,9 @@ class SimulationParametersWidget(QWidget):
         layout.addRow("Скорость нагрева (°C/мин):", self.heating_rate)
         layout.addRow("Время симуляции (сек):", self.sim_time_input)
         layout.addRow("Коэффициент инерции (целое число):", self.thermal_inertia_coeff_input)
+        layout.addRow("Программа уставки:", self.program_input)
+        layout.addRow(self.fast_forward_input)
+        layout.addRow("Модель печи:", self.model_input)
 
         # Устанавливаем форму как основной макет виджета
         self.setLayout(layout)
@@ -107,6 +145,149 @@ class SimulationParametersWidget(QWidget):
         except ValueError:
             return None
 
+    def get_program(self):
+        # Текст программы уставки, None для пустого поля. Некорректная запись вызывает ValueError
+        text = self.program_input.text().strip()
+        if not text:
+            return None
+        parse_segments(text)
+        return text
+
+    def get_model(self):
+        # (печь, версия) выбранной калибровки или None для коэффициентов по умолчанию
+        return self.model_input.currentData()
+
+    def get_options(self):
+        """
+        Необязательные параметры симуляции: передаются только заданные программа уставки,
+        перемотка установившегося режима и калибровка печи. Некорректная программа вызывает ValueError.
+        """
+        options = {}
+        program = self.get_program()
+        if program is not None:
+            options["program"] = program
+        if self.fast_forward_input.isChecked():
+            options["fast_forward"] = True
+        model = self.get_model()
+        if model is not None:
+            options["furnace"], options["model_version"] = model
+        return options
+
+
+class TuningWidget(QWidget):
+    # Функции стоимости и стратегии поиска из core.tuning с подписями для интерфейса
+    COSTS = {
+        "itae": "ITAE",
+        "overshoot": "Перерегулирование",
+        "settling_time": "Время установления",
+        "saturation_time": "Время насыщения мощности",
+    }
+    STRATEGIES = {
+        "grid": "Сетка",
+        "nelder_mead": "Нелдер-Мид",
+        "evolution": "Эволюционный",
+    }
+
+    def __init__(self):
+        super().__init__()
+
+        # Создаем форму для выбора критерия и метода автоподбора
+        layout = QFormLayout()
+
+        self.cost_input = QComboBox()
+        for key, title in self.COSTS.items():
+            self.cost_input.addItem(title, key)
+
+        self.strategy_input = QComboBox()
+        for key, title in self.STRATEGIES.items():
+            self.strategy_input.addItem(title, key)
+
+        # Кнопка для запуска автоподбора
+        self.tune_button = QPushButton("Подобрать коэффициенты")
+
+        layout.addRow("Критерий:", self.cost_input)
+        layout.addRow("Метод:", self.strategy_input)
+        layout.addRow(self.tune_button)
+
+        # Устанавливаем форму как основной макет виджета
+        self.setLayout(layout)
+
+    def get_values(self):
+        return self.cost_input.currentData(), self.strategy_input.currentData()
+
+
+class RobustnessWidget(QWidget):
+    def __init__(self):
+        super().__init__()
+
+        # Форма проверки устойчивости текущих коэффициентов на возмущенной модели печи
+        layout = QFormLayout()
+
+        self.samples_input = QLineEdit()
+        self.samples_input.setText(str(ROBUSTNESS_SAMPLES))
+        self.samples_input.setValidator(QIntValidator(1, 1_000_000))
+        self.samples_input.setToolTip(
+            "Прогоны с разбросом коэффициентов модели и массы трубы, просадкой напряжения и шумом датчика"
+        )
+
+        # Кнопка для запуска проверки
+        self.robustness_button = QPushButton("Проверить устойчивость")
+
+        layout.addRow("Количество прогонов:", self.samples_input)
+        layout.addRow(self.robustness_button)
+
+        # Устанавливаем форму как основной макет виджета
+        self.setLayout(layout)
+
+    def get_samples(self):
+        try:
+            return int(self.samples_input.text())
+        except ValueError:
+            return None
+
+
+class StabilityMapWidget(QWidget):
+    # Метрики карты из core.stability_map с подписями для интерфейса
+    METRICS = {**TuningWidget.COSTS, "divergence": "Незатухающие колебания"}
+
+    def __init__(self):
+        super().__init__()
+
+        # Форма построения карты метрики на плоскости kp–ki при текущем kd
+        layout = QFormLayout()
+
+        self.metric_input = QComboBox()
+        for key, title in self.METRICS.items():
+            self.metric_input.addItem(title, key)
+
+        # Верхние границы диапазонов kp и ki, нижние равны нулю
+        self.kp_max_input = QLineEdit()
+        self.kp_max_input.setText(f"{DEFAULT_GAIN_BOUNDS[0][1]:g}")
+        self.ki_max_input = QLineEdit()
+        self.ki_max_input.setText(f"{DEFAULT_GAIN_BOUNDS[1][1]:g}")
+
+        # Кнопка для запуска построения карты
+        self.map_button = QPushButton("Построить карту kp–ki")
+        self.map_button.setToolTip("Грубая сетка уточняется там, где метрика резко меняется; щелчок по карте выбирает kp и ki")
+
+        layout.addRow("Метрика:", self.metric_input)
+        layout.addRow("Kp до:", self.kp_max_input)
+        layout.addRow("Ki до:", self.ki_max_input)
+        layout.addRow(self.map_button)
+
+        # Устанавливаем форму как основной макет виджета
+        self.setLayout(layout)
+
+    def get_values(self):
+        try:
+            kp_max = float(self.kp_max_input.text())
+            ki_max = float(self.ki_max_input.text())
+        except ValueError:
+            return None
+        if kp_max <= 0 or ki_max <= 0:
+            return None
+        return self.metric_input.currentData(), (0.0, kp_max), (0.0, ki_max)
+
 
 class SimulateButtonWidget(QWidget):
     def __init__(self):
@@ -119,8 +300,21 @@ class SimulateButtonWidget(QWidget):
         # Кнопка для запуска симуляции
         self.simulate_button = QPushButton("Провести симуляцию")
 
-        # Добавляем кнопку на макет
+        # Переключатель автоматического пересчета при изменении параметров
+        self.live_checkbox = QCheckBox("Пересчитывать при изменении")
+
+        # Индикатор хода расчета и кнопка его отмены
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.cancel_button = QPushButton("Отменить")
+        self.cancel_button.setEnabled(False)
+
+        # Добавляем кнопки и индикатор на макет
         layout.addWidget(self.simulate_button)
+        layout.addWidget(self.live_checkbox)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.cancel_button)
 
         # Добавляем растяжку для размещения кнопки внизу
         layout.addItem(QSpacerItem(20, 40, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Expanding))
@@ -129,6 +323,10 @@ class SimulateButtonWidget(QWidget):
 class SideBar(QWidget):
     # Сигналы для коммуникации с другими виджетами
     simulation_coeffs_signal = pyqtSignal(dict)
+    tuning_request_signal = pyqtSignal(dict)
+    robustness_request_signal = pyqtSignal(dict)
+    stability_map_request_signal = pyqtSignal(dict)
+    cancel_signal = pyqtSignal()
 
     def __init__(self, min_width):
         super().__init__()
@@ -141,10 +339,32 @@ class SideBar(QWidget):
         # Создаем экземпляры компонентов: виджет коэффициентов PID, параметры симуляции и кнопку
         self.pid_widget = PIDCoefficientsWidget()
         self.sim_params_widget = SimulationParametersWidget()
+        self.tuning_widget = TuningWidget()
+        self.robustness_widget = RobustnessWidget()
+        self.stability_map_widget = StabilityMapWidget()
         self.sim_button_widget = SimulateButtonWidget()
 
-        # Подключаем нажатие кнопки к методу для обработки данных и излучения сигнала
+        # Подключаем нажатие кнопок к методам для обработки данных и излучения сигналов
         self.sim_button_widget.simulate_button.clicked.connect(self.on_simulate)
+        self.sim_button_widget.cancel_button.clicked.connect(self.cancel_signal.emit)
+        self.tuning_widget.tune_button.clicked.connect(self.on_tune)
+        self.robustness_widget.robustness_button.clicked.connect(self.on_robustness)
+        self.stability_map_widget.map_button.clicked.connect(self.on_stability_map)
+
+        # Незавершенные отменяемые расчеты по видам: кнопка отмены доступна, пока есть хотя бы один.
+        # Запросы проверки устойчивости и карты выполняются по очереди и завершаются каждый,
+        # из запросов симуляции о завершении сообщает только последний
+        self.running_tasks: dict[str, int] = {}
+
+        # Таймер откладывает пересчет, пока пользователь продолжает ввод
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(LIVE_SIMULATION_DELAY_MS)
+        self.live_timer.timeout.connect(self.on_live_simulate)
+        for input_field in self.input_fields():
+            input_field.textEdited.connect(self.on_input_edited)
+        self.sim_params_widget.model_input.currentIndexChanged.connect(self.on_input_edited)
+        self.sim_params_widget.fast_forward_input.toggled.connect(self.on_input_edited)
 
         # Группируем виджет коэффициентов PID в область с заголовком
         pid_group = QGroupBox("Коэффициенты ПИД-регулятора")
@@ -156,6 +376,21 @@ class SideBar(QWidget):
         sim_group.setLayout(self.sim_params_widget.layout())
         side_layout.addWidget(sim_group)
 
+        # Группируем виджет автоподбора в область с заголовком
+        tuning_group = QGroupBox("Автоподбор коэффициентов")
+        tuning_group.setLayout(self.tuning_widget.layout())
+        side_layout.addWidget(tuning_group)
+
+        # Группируем виджет проверки устойчивости в область с заголовком
+        robustness_group = QGroupBox("Проверка устойчивости")
+        robustness_group.setLayout(self.robustness_widget.layout())
+        side_layout.addWidget(robustness_group)
+
+        # Группируем виджет карты kp–ki в область с заголовком
+        stability_map_group = QGroupBox("Карта kp–ki")
+        stability_map_group.setLayout(self.stability_map_widget.layout())
+        side_layout.addWidget(stability_map_group)
+
         # Добавляем виджет кнопки симуляции на боковую панель
         side_layout.addWidget(self.sim_button_widget)
 
@@ -164,20 +399,141 @@ class SideBar(QWidget):
         Обработчик нажатия кнопки симуляции.
         Собирает данные из всех полей ввода и отправляет их через сигнал.
         """
-        if not self.check_inputs_filled():
+        simulation_data = self.collect_simulation_data()
+        if simulation_data is None:
             return
 
+        # Отправляем данные
+        self.start_simulation(simulation_data)
+
+    def start_simulation(self, simulation_data: dict):
+        self.sim_button_widget.progress_bar.setValue(0)
+        self._task_started("simulation", queued=False)
+        self.simulation_coeffs_signal.emit(simulation_data)
+
+    def on_progress(self, percent: int):
+        self.sim_button_widget.progress_bar.setValue(percent)
+
+    def on_simulation_finished(self, completed: bool):
+        # Расчеты, замененные новым запросом, о завершении не сообщают (см. PIDSimulations)
+        if not completed:
+            self.sim_button_widget.progress_bar.setValue(0)
+        self._task_finished("simulation")
+
+    def on_robustness_finished(self, completed: bool):
+        self._task_finished("robustness")
+
+    def on_stability_map_finished(self, completed: bool):
+        self._task_finished("stability_map")
+
+    def _task_started(self, task: str, queued=True):
+        # queued=False: новый запрос заменяет незавершенный запрос того же вида
+        self.running_tasks[task] = self.running_tasks.get(task, 0) + 1 if queued else 1
+        self.sim_button_widget.cancel_button.setEnabled(True)
+
+    def _task_finished(self, task: str):
+        remaining = self.running_tasks.pop(task, 0) - 1
+        if remaining > 0:
+            self.running_tasks[task] = remaining
+        self.sim_button_widget.cancel_button.setEnabled(bool(self.running_tasks))
+
+    def on_input_edited(self):
+        if self.sim_button_widget.live_checkbox.isChecked():
+            self.live_timer.start()
+
+    def on_live_simulate(self):
+        """
+        Пересчет в живом режиме. Незаконченный ввод пропускается без сообщений об ошибке.
+        """
+        simulation_data = self.collect_simulation_data(show_warnings=False)
+        if simulation_data is None:
+            return
+
+        self.start_simulation(simulation_data)
+
+    def on_tune(self):
+        """
+        Обработчик нажатия кнопки автоподбора.
+        Отправляет параметры симуляции вместе с выбранным критерием и методом поиска.
+        """
+        simulation_data = self.collect_simulation_data()
+        if simulation_data is None:
+            return
+
+        cost, strategy = self.tuning_widget.get_values()
+        self.tuning_request_signal.emit({**simulation_data, "cost": cost, "strategy": strategy})
+
+    def on_robustness(self):
+        """
+        Обработчик нажатия кнопки проверки устойчивости.
+        Отправляет параметры симуляции вместе с количеством возмущенных прогонов.
+        """
+        simulation_data = self.collect_simulation_data()
+        if simulation_data is None:
+            return
+        samples = self.robustness_widget.get_samples()
+        if not samples:
+            QMessageBox.warning(self, "Ошибка", "Укажите количество прогонов")
+            return
+
+        simulation_data["samples"] = samples
+        self._task_started("robustness")
+        self.robustness_request_signal.emit(simulation_data)
+
+    def on_stability_map(self):
+        """
+        Обработчик нажатия кнопки построения карты kp–ki.
+        Отправляет параметры симуляции вместе с метрикой и диапазонами коэффициентов.
+        """
+        simulation_data = self.collect_simulation_data()
+        if simulation_data is None:
+            return
+        values = self.stability_map_widget.get_values()
+        if values is None:
+            QMessageBox.warning(self, "Ошибка", "Укажите положительные верхние границы Kp и Ki")
+            return
+
+        metric, kp_bounds, ki_bounds = values
+        simulation_data.update(metric=metric, kp_bounds=kp_bounds, ki_bounds=ki_bounds)
+        self._task_started("stability_map")
+        self.stability_map_request_signal.emit(simulation_data)
+
+    def on_map_gains_selected(self, kp: float, ki: float):
+        """
+        Подставляет kp и ki точки, выбранной на карте, и запускает симуляцию с ними.
+        """
+        pid_coeffs = self.pid_widget.get_pid_coeffs_values()
+        kd = pid_coeffs[2] if pid_coeffs is not None else 0.0
+        self.pid_widget.set_pid_coeffs_values(kp, ki, kd)
+        self.on_simulate()
+
+    def on_tuning_result(self, result: dict):
+        """
+        Заполняет поля коэффициентов найденными значениями и запускает симуляцию с ними.
+        """
+        self.pid_widget.set_pid_coeffs_values(result["kp"], result["ki"], result["kd"])
+        self.on_simulate()
+
+    def collect_simulation_data(self, show_warnings=True):
+        """
+        Собирает данные из всех полей ввода. Возвращает None, если ввод некорректен.
+        """
+        if show_warnings and not self.check_inputs_filled():
+            return None
+
         # Получаем коэффициенты PID
         pid_coeffs = self.pid_widget.get_pid_coeffs_values()
         if pid_coeffs is None:
-            QMessageBox.warning(self, "Ошибка", "Проверьте правильность ввода коэффициентов PID")
-            return
+            if show_warnings:
+                QMessageBox.warning(self, "Ошибка", "Проверьте правильность ввода коэффициентов PID")
+            return None
 
         # Получаем параметры симуляции
         sim_params = self.sim_params_widget.get_values()
         if sim_params is None:
-            QMessageBox.warning(self, "Ошибка", "Проверьте правильность ввода параметров симуляции")
-            return
+            if show_warnings:
+                QMessageBox.warning(self, "Ошибка", "Проверьте правильность ввода параметров симуляции")
+            return None
 
         # Распаковываем значения
         kp, ki, kd = pid_coeffs
@@ -195,8 +551,27 @@ class SideBar(QWidget):
             "thermal_inertia_coeff": thermal_inertia_coeff,
         }
 
-        # Отправляем данные
-        self.simulation_coeffs_signal.emit(simulation_data)
+        # Программа уставки, перемотка и калибровка печи передаются только при явном выборе
+        try:
+            simulation_data.update(self.sim_params_widget.get_options())
+        except ValueError as error:
+            if show_warnings:
+                QMessageBox.warning(self, "Ошибка", str(error))
+            return None
+        return simulation_data
+
+    def input_fields(self):
+        return [
+            self.pid_widget.kp_input,
+            self.pid_widget.ki_input,
+            self.pid_widget.kd_input,
+            self.sim_params_widget.initial_temp_input,
+            self.sim_params_widget.final_temp_input,
+            self.sim_params_widget.heating_rate,
+            self.sim_params_widget.sim_time_input,
+            self.sim_params_widget.thermal_inertia_coeff_input,
+            self.sim_params_widget.program_input,
+        ]
 
     def check_inputs_filled(self):
         """
@@ -0,0 +1,109 @@
+import logging
+
+import numpy as np
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal, pyqtSlot
+from PyQt6.QtWidgets import QLabel, QVBoxLayout, QWidget
+
+from core.logger_config import log_exceptions
+from gui.plot_backend import LOADING_TEXT, load_plot_stack
+
+# Подписи метрик карты (core.stability_map.STABILITY_METRICS)
+METRIC_TITLES = {
+    "itae": "ITAE",
+    "overshoot": "Перерегулирование, °C",
+    "settling_time": "Время установления, с",
+    "saturation_time": "Время насыщения мощности, с",
+    "divergence": "Размах незатухающих колебаний, °C",
+}
+
+
+class StabilityMapCanvas(QWidget):
+    # Коэффициенты kp, ki точки, выбранной щелчком по карте
+    gains_selected_signal = pyqtSignal(float, float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.logger = logging.getLogger("PIDSimulationsLogger")
+
+        # Фигура создается в ensure_figure, как у PlotCanvas
+        self.figure = None
+        self.canvas = None
+        self.axes = None
+        self.image = None
+        self.diverged = None
+        self.colorbar = None
+
+        # Карта обновляется после каждого пакета точек, частые обновления объединяются в одну перерисовку
+        self._pending_map = None
+
+        self.placeholder = QLabel(LOADING_TEXT)
+        self.placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout = QVBoxLayout()
+        layout.addWidget(self.placeholder)
+        self.setLayout(layout)
+
+    @log_exceptions
+    def ensure_figure(self):
+        if self.figure is not None:
+            return
+        modules = load_plot_stack()
+        self.figure = modules["matplotlib.figure"].Figure()
+        self.canvas = modules["matplotlib.backends.backend_qtagg"].FigureCanvasQTAgg(self.figure)
+        self.axes = self.figure.add_subplot(111)
+        self.axes.set_xlabel("Ki")
+        self.axes.set_ylabel("Kp")
+        self.axes.grid(False)
+        self.canvas.mpl_connect("button_press_event", self._on_click)
+
+        layout = self.layout()
+        layout.removeWidget(self.placeholder)
+        self.placeholder.deleteLater()
+        self.placeholder = None
+        layout.addWidget(self.canvas)
+
+    @pyqtSlot(dict)
+    @log_exceptions
+    def plot_map(self, params: dict):
+        # Принимает StabilityMap.as_payload
+        if self._pending_map is None:
+            QTimer.singleShot(0, self._flush_map)
+        self._pending_map = params
+
+    @log_exceptions
+    def _flush_map(self):
+        params, self._pending_map = self._pending_map, None
+        if params is None:
+            return
+        self.ensure_figure()
+
+        # Нерассчитанные точки (NaN) остаются цветом фона, расходящиеся прогоны (inf) закрашиваются
+        # отдельным слоем поверх карты
+        values = params["image"]
+        metric_image = np.ma.masked_invalid(values)
+        diverged_image = np.ma.masked_where(~np.isinf(values), np.ones_like(values))
+        ki, kp = params["ki"], params["kp"]
+        extent = (ki[0], ki[-1], kp[0], kp[-1])
+        if self.image is None:
+            # matplotlib уже загружен в ensure_figure
+            from matplotlib.colors import ListedColormap
+
+            self.axes.set_facecolor("lightgray")
+            options = {"origin": "lower", "aspect": "auto", "extent": extent, "interpolation": "nearest"}
+            self.image = self.axes.imshow(metric_image, cmap="viridis_r", **options)
+            self.diverged = self.axes.imshow(diverged_image, cmap=ListedColormap(["darkred"]), **options)
+            self.colorbar = self.figure.colorbar(self.image, ax=self.axes)
+        else:
+            self.image.set_data(metric_image)
+            self.diverged.set_data(diverged_image)
+            for image in (self.image, self.diverged):
+                image.set_extent(extent)
+        self.image.set_clim(*params["color_limits"])
+
+        self.colorbar.set_label(METRIC_TITLES.get(params["metric"], params["metric"]))
+        self.axes.set_title(f"Kd = {params['kd']:g}, точек: {params['evaluations']} из {params['dense_evaluations']}")
+        self.canvas.draw_idle()
+
+    def _on_click(self, event):
+        if event.inaxes is not self.axes or self.image is None:
+            return
+        self.gains_selected_signal.emit(float(event.ydata), float(event.xdata))
@@ -0,0 +1,32 @@
+"""
+Проверка критериев качества пакетного режима (core.cli.simulate_parameter_set).
+"""
+
+import pytest
+
+from core.cli import simulate_parameter_set
+
+# Быстрый нагрев с насыщением мощности, перерегулированием и заметным временем установления
+PARAMS = {
+    "kp": 2.0,
+    "ki": 0.02,
+    "kd": 0,
+    "initial_temp": 25,
+    "final_temp": 600,
+    "heating_rate": 600,
+    "sim_time": 6000,
+    "thermal_inertia_coeff": 10,
+}
+# Допустимое относительное расхождение критериев: более крупный шаг немного меняет саму траекторию
+METRICS_RTOL = 0.03
+
+
+@pytest.mark.parametrize("time_step", [2, 5])
+def test_metrics_do_not_depend_on_time_step(time_step):
+    # Критерии выражены в секундах и °C, поэтому для той же печи не зависят от шага расчета
+    reference = simulate_parameter_set({**PARAMS, "time_step": 1})["metrics"]
+    metrics = simulate_parameter_set({**PARAMS, "time_step": time_step})["metrics"]
+
+    assert metrics.keys() == reference.keys()
+    for name, value in reference.items():
+        assert metrics[name] == pytest.approx(value, rel=METRICS_RTOL), name
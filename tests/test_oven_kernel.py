@@ -0,0 +1,67 @@
+"""
+Проверка ядра симуляции (core.oven_kernel.advance) по исходной реализации цикла
+(reference_oven_temperature): при расчете целиком и порциями через OvenState.
+"""
+
+import numpy as np
+import pytest
+
+from core.oven_kernel import OvenState, advance, reference_oven_temperature
+from core.oven_model import DT, calculate_target_curve
+
+# Допустимое расхождение температуры с исходным циклом, °C. advance хранит скользящую сумму
+# вкладов инерции вместо суммирования очереди на каждом шаге, поэтому совпадение не побитовое
+TOLERANCE = 1e-8
+
+INITIAL_TEMP = 25
+FINAL_TEMP = 1000
+HEATING_RATE = 5
+GAINS = (2.0, 0.05, 1.0)
+# Смена 12 ч с шагом DT
+LONG_SIM_TIME = 12 * 3600
+
+
+def simulate_advance(target_temperatures, num_steps, thermal_inertia_coeff, chunk_steps=None):
+    # Траектория advance в формате reference_oven_temperature: точки 0..num_steps
+    state = OvenState.start(INITIAL_TEMP, target_temperatures[0], DT, thermal_inertia_coeff)
+    temperatures, errors = [INITIAL_TEMP], [target_temperatures[0] - INITIAL_TEMP]
+    chunk_steps = chunk_steps or num_steps
+    for start in range(0, num_steps, chunk_steps):
+        stop = min(start + chunk_steps, num_steps)
+        chunk_temperatures, chunk_errors = advance(state, target_temperatures[start:stop], *GAINS, DT)
+        temperatures.extend(chunk_temperatures)
+        errors.extend(chunk_errors)
+    assert state.step == num_steps
+    return np.array(temperatures), np.array(errors)
+
+
+def simulate_reference(target_temperatures, num_steps, thermal_inertia_coeff):
+    temperatures, errors = reference_oven_temperature(
+        INITIAL_TEMP, target_temperatures, *GAINS, DT, num_steps, thermal_inertia_coeff
+    )
+    return np.array(temperatures), np.array(errors)
+
+
+@pytest.mark.parametrize("thermal_inertia_coeff", [1, 60, 600])
+def test_advance_matches_reference(thermal_inertia_coeff):
+    target_temperatures = calculate_target_curve(INITIAL_TEMP, FINAL_TEMP, HEATING_RATE, LONG_SIM_TIME)
+    temperatures, errors = simulate_advance(target_temperatures, LONG_SIM_TIME, thermal_inertia_coeff)
+    expected_temperatures, expected_errors = simulate_reference(target_temperatures, LONG_SIM_TIME, thermal_inertia_coeff)
+
+    assert temperatures.shape == expected_temperatures.shape
+    np.testing.assert_allclose(temperatures, expected_temperatures, rtol=0, atol=TOLERANCE)
+    np.testing.assert_allclose(errors, expected_errors, rtol=0, atol=TOLERANCE)
+
+
+@pytest.mark.parametrize("thermal_inertia_coeff", [1, 60, 600])
+@pytest.mark.parametrize("chunk_steps", [1, 997, 10000])
+def test_chunked_advance_matches_whole_run(thermal_inertia_coeff, chunk_steps):
+    # Порции не кратны окну инерции: состояние кольцевого буфера переносится между вызовами
+    sim_time = 20000
+    target_temperatures = calculate_target_curve(INITIAL_TEMP, FINAL_TEMP, HEATING_RATE, sim_time)
+    whole, _ = simulate_advance(target_temperatures, sim_time, thermal_inertia_coeff)
+    chunked, _ = simulate_advance(target_temperatures, sim_time, thermal_inertia_coeff, chunk_steps)
+    expected, _ = simulate_reference(target_temperatures, sim_time, thermal_inertia_coeff)
+
+    np.testing.assert_array_equal(chunked, whole)
+    np.testing.assert_allclose(chunked, expected, rtol=0, atol=TOLERANCE)